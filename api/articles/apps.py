@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class ArticlesConfig(AppConfig):
+    default_auto_field = "django.db.models.AutoField"
+    name = "articles"
+
+    def ready(self):
+        from .index import register_sql_functions
+
+        # The full-text index triggers need the Portuguese stemmer
+        connection_created.connect(register_sql_functions)
@@ -0,0 +1,323 @@
+"""
+Contains the local keyword search, over a full-text index of the article
+store.
+
+The index (an SQLite FTS5 table, see `INDEX_TABLE`) holds the title,
+description and text of every stored news, tokenized for Portuguese (see
+`articles.stemmer`). Triggers keep it in sync with the articles, through
+the `pt_stem` SQL function (see `register_sql_functions`).
+
+Once the live search of a keyword finishes for a date range, the range is
+recorded as covered for that keyword, together with the news the search
+found, in order (see `Coverage`). Later searches of any keyword made of
+the same words, or of more words (a search of "covid" covers "vacina
+covid"), are answered locally in those dates:
+
+* the news found by the live search of the same words are returned as
+  they are, even if they don't contain them (sites also match their tags
+  and other metadata);
+* the news found by the live search of fewer words are returned if the
+  index matches the other words.
+
+Other stored news are never returned, as the site did not find them. The
+rest of the dates are searched live, fetching the news of every keyword
+and date range at once. Coverage expires with the stored news
+(`NEWS_ARTICLE_STORE_MAX_AGE`). Other databases have no index, so their
+searches are only answered locally for the same words.
+"""
+import datetime
+import logging
+from typing import Iterator
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from core.concurrency import map_concurrently
+from core.models import News, NewsFactory
+from .models import Article, Coverage, CoverageResult
+from .stemmer import stem_text, stems
+from .store import _max_age, _to_news, canonical_url, is_enabled, source_of
+
+logger = logging.getLogger(__name__)
+
+# Full-text index of the articles (created by the initial migration)
+INDEX_TABLE = "articles_article_index"
+
+# A date range (both dates included)
+DateRange = tuple[datetime.date, datetime.date]
+
+
+def register_sql_functions(sender, connection, **kwargs) -> None:
+    """
+    Registers the `pt_stem` function (see `stem_text`), used by the
+    index triggers, on new SQLite connections (a `connection_created`
+    signal receiver)
+    """
+    if connection.vendor == "sqlite":
+        connection.connection.create_function(
+            "pt_stem", 1, stem_text, deterministic=True
+        )
+
+
+def has_index() -> bool:
+    """
+    Whether the database has the full-text index
+    """
+    return connection.vendor == "sqlite"
+
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    Returns a keyword as stored in the coverage: lowercase,
+    with single spaces
+    """
+    return " ".join(keyword.casefold().split())
+
+
+def match_query(words: list[str]) -> str:
+    """
+    Returns the FTS5 query matching the news with every (stemmed) word
+    """
+    return " ".join(f'"{word}"' for word in words)
+
+
+def covering(
+    source: str,
+    keyword: str,
+    starting_date: datetime.date,
+    ending_date: datetime.date,
+) -> list[tuple[Coverage, list[str]]]:
+    """
+    Returns the coverage that can answer the search of `keyword` between
+    `starting_date` and `ending_date`, with the other words of `keyword`
+    the index must match in its news. Like the sites' results, the newest
+    dates come first, and the coverage of the same words before the
+    others of the same dates.
+    """
+    words = set(stems(keyword))
+    searched_after = timezone.now() - datetime.timedelta(seconds=_max_age())
+    found = []
+    for coverage in Coverage.objects.filter(
+        source=source,
+        searched_at__gte=searched_after,
+        starting_date__lte=ending_date,
+        ending_date__gte=starting_date,
+    ):
+        covered_words = set(stems(coverage.keyword))
+        if not covered_words or not covered_words <= words:
+            continue
+        other_words = sorted(words - covered_words)
+        if other_words and not has_index():
+            continue
+        found.append((coverage, other_words))
+
+    return sorted(
+        found,
+        key=lambda entry: (-entry[0].starting_date.toordinal(), len(entry[1])),
+    )
+
+
+def covered_ranges(
+    coverage: list[Coverage],
+    starting_date: datetime.date,
+    ending_date: datetime.date,
+) -> list[DateRange]:
+    """
+    Returns the (merged and sorted) ranges of dates between `starting_date`
+    and `ending_date` in the given `coverage`
+    """
+    ranges = []
+    for covered in sorted(coverage, key=lambda covered: covered.starting_date):
+        start = max(covered.starting_date, starting_date)
+        end = min(covered.ending_date, ending_date)
+        # Merge overlapping (or adjacent) ranges
+        if ranges and start <= ranges[-1][1] + datetime.timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def uncovered_ranges(
+    covered: list[DateRange],
+    starting_date: datetime.date,
+    ending_date: datetime.date,
+) -> list[DateRange]:
+    """
+    Returns the ranges of dates between `starting_date` and `ending_date`
+    missing from the `covered` ranges (see `covered_ranges`)
+    """
+    gaps = []
+    start = starting_date
+    for covered_start, covered_end in covered:
+        if start < covered_start:
+            gaps.append((start, covered_start - datetime.timedelta(days=1)))
+        start = max(start, covered_end + datetime.timedelta(days=1))
+    if start <= ending_date:
+        gaps.append((start, ending_date))
+    return gaps
+
+
+def add_coverage(
+    source: str,
+    keyword: str,
+    starting_date: datetime.date,
+    ending_date: datetime.date,
+    urls: list[str],
+) -> None:
+    """
+    Records that the live search of `keyword` between `starting_date`
+    and `ending_date` found the news at `urls` (in that order). Today
+    (and later dates) are left out, as more news may still be published.
+    """
+    ending_date = min(
+        ending_date, timezone.localdate() - datetime.timedelta(days=1)
+    )
+    if ending_date < starting_date:
+        return
+
+    coverage = Coverage.objects.create(
+        source=source,
+        keyword=normalize_keyword(keyword),
+        starting_date=starting_date,
+        ending_date=ending_date,
+    )
+    CoverageResult.objects.bulk_create(
+        CoverageResult(coverage=coverage, url=url, position=i)
+        for i, url in enumerate(
+            dict.fromkeys(canonical_url(url) for url in urls)
+        )
+    )
+
+
+def covered_news(
+    coverage: Coverage,
+    other_words: list[str],
+    starting_date: datetime.date,
+    ending_date: datetime.date,
+) -> Iterator[News]:
+    """
+    Yields the stored news the live search of `coverage` found, published
+    between `starting_date` and `ending_date`, in the order they were
+    found. If `other_words` are given, only the news the index matches
+    with them are yielded.
+    """
+    start = timezone.make_aware(
+        datetime.datetime.combine(starting_date, datetime.time.min)
+    )
+    end = timezone.make_aware(
+        datetime.datetime.combine(
+            ending_date + datetime.timedelta(days=1), datetime.time.min
+        )
+    )
+    results = CoverageResult.objects.filter(coverage=coverage)
+    articles = (
+        Article.objects.filter(
+            url__in=results.values("url"),
+            published_at__gte=start,
+            published_at__lt=end,
+        )
+        .annotate(
+            position=Subquery(
+                results.filter(url=OuterRef("url")).values("position")[:1]
+            )
+        )
+        .order_by("position")
+    )
+    if other_words:
+        articles = articles.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {INDEX_TABLE} "
+                f"WHERE {INDEX_TABLE} MATCH %s",
+                [match_query(other_words)],
+            )
+        )
+    for article in articles.iterator():
+        yield _to_news(article)
+
+
+def iter_keyword_search(
+    factory_class: type[NewsFactory],
+    keywords: list[str],
+    starting_date: datetime.date,
+    ending_date: datetime.date,
+) -> Iterator[News]:
+    """
+    Yields the news of a keyword search with a news factory: the ones in
+    covered ranges from the previous searches, then the others, from the
+    live searches of the uncovered ranges, whose coverage is recorded.
+
+    The news URLs of every live search are collected in parallel, and the
+    news are fetched once (see `NewsFactory.iter_url_search`). Only their
+    URLs are kept until the searches are recorded.
+    """
+    if not is_enabled():
+        yield from factory_class.iter_live_keyword_search(
+            keywords, starting_date, ending_date
+        )
+        return
+
+    source = source_of(factory_class)
+    # Canonical URLs of the news found so far
+    seen = set()
+
+    # Uncovered ranges of each keyword
+    live_searches = []
+    for keyword in keywords:
+        try:
+            coverage = covering(source, keyword, starting_date, ending_date)
+            for covered, other_words in coverage:
+                for news_obj in covered_news(
+                    covered,
+                    other_words,
+                    max(covered.starting_date, starting_date),
+                    min(covered.ending_date, ending_date),
+                ):
+                    url = canonical_url(news_obj.url)
+                    if url not in seen:
+                        seen.add(url)
+                        yield news_obj
+        except DatabaseError as exc:
+            logger.warning("Local keyword search failed: %s", exc)
+            coverage = []
+        covered = covered_ranges(
+            [covered for covered, _ in coverage], starting_date, ending_date
+        )
+        # Newest dates first
+        for start, end in reversed(
+            uncovered_ranges(covered, starting_date, ending_date)
+        ):
+            live_searches.append((keyword, start, end))
+    if not live_searches:
+        return
+
+    # News URLs found by each live search
+    urls_per_search = map_concurrently(
+        lambda live_search: factory_class._collect_term_urls(
+            "keyword", *live_search
+        ),
+        live_searches,
+        max_workers=getattr(settings, "NEWS_SEARCH_MAX_PARALLEL_TERMS", 5),
+    )
+
+    # Fetch each news once, in the order of the searches
+    urls = []
+    for found_urls in urls_per_search:
+        for url in found_urls:
+            if canonical_url(url) not in seen:
+                seen.add(canonical_url(url))
+                urls.append(url)
+    yield from factory_class.iter_url_search(urls)
+
+    # Every live search finished
+    try:
+        with transaction.atomic():
+            for (keyword, start, end), found_urls in zip(
+                live_searches, urls_per_search
+            ):
+                add_coverage(source, keyword, start, end, found_urls)
+    except DatabaseError as exc:
+        logger.warning("Keyword search coverage failed: %s", exc)
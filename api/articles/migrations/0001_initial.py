@@ -0,0 +1,181 @@
+# Generated by Django 4.1.13 on 2026-10-18 19:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Full-text index of the articles (SQLite FTS5, see `articles.index`).
+# It holds the stemmed words of the articles (see `articles.stemmer`),
+# which the triggers get from the `pt_stem` function registered on every
+# connection. As its content differs from the articles, the table is
+# contentless, and rows are deleted by giving back the indexed words.
+INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE articles_article_index USING fts5(
+        title, description, text,
+        content='', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER articles_article_index_insert
+    AFTER INSERT ON articles_article BEGIN
+        INSERT INTO articles_article_index (rowid, title, description, text)
+        VALUES (
+            new.id, pt_stem(new.title), pt_stem(new.description),
+            pt_stem(new.text)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER articles_article_index_delete
+    AFTER DELETE ON articles_article BEGIN
+        INSERT INTO articles_article_index
+            (articles_article_index, rowid, title, description, text)
+        VALUES (
+            'delete', old.id, pt_stem(old.title), pt_stem(old.description),
+            pt_stem(old.text)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER articles_article_index_update
+    AFTER UPDATE OF title, description, text ON articles_article BEGIN
+        INSERT INTO articles_article_index
+            (articles_article_index, rowid, title, description, text)
+        VALUES (
+            'delete', old.id, pt_stem(old.title), pt_stem(old.description),
+            pt_stem(old.text)
+        );
+        INSERT INTO articles_article_index (rowid, title, description, text)
+        VALUES (
+            new.id, pt_stem(new.title), pt_stem(new.description),
+            pt_stem(new.text)
+        );
+    END
+    """,
+]
+
+INDEX_REVERSE_SQL = [
+    "DROP TRIGGER articles_article_index_insert",
+    "DROP TRIGGER articles_article_index_delete",
+    "DROP TRIGGER articles_article_index_update",
+    "DROP TABLE articles_article_index",
+]
+
+
+def run_on_sqlite(statements):
+    """
+    Runs the statements on SQLite databases only (other databases
+    have no full-text index)
+    """
+
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "sqlite":
+            for statement in statements:
+                schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Article",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=2048, unique=True)),
+                ("scraped_url", models.URLField(max_length=2048)),
+                ("source", models.CharField(db_index=True, max_length=50)),
+                ("title", models.TextField()),
+                ("description", models.TextField(blank=True)),
+                ("rubric", models.CharField(db_index=True, max_length=100)),
+                ("published_at", models.DateTimeField(db_index=True)),
+                ("published_at_offset", models.IntegerField(null=True)),
+                ("authors", models.JSONField(default=list)),
+                ("is_opinion", models.BooleanField()),
+                ("text", models.TextField()),
+                ("scraped_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Coverage",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=50)),
+                ("keyword", models.CharField(max_length=200)),
+                ("starting_date", models.DateField()),
+                ("ending_date", models.DateField()),
+                ("searched_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CoverageResult",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(db_index=True, max_length=2048)),
+                ("position", models.PositiveIntegerField()),
+                (
+                    "coverage",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="results",
+                        to="articles.coverage",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["coverage", "position"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="coverage",
+            index=models.Index(
+                fields=["source", "keyword", "starting_date"],
+                name="articles_co_source_24b3a3_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["source", "published_at"],
+                name="articles_ar_source_7dc3c1_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="coverageresult",
+            constraint=models.UniqueConstraint(
+                fields=("coverage", "url"), name="unique_coverage_result"
+            ),
+        ),
+        migrations.RunPython(
+            run_on_sqlite(INDEX_SQL), run_on_sqlite(INDEX_REVERSE_SQL)
+        ),
+    ]
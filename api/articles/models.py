@@ -0,0 +1,91 @@
+"""
+Contains the article store models
+"""
+from django.db import models
+
+
+class Article(models.Model):
+    """
+    A news already scraped by some job, stored so that later jobs
+    don't need to download and parse it again (see `articles.store`)
+    """
+
+    # Canonical URL (see `articles.store.canonical_url`)
+    url = models.URLField(max_length=2048, unique=True)
+    # URL of the scraped news, as it was scraped
+    scraped_url = models.URLField(max_length=2048)
+    # App of the news factory that scraped it (e.g. "publico")
+    source = models.CharField(max_length=50, db_index=True)
+    title = models.TextField()
+    description = models.TextField(blank=True)
+    rubric = models.CharField(max_length=100, db_index=True)
+    published_at = models.DateTimeField(db_index=True)
+    # UTC offset (in seconds) of the scraped date, so that it is read back
+    # as it was scraped. None if the scraped date was naive.
+    published_at_offset = models.IntegerField(null=True)
+    authors = models.JSONField(default=list)
+    is_opinion = models.BooleanField()
+    text = models.TextField()
+    # When it was last scraped
+    scraped_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Date range searches in a newspaper
+            models.Index(fields=["source", "published_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return self.url
+
+
+class Coverage(models.Model):
+    """
+    A date range in which the live search of a keyword in a newspaper
+    finished, with the news it found (see `CoverageResult`). Keyword
+    searches in covered ranges are answered locally (see `articles.index`).
+    """
+
+    source = models.CharField(max_length=50)
+    # Normalized keyword (see `articles.index.normalize_keyword`)
+    keyword = models.CharField(max_length=200)
+    starting_date = models.DateField()
+    ending_date = models.DateField()
+    searched_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["source", "keyword", "starting_date"]),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.source} '{self.keyword}' "
+            f"{self.starting_date} - {self.ending_date}"
+        )
+
+
+class CoverageResult(models.Model):
+    """
+    A news found by the live search of a `Coverage`. News are referred to
+    by URL, as the search records them before they are stored.
+    """
+
+    coverage = models.ForeignKey(
+        Coverage, on_delete=models.CASCADE, related_name="results"
+    )
+    # Canonical URL (see `articles.store.canonical_url`)
+    url = models.URLField(max_length=2048, db_index=True)
+    # Order in which the live search found it
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["coverage", "url"], name="unique_coverage_result"
+            ),
+        ]
+        ordering = ["coverage", "position"]
+
+    def __str__(self) -> str:
+        return f"{self.coverage} #{self.position}: {self.url}"
@@ -0,0 +1,98 @@
+"""
+Contains the Portuguese tokenization of the full-text index (see
+`articles.index`).
+
+Words are lowercased, their accents removed, and their plural and feminine
+forms reduced, following the first two steps of RSLP (Orengo and Huyck,
+"A Stemming Algorithm for the Portuguese Language", 2001). So "Eleições
+Autárquicas" matches "eleição autárquica". The other RSLP steps (verb and
+noun suffixes) are left out, as they conflate too many unrelated words
+for a keyword search.
+"""
+import re
+import unicodedata
+from typing import Optional
+
+# Plural reduction: (suffix, replacement, minimum stem length). Only words
+# ending in "s" are reduced, with the first suffix that matches.
+PLURAL_RULES = [
+    ("ns", "m", 1),  # homens -> homem
+    ("oes", "ao", 3),  # eleicoes -> eleicao
+    ("aes", "ao", 1),  # caes -> cao
+    ("ais", "al", 1),  # jornais -> jornal
+    ("eis", "el", 2),  # papeis -> papel
+    ("ois", "ol", 1),  # lencois -> lencol
+    ("is", "il", 2),  # funis -> funil
+    ("eses", "es", 3),  # portugueses -> portugues
+    ("les", "l", 3),  # males -> mal
+    ("res", "r", 3),  # mulheres -> mulher
+    ("s", "", 2),  # casas -> casa
+]
+# Words ending in "s" that are not plurals
+PLURAL_EXCEPTIONS = {"lapis", "cais", "mais", "pais", "biceps", "pires"}
+
+# Feminine reduction: (suffix, replacement, minimum stem length)
+FEMININE_RULES = [
+    ("ona", "ao", 3),  # chefona -> chefao
+    ("ora", "or", 3),  # professora -> professor
+    ("inha", "inho", 3),  # vizinha -> vizinho
+    ("esa", "es", 3),  # portuguesa -> portugues
+    ("osa", "oso", 3),  # famosa -> famoso
+    ("iaca", "iaco", 3),  # maniaca -> maniaco
+    ("ica", "ico", 3),  # autarquica -> autarquico
+    ("ada", "ado", 2),  # aprovada -> aprovado
+    ("ida", "ido", 3),  # vendida -> vendido
+    ("ima", "imo", 3),  # prima -> primo
+    ("iva", "ivo", 3),  # passiva -> passivo
+    ("eira", "eiro", 3),  # primeira -> primeiro
+]
+
+WORD_RE = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """
+    Returns `text` lowercased and without accents
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+
+
+def _apply(word: str, rules: list[tuple[str, str, int]]) -> str:
+    for suffix, replacement, min_length in rules:
+        if word.endswith(suffix):
+            stem = word[: -len(suffix)]
+            if len(stem) >= min_length:
+                return stem + replacement
+            return word
+    return word
+
+
+def stem(word: str) -> str:
+    """
+    Returns the stem of a (folded, see `fold`) word
+    """
+    if word.endswith("s") and word not in PLURAL_EXCEPTIONS:
+        word = _apply(word, PLURAL_RULES)
+    if word.endswith("a"):
+        word = _apply(word, FEMININE_RULES)
+    return word
+
+
+def stems(text: str) -> list[str]:
+    """
+    Returns the stems of the words of `text`, in order
+    """
+    return [stem(word) for word in WORD_RE.findall(fold(text))]
+
+
+def stem_text(text: Optional[str]) -> Optional[str]:
+    """
+    Returns the words of `text` replaced by their stems. This is the
+    text the full-text index holds.
+    """
+    if text is None:
+        return None
+    return " ".join(stems(text))
@@ -0,0 +1,232 @@
+"""
+Contains the store of the news scraped by every job.
+
+Jobs save the news they find (see `save_news`), and URL searches look
+them up (see `get_news`) before going to the network. News are reused for
+`NEWS_ARTICLE_STORE_MAX_AGE` seconds after they were scraped (0 disables
+the store), and deleted afterwards (see `prune_news`).
+
+The store is only a cache: database errors are logged and ignored.
+"""
+import datetime
+import logging
+import threading
+import time
+from typing import Iterable
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from core.models import News
+from .models import Article, Coverage, CoverageResult
+
+logger = logging.getLogger(__name__)
+
+# When this process last pruned the store (see `prune_news`)
+_last_pruned = None
+_prune_lock = threading.Lock()
+
+# Fields updated when a stored news is scraped again
+UPDATE_FIELDS = [
+    "scraped_url",
+    "source",
+    "title",
+    "description",
+    "rubric",
+    "published_at",
+    "published_at_offset",
+    "authors",
+    "is_opinion",
+    "text",
+    "scraped_at",
+]
+
+
+def canonical_url(url: str) -> str:
+    """
+    Returns the URL news are stored under: https, lowercase host,
+    without query, fragment or trailing slash
+    """
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    path = parsed.path.rstrip("/")
+    return f"https://{parsed.netloc.lower()}{path}"
+
+
+def source_of(factory_class) -> str:
+    """
+    Returns the source (app name, e.g. "publico") of a news factory class
+    """
+    return factory_class.__module__.split(".")[0]
+
+
+def is_enabled() -> bool:
+    """
+    Whether news are stored (and reused)
+    """
+    return bool(_max_age())
+
+
+def _max_age() -> int:
+    return getattr(settings, "NEWS_ARTICLE_STORE_MAX_AGE", 0)
+
+
+def _fresh_articles():
+    """
+    Returns the stored articles that can still be reused
+    """
+    scraped_after = timezone.now() - datetime.timedelta(seconds=_max_age())
+    return Article.objects.filter(scraped_at__gte=scraped_after)
+
+
+def _to_news(article: Article) -> News:
+    # Give the date back the timezone (or lack of it) it was scraped with
+    if article.published_at_offset is None:
+        published_at = timezone.make_naive(article.published_at)
+    else:
+        published_at = article.published_at.astimezone(
+            datetime.timezone(
+                datetime.timedelta(seconds=article.published_at_offset)
+            )
+        )
+    return News(
+        article.title,
+        article.description,
+        article.scraped_url,
+        article.rubric,
+        published_at,
+        article.authors,
+        article.is_opinion,
+        article.text,
+    )
+
+
+def _to_article(news: News, source: str) -> Article:
+    published_at = news.published_at
+    if timezone.is_naive(published_at):
+        offset = None
+        published_at = timezone.make_aware(published_at)
+    else:
+        offset = int(published_at.utcoffset().total_seconds())
+    return Article(
+        url=canonical_url(news.url),
+        scraped_url=news.url,
+        source=source,
+        title=news.title,
+        description=news.description,
+        rubric=news.rubric,
+        published_at=published_at,
+        published_at_offset=offset,
+        authors=news.authors,
+        is_opinion=news.is_opinion,
+        text=news.text,
+        scraped_at=timezone.now(),
+    )
+
+
+def get_news(urls: Iterable[str]) -> dict[str, News]:
+    """
+    Returns the stored news (that can still be reused) of the given URLs,
+    indexed by canonical URL. The news keep the URL they were scraped with.
+    """
+    if not is_enabled():
+        return {}
+
+    canonical_urls = {canonical_url(url) for url in urls}
+    try:
+        return {
+            article.url: _to_news(article)
+            for article in _fresh_articles().filter(url__in=canonical_urls)
+        }
+    except DatabaseError as exc:
+        logger.warning("Article store lookup failed: %s", exc)
+        return {}
+
+
+def upsert_news(news: Iterable[News], source: str) -> int:
+    """
+    Inserts (or updates) the given news in the store, in bulk. News that
+    are already stored, and can still be reused, are left as they are.
+
+    Returns the number of news saved.
+    """
+    articles = {}
+    for news_obj in news:
+        article = _to_article(news_obj, source)
+        articles[article.url] = article
+
+    # Don't rewrite the news that were just read from the store
+    for url in (
+        _fresh_articles()
+        .filter(url__in=list(articles))
+        .values_list("url", flat=True)
+    ):
+        del articles[url]
+
+    Article.objects.bulk_create(
+        articles.values(),
+        update_conflicts=True,
+        unique_fields=["url"],
+        update_fields=UPDATE_FIELDS,
+    )
+    return len(articles)
+
+
+def prune_news() -> int:
+    """
+    Deletes the news, and keyword coverage (see `articles.index`), that
+    can no longer be reused. News found by the live searches of coverage
+    that is still fresh are kept, as they answer keyword searches.
+
+    Returns the number of news deleted.
+    """
+    expired_at = timezone.now() - datetime.timedelta(seconds=_max_age())
+    Coverage.objects.filter(searched_at__lt=expired_at).delete()
+    _, deleted = (
+        Article.objects.filter(scraped_at__lt=expired_at)
+        .exclude(url__in=CoverageResult.objects.values("url"))
+        .delete()
+    )
+    return deleted.get(Article._meta.label, 0)
+
+
+def _prune_if_due() -> None:
+    """
+    Prunes the store, at most once every
+    `NEWS_ARTICLE_STORE_PRUNE_INTERVAL` seconds per process
+    """
+    global _last_pruned
+
+    interval = getattr(settings, "NEWS_ARTICLE_STORE_PRUNE_INTERVAL", 3600)
+    with _prune_lock:
+        now = time.monotonic()
+        if _last_pruned is not None and now - _last_pruned < interval:
+            return
+        _last_pruned = now
+
+    try:
+        deleted = prune_news()
+    except DatabaseError as exc:
+        logger.warning("Article store pruning failed: %s", exc)
+        return
+    if deleted:
+        logger.info("Pruned %d news from the article store", deleted)
+
+
+def save_news(news: Iterable[News], source: str) -> int:
+    """
+    Same as `upsert_news`, but does nothing if the store is disabled,
+    and logs (instead of raising) database errors. The news that
+    expired are pruned every now and then.
+    """
+    if not is_enabled():
+        return 0
+
+    try:
+        saved = upsert_news(news, source)
+    except DatabaseError as exc:
+        logger.warning("Article store update failed: %s", exc)
+        return 0
+    _prune_if_due()
+    return saved
@@ -0,0 +1,186 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core.models import News
+from publico.models import PublicoNewsFactory
+from ..index import add_coverage, iter_keyword_search
+from ..stemmer import stem_text
+from ..store import save_news
+
+JANUARY = (datetime.date(2021, 1, 1), datetime.date(2021, 1, 31))
+
+# News of the fake newspaper: URL -> (day of January 2021, text)
+NEWS = {
+    "https://www.publico.pt/1": (5, "As primeiras vacinas contra a covid"),
+    # Found by the site's search of "covid" through its tags
+    "https://www.publico.pt/2": (12, "Novas vacinas chegam a Portugal"),
+    "https://www.publico.pt/3": (25, "Casos de covid descem"),
+    # Never found by the site's search
+    "https://www.publico.pt/4": (12, "O Orçamento e as vacinas da covid"),
+}
+# URLs found by the site's search of each keyword
+RESULTS = {
+    "covid": ["https://www.publico.pt/3", "https://www.publico.pt/2"]
+    + ["https://www.publico.pt/1"],
+    "vacina": ["https://www.publico.pt/2", "https://www.publico.pt/1"],
+}
+
+
+def build_news(url):
+    day, text = NEWS[url]
+    return News(
+        text,
+        "",
+        url,
+        "Sociedade",
+        datetime.datetime(2021, 1, day, 12),
+        [],
+        False,
+        text,
+    )
+
+
+def collect_urls(search_type, keyword, starting_date, ending_date):
+    return [
+        url
+        for url in RESULTS.get(keyword.lower().strip(), [])
+        if starting_date <= build_news(url).published_at.date() <= ending_date
+    ]
+
+
+def url_search(urls):
+    for url in urls:
+        yield build_news(url)
+
+
+@override_settings(NEWS_ARTICLE_STORE_MAX_AGE=60)
+class KeywordIndexTest(TestCase):
+    def setUp(self):
+        self.collect_urls = self.patch("_collect_term_urls", collect_urls)
+        self.url_search = self.patch("iter_url_search", url_search)
+
+    def patch(self, name, side_effect):
+        patcher = mock.patch.object(
+            PublicoNewsFactory, name, side_effect=side_effect
+        )
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def search(self, keywords, starting_date, ending_date):
+        """
+        Searches like a job does, storing the news found
+        """
+        news = list(
+            iter_keyword_search(
+                PublicoNewsFactory, keywords, starting_date, ending_date
+            )
+        )
+        save_news(news, "publico")
+        return [news_obj.url for news_obj in news]
+
+    def test_same_news_as_live(self):
+        """
+        Tests that covered ranges are answered with the news the live
+        search found, in the same order, even if they don't contain the
+        keyword, and not with other stored news that do
+        """
+        save_news([build_news("https://www.publico.pt/4")], "publico")
+
+        live = self.search(["covid"], *JANUARY)
+        local = self.search([" COVID "], *JANUARY)
+
+        self.assertEqual(live, RESULTS["covid"])
+        self.assertEqual(local, live)
+        self.collect_urls.assert_called_once_with("keyword", "covid", *JANUARY)
+
+    def test_uncovered_range(self):
+        """
+        Tests that only the uncovered ranges are searched live,
+        and are covered afterwards
+        """
+        add_coverage(
+            "publico",
+            "covid",
+            datetime.date(2021, 1, 10),
+            datetime.date(2021, 1, 20),
+            ["https://www.publico.pt/2"],
+        )
+        save_news([build_news("https://www.publico.pt/2")], "publico")
+
+        live = self.search(["covid"], *JANUARY)
+        local = self.search(["covid"], *JANUARY)
+
+        self.assertEqual(
+            self.collect_urls.call_args_list,
+            [
+                mock.call(
+                    "keyword",
+                    "covid",
+                    datetime.date(2021, 1, 21),
+                    datetime.date(2021, 1, 31),
+                ),
+                mock.call(
+                    "keyword",
+                    "covid",
+                    datetime.date(2021, 1, 1),
+                    datetime.date(2021, 1, 9),
+                ),
+            ],
+        )
+        self.assertCountEqual(live, RESULTS["covid"])
+        # Newest dates first, like a live search of the whole range
+        self.assertEqual(local, RESULTS["covid"])
+
+    def test_news_fetched_once(self):
+        """
+        Tests that the news found by several keywords are fetched once,
+        and recorded for each of them
+        """
+        self.search(["covid", "vacina"], *JANUARY)
+        local = self.search(["vacina"], *JANUARY)
+
+        self.url_search.assert_called_once_with(RESULTS["covid"])
+        self.assertEqual(self.collect_urls.call_count, 2)
+        self.assertEqual(local, RESULTS["vacina"])
+
+    def test_more_words(self):
+        """
+        Tests that searches of more words are answered by the full-text
+        index, within the news found by the live search of fewer words
+        """
+        save_news([build_news("https://www.publico.pt/4")], "publico")
+        self.search(["covid"], *JANUARY)
+
+        local = self.search(["Vacinas COVID"], *JANUARY)
+
+        self.collect_urls.assert_called_once()
+        # News 2 only has "covid" in its tags
+        self.assertEqual(
+            local, ["https://www.publico.pt/2", "https://www.publico.pt/1"]
+        )
+
+    def test_portuguese_words(self):
+        """
+        Tests that the index matches other forms of the same words
+        """
+        self.assertEqual(
+            stem_text("Eleições Autárquicas"),
+            stem_text("eleição autárquica"),
+        )
+        self.assertEqual(stem_text("Professoras"), stem_text("professor"))
+        self.assertNotEqual(stem_text("vacinação"), stem_text("vacina"))
+
+    @override_settings(NEWS_ARTICLE_STORE_MAX_AGE=0)
+    def test_disabled(self):
+        """
+        Tests that every search is live when the store is disabled
+        """
+        with mock.patch.object(
+            PublicoNewsFactory, "iter_live_keyword_search"
+        ) as live_search:
+            self.search(["covid"], *JANUARY)
+            self.search(["covid"], *JANUARY)
+
+        self.assertEqual(live_search.call_count, 2)
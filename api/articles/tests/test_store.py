@@ -0,0 +1,164 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core.tests.test_views import build_news
+from publico.models import PublicoNewsFactory
+from ..index import add_coverage
+from ..models import Article, Coverage
+from ..store import canonical_url, get_news, prune_news, save_news
+
+URL = "https://www.publico.pt/2021/01/31/politica/noticia/eleicoes-1"
+
+
+@override_settings(NEWS_ARTICLE_STORE_MAX_AGE=60)
+class ArticleStoreTest(TestCase):
+    def test_save_and_get(self):
+        """
+        Tests that saved news are found by any form of their URL
+        """
+        self.assertEqual(save_news([build_news(URL)], "publico"), 1)
+
+        stored = get_news([URL.replace("https", "http") + "/?ref=x"])
+
+        self.assertEqual(list(stored), [URL])
+        news = stored[URL]
+        self.assertEqual(news.as_dict(), build_news(URL).as_dict())
+        self.assertEqual(Article.objects.get().source, "publico")
+
+    def test_scraped_url(self):
+        """
+        Tests that stored news keep the URL they were scraped with
+        """
+        save_news([build_news(URL + "/")], "publico")
+
+        stored = get_news([URL])
+
+        self.assertEqual(stored[URL].url, URL + "/")
+
+    def test_aware_date(self):
+        """
+        Tests that timezone aware dates are read back as they were scraped
+        """
+        news = build_news(URL)
+        news.published_at = datetime.datetime(
+            2021,
+            1,
+            31,
+            0,
+            30,
+            tzinfo=datetime.timezone(datetime.timedelta(hours=1)),
+        )
+        save_news([news], "publico")
+
+        stored = get_news([URL])[URL]
+
+        self.assertEqual(stored.as_dict(), news.as_dict())
+        self.assertEqual(
+            stored.published_at.date(), datetime.date(2021, 1, 31)
+        )
+
+    def test_canonical_url(self):
+        self.assertEqual(
+            canonical_url("www.Publico.pt/noticia/1/#comments"),
+            "https://www.publico.pt/noticia/1",
+        )
+
+    def test_stale_news(self):
+        """
+        Tests that news scraped too long ago are not reused, and are
+        updated when saved again
+        """
+        save_news([build_news(URL)], "publico")
+        Article.objects.update(
+            scraped_at=datetime.datetime(
+                2021, 1, 1, tzinfo=datetime.timezone.utc
+            )
+        )
+
+        self.assertEqual(get_news([URL]), {})
+
+        news = build_news(URL)
+        news.title = "New title"
+        self.assertEqual(save_news([news], "publico"), 1)
+        self.assertEqual(get_news([URL])[URL].title, "New title")
+        self.assertEqual(Article.objects.count(), 1)
+
+    def test_fresh_news_not_rewritten(self):
+        """
+        Tests that news already stored (and fresh) are not saved again
+        """
+        save_news([build_news(URL)], "publico")
+
+        self.assertEqual(
+            save_news([build_news(URL), build_news(URL + "2")], "publico"),
+            1,
+        )
+        self.assertEqual(Article.objects.count(), 2)
+
+    def test_prune(self):
+        """
+        Tests that expired news and coverage are deleted, but not the news
+        of fresh coverage
+        """
+        save_news([build_news(URL), build_news(URL + "2")], "publico")
+        add_coverage(
+            "publico",
+            "eleições",
+            datetime.date(2021, 1, 1),
+            datetime.date(2021, 1, 31),
+            [URL],
+        )
+        Article.objects.update(
+            scraped_at=datetime.datetime(
+                2021, 1, 1, tzinfo=datetime.timezone.utc
+            )
+        )
+
+        self.assertEqual(prune_news(), 1)
+        self.assertEqual(Article.objects.get().url, URL)
+
+        Coverage.objects.update(
+            searched_at=datetime.datetime(
+                2021, 1, 1, tzinfo=datetime.timezone.utc
+            )
+        )
+
+        self.assertEqual(prune_news(), 1)
+        self.assertFalse(Article.objects.exists())
+        self.assertFalse(Coverage.objects.exists())
+
+    @mock.patch("articles.store._last_pruned", None)
+    @override_settings(NEWS_ARTICLE_STORE_PRUNE_INTERVAL=60)
+    def test_save_prunes(self):
+        """
+        Tests that saving news prunes the store, at most once per interval
+        """
+        with mock.patch("articles.store.prune_news") as prune:
+            save_news([build_news(URL)], "publico")
+            save_news([build_news(URL + "2")], "publico")
+
+        prune.assert_called_once_with()
+
+    @override_settings(NEWS_ARTICLE_STORE_MAX_AGE=0)
+    def test_disabled(self):
+        self.assertEqual(save_news([build_news(URL)], "publico"), 0)
+        self.assertEqual(get_news([URL]), {})
+
+    @mock.patch("core.models.get_session_store")
+    def test_url_search(self, get_session_store):
+        """
+        Tests that URL searches read the stored news, and only fetch
+        the others (keeping the order of the URLs)
+        """
+        save_news([build_news(URL)], "publico")
+        other_url = URL + "2"
+
+        with mock.patch.object(
+            PublicoNewsFactory, "_fetch_news", side_effect=build_news
+        ) as fetch_news:
+            news = list(PublicoNewsFactory.iter_url_search([other_url, URL]))
+
+        fetch_news.assert_called_once_with(other_url)
+        self.assertEqual([n.url for n in news], [other_url, URL])
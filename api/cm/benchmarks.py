@@ -0,0 +1,74 @@
+"""
+Contains CM's benchmarks (see `core.benchmarks`)
+"""
+import os
+from urllib.parse import urlparse
+
+from core.benchmarks import benchmark, extraction_benchmark, load_fixtures
+from core.utils import og_url
+
+from . import models
+from .models import CMNewsFactory
+
+# Full size news pages, saved with the tests
+FIXTURES = os.path.join(
+    os.path.dirname(__file__), "tests", "fixtures", "pages"
+)
+
+
+def legacy_extract(tree) -> tuple:
+    """
+    Extracts the fields of a news page with the string XPath expressions
+    searching the whole document (compiled on every call)
+    """
+    url = tree.xpath("//meta[@property='og:url']")[0].get("content")
+    is_opinion = urlparse(url).path.split("/")[1] == "opiniao"
+    if urlparse(url).netloc == "www.vidas.pt":
+        text = tree.xpath(
+            "//div[@class='text_container']//text()[not(ancestor::iframe)]"
+        )
+        description = tree.xpath("//div[@class='lead']//text()")[0]
+        date = tree.xpath("//div[@class='data']//text()")[0].replace("•", "")
+        authors = tree.xpath("//div[@class='autor']//text()")
+    else:
+        text = tree.xpath(
+            "//div[@class='texto_container paywall']//text()[not(ancestor::aside)][not(ancestor::div[@class='inContent'])][not(ancestor::blockquote)]"
+        )
+        if is_opinion:
+            description = tree.xpath("//p[@class='destaques_lead']//text()")[0]
+        else:
+            description = tree.xpath("//strong[@class='lead']//text()")[0]
+        date = tree.xpath("//span[@class='data']//text()")[0].replace("às", "")
+        authors = tree.xpath("//span[@class='autor']//text()")
+    title = tree.xpath("//div[@class='centro']//h1//text()")[0]
+    return url, title, " ".join(text), description, date, authors
+
+
+def extract(tree) -> tuple:
+    """
+    Extracts the fields of a news page with the compiled extraction plans
+    """
+    url = og_url(tree)
+    is_opinion = urlparse(url).path.split("/")[1] == "opiniao"
+    if urlparse(url).netloc == "www.vidas.pt":
+        parse_func = CMNewsFactory._parse_vidas_news_info
+    else:
+        parse_func = CMNewsFactory._parse_cm_news_info
+    text, description, date, authors = parse_func(tree, is_opinion)
+    title = models._TITLE(tree)[0]
+    return url, title, text, description, date, authors
+
+
+@benchmark("cm-extraction")
+def extraction(number: int, fixtures: str = None, **options) -> list:
+    """
+    Articles/second extracted from the saved news pages in the `fixtures`
+    directory (by default `FIXTURES`), with string XPath expressions vs the extraction plans
+    """
+    return extraction_benchmark(
+        load_fixtures(
+            fixtures or FIXTURES, ["www.cmjornal.pt", "www.vidas.pt"]
+        ),
+        {"string XPaths": legacy_extract, "extraction plans": extract},
+        number,
+    )
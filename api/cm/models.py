@@ -1,28 +1,68 @@
 """
 Module containg the concrete CMNewsFactory
 """
-import lxml
 import requests
 import datetime
 import os
 import json
-from lxml import html
+from contextlib import closing
+from typing import Iterator, Optional
 from urllib.parse import urlparse
 
-from typeguard import typechecked
-from core.utils import datetime_from_string
+from django.conf import settings
+
+from core import http
+from core.concurrency import iter_concurrently, iter_urls_cancellable
+from core.utils import LazyXPath, datetime_from_string, og_url
 
 
 from core.models import NewsFactory, News
+from core.typechecks import typechecked
 from core.exceptions import UnsupportedNews
 
 
+def _text_xpath(path: str) -> LazyXPath:
+    """
+    XPath expression returning text nodes as plain strings
+    (not "smart" ones, which keep a reference to the whole tree)
+    """
+    return LazyXPath(path, smart_strings=False)
+
+
+# Extraction plans of the news pages (CM's and Vidas'): XPath expressions
+# compiled once, instead of on every `tree.xpath` call. The text is only
+# searched inside the story container.
+_TITLE = _text_xpath("//div[@class='centro']//h1//text()")
+
+_CM_TEXT_CONTAINER = LazyXPath("//div[@class='texto_container paywall']")
+_CM_TEXT = _text_xpath(
+    ".//text()[not(ancestor::aside)]"
+    "[not(ancestor::div[@class='inContent'])][not(ancestor::blockquote)]"
+)
+_CM_LEAD = _text_xpath("//strong[@class='lead']//text()")
+_CM_OPINION_LEAD = _text_xpath("//p[@class='destaques_lead']//text()")
+_CM_DATE = _text_xpath("//span[@class='data']//text()")
+_CM_AUTHORS = _text_xpath("//span[@class='autor']//text()")
+
+_VIDAS_TEXT_CONTAINER = LazyXPath("//div[@class='text_container']")
+_VIDAS_TEXT = _text_xpath(".//text()[not(ancestor::iframe)]")
+_VIDAS_LEAD = _text_xpath("//div[@class='lead']//text()")
+_VIDAS_DATE = _text_xpath("//div[@class='data']//text()")
+_VIDAS_AUTHORS = _text_xpath("//div[@class='autor']//text()")
+
+
 @typechecked
 class CMNewsFactory(NewsFactory):
     """
     Performs and stores different types of search in CM's website
     """
 
+    # CM's tag listings have no dates
+    tag_listing_has_dates = False
+
+    # Cookie of CM's (ASP.NET) login, set by the login token URL
+    auth_cookies = (".ASPXAUTH",)
+
     @staticmethod
     def _login() -> requests.Session:
         """
@@ -30,7 +70,7 @@ class CMNewsFactory(NewsFactory):
         """
 
         # Create session
-        session = requests.Session()
+        session = http.build_session()
 
         payload = {
             "email": os.getenv("CM_USER", ""),
@@ -56,50 +96,67 @@ class CMNewsFactory(NewsFactory):
 
     @staticmethod
     def _parse_cm_news_info(html_tree, is_opinion) -> tuple:
-        text = html_tree.xpath(
-            "//div[@class='texto_container paywall']//text()[not(ancestor::aside)][not(ancestor::div[@class='inContent'])][not(ancestor::blockquote)]"
+        text = " ".join(
+            text
+            for container in _CM_TEXT_CONTAINER(html_tree)
+            for text in _CM_TEXT(container)
         )
-        text = " ".join(text)
 
         if is_opinion:
-            description = html_tree.xpath(
-                "//p[@class='destaques_lead']//text()"
-            )[0]
+            description = _CM_OPINION_LEAD(html_tree)[0]
         else:
-            description = html_tree.xpath("//strong[@class='lead']//text()")[0]
+            description = _CM_LEAD(html_tree)[0]
 
-        date = html_tree.xpath("//span[@class='data']//text()")[0].replace(
-            "às", ""
-        )
-        authors = html_tree.xpath("//span[@class='autor']//text()")
+        date = _CM_DATE(html_tree)[0].replace("às", "")
+        authors = _CM_AUTHORS(html_tree)
 
         return text, description, date, authors
 
     @staticmethod
     def _parse_vidas_news_info(html_tree, is_opinion):
 
-        text = html_tree.xpath(
-            "//div[@class='text_container']//text()[not(ancestor::iframe)]"
+        text = " ".join(
+            text
+            for container in _VIDAS_TEXT_CONTAINER(html_tree)
+            for text in _VIDAS_TEXT(container)
         )
-        text = " ".join(text)
 
-        description = html_tree.xpath("//div[@class='lead']//text()")[0]
-        date = html_tree.xpath("//div[@class='data']//text()")[0].replace(
-            "•", ""
-        )
+        description = _VIDAS_LEAD(html_tree)[0]
+        date = _VIDAS_DATE(html_tree)[0].replace("•", "")
 
-        authors = html_tree.xpath("//div[@class='autor']//text()")
+        authors = _VIDAS_AUTHORS(html_tree)
 
         return text, description, date, authors
 
-    def from_html_string(self, html_string: str) -> News:
+    def _required_elements(self, url: str) -> set[tuple[str, Optional[str]]]:
+        parsed_url = urlparse(url)
+        if parsed_url.netloc == "www.vidas.pt":
+            return {
+                ("div", "lead"),
+                ("div", "data"),
+                ("div", "autor"),
+                ("div", "text_container"),
+            }
+        if parsed_url.path.split("/")[1] == "opiniao":
+            lead = ("p", "destaques_lead")
+        else:
+            lead = ("strong", "lead")
+        # The title (in the "centro" column) comes before the text
+        return {
+            lead,
+            ("span", "data"),
+            ("span", "autor"),
+            ("div", "texto_container paywall"),
+        }
+
+    def from_html_tree(self, tree) -> News:
         """
-        Builds a News object from a given URL.
+        Builds a News object from a parsed news page.
 
         Parameters
         ----------
-        html_string : str
-            A news page HTML's string
+        tree : lxml.html.HtmlElement
+            A news page HTML's tree
 
         Returns
         -------
@@ -112,13 +169,9 @@ class CMNewsFactory(NewsFactory):
             If news is one of the following types: "interativo", "multimedia", "perguntas"
         """
 
-        # Build HTML tree
-        tree = html.fromstring(html_string)
-
         # Extract URL
-        try:
-            url = tree.xpath("//meta[@property='og:url']")[0].get("content")
-        except IndexError:
+        url = og_url(tree)
+        if url is None:
             raise UnsupportedNews
 
         # If news is of type 'interativo', 'multimedia' or 'perguntas' raise exception
@@ -172,7 +225,7 @@ class CMNewsFactory(NewsFactory):
         # CM text contains extra white, aswell as carriage
         text = " ".join(text.split())
         # Find title
-        title = tree.xpath("//div[@class='centro']//h1//text()")[0]
+        title = _TITLE(tree)[0]
 
         return News(
             title,
@@ -185,157 +238,234 @@ class CMNewsFactory(NewsFactory):
             text,
         )
 
+    @staticmethod
+    def _absolute_url(url: str) -> str:
+        """
+        Makes sure a listed news URL is correct (it might be a href)
+        """
+        return "https://www.cmjornal.pt" + url if url[0] == "/" else url
+
+    @classmethod
+    def _keyword_search_page_url(
+        cls,
+        keyword: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> str:
+        # Normalize keyword
+        keyword = keyword.lower().replace(" ", "-")
+        # CM returns news in batches of 9
+        index = page * 9
+        # Format dates
+        starting_date = starting_date.strftime("%d/%m/%Y")
+        ending_date = ending_date.strftime("%d/%m/%Y")
+        return f"https://www.cmjornal.pt/pesquisa/loadmore/?Query={keyword}&FirstPosition={index}&LastPosition={index+9}&Sort=Date&RangeType=Date&FromStr={starting_date}&ToStr={ending_date}&ContentType=All&X-Requested-With=XMLHttpRequest"
+
+    @classmethod
+    def _parse_keyword_search_page(
+        cls,
+        page_content: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> tuple[list[str], bool]:
+        # An empty response means there are no more results
+        if page_content == "\r\n":
+            return [], False
+
+        from lxml import html
+
+        urls = []
+        tree = html.fromstring(page_content)
+        for article in tree.xpath("//article"):
+            url = cls._absolute_url(
+                article.xpath(".//h2/a")[0].attrib["data-name"]
+            )
+            # Discard url junk
+            urls.append(url.split("?ref")[0])
+
+        return urls, True
+
+    @classmethod
+    def _tag_search_page_url(
+        cls,
+        tag: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> str:
+        # Normalize tag
+        tag = tag.lower().replace(" ", "-")
+        # CM tag search returns news in batches of 8
+        index = page * 8
+        return f"https://www.cmjornal.pt/{tag}/loadmore/?friendlyUrl={tag}&contentStartIndex={index}"
+
+    @classmethod
+    def _parse_tag_search_page(
+        cls,
+        page_content: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> tuple[list[str], bool]:
+        # An empty response means there are no more news
+        if page_content == "\r\n":
+            return [], False
+
+        from lxml import etree, html
+
+        try:
+            # Build HTML tree from response
+            tree = html.fromstring(page_content)
+        except etree.ParserError:
+            # In case of any parsing error we stop the search
+            return [], False
+
+        # Get urls present in this page. The listing has no dates, so
+        # the search can only be stopped after building the news.
+        urls = [
+            cls._absolute_url(article.xpath(".//h2/a")[0].attrib["data-name"])
+            for article in tree.xpath("//article")
+        ]
+        return urls, True
+
+    @classmethod
+    def _oldest_date_in_tag_page(
+        cls,
+        tag: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> Optional[datetime.date]:
+        # Listings have no dates, so we build the last (oldest) news of the
+        # page, falling back to the previous ones if it is unsupported
+        urls, _ = cls._parse_tag_search_page(
+            http.get(
+                cls._tag_search_page_url(tag, page, starting_date, ending_date)
+            ).text,
+            starting_date,
+            ending_date,
+        )
+        factory = cls()
+        for url in reversed(urls):
+            news = factory._fetch_news(url)
+            if news is not None:
+                return news.published_at.date()
+        return None
+
     @classmethod
-    def from_keyword_search(
+    def iter_live_keyword_search(
         cls,
         keywords: list[str],
         starting_date: datetime.date,
         ending_date: datetime.date,
-    ) -> NewsFactory:
+    ) -> Iterator[News]:
         """
         Searches news in CM's website by keywords in a date range.
         """
-        # Create news URL list
-        collected_news_urls = []
-
-        # Format dates
-        starting_date = starting_date.strftime("%d/%m/%Y")
-        ending_date = ending_date.strftime("%d/%m/%Y")
+        # Collect the news URLs from the search results
+        collected_news_urls = cls._collect_search_urls(
+            "keyword", keywords, starting_date, ending_date
+        )
 
-        # Iterate over the keywords
-        for keyword in keywords:
-            # Normalize keyword
-            keyword = keyword.lower().replace(" ", "-")
-            # Start position number
-            index = 0
-
-            while (
-                response := requests.get(
-                    f"https://www.cmjornal.pt/pesquisa/loadmore/?Query={keyword}&FirstPosition={index}&LastPosition={index+9}&Sort=Date&RangeType=Date&FromStr={starting_date}&ToStr={ending_date}&ContentType=All&X-Requested-With=XMLHttpRequest"
-                ).text
-            ) != "\r\n":
-
-                tree = html.fromstring(response)
-                for article in tree.xpath("//article"):
-                    url = article.xpath(".//h2/a")[0].attrib["data-name"]
-                    # Make sure URL is correct. Check if it's not a href
-                    url = (
-                        "https://www.cmjornal.pt" + url
-                        if url[0] == "/"
-                        else url
-                    )
-
-                    # Discard url junk
-                    url = url.split("?ref")[0]
-                    collected_news_urls.append(url)
-
-                # CM returns news in batches of 9
-                index += 9
-
-            # Remove (possible) duplicates
-            collected_news_urls = list(dict.fromkeys(collected_news_urls))
-
-            # Pass collected URLs to URL Search
-            return cls.from_url_search(collected_news_urls)
+        # Pass collected URLs to URL Search
+        yield from cls.iter_url_search(collected_news_urls)
 
     @classmethod
-    def from_tag_search(
+    def iter_tag_search(
         cls,
         tags: list[str],
         starting_date: datetime.date,
         ending_date: datetime.date,
-    ) -> NewsFactory:
+    ) -> Iterator[News]:
         """
         Searches news in CM's website by topic.
         This method is considerable slower than other because there is currently
         no known way to directly filter dates. So each news must be built from HTML string
-        directly.
+        directly. To reduce the cost, the listing pages newer than the date range
+        are skipped by probing a single news per page (see `_oldest_date_in_tag_page`).
         """
 
         # Create factory instance
         instance = cls()
 
-        # Iterate over the tags
-        for tag in tags:
-            # Normalize keyword
-            tag = tag.lower().replace(" ", "-")
-            # Start position number
-            index = 0
-
-            while (
-                response := requests.get(
-                    f"https://www.cmjornal.pt/{tag}/loadmore/?friendlyUrl={tag}&contentStartIndex={index}"
-                ).text
-            ) != "\r\n":
-
-                try:
-                    # Build HTML tree from response
-                    tree = html.fromstring(response)
-                except lxml.etree.ParserError:
-                    # In case of any parsing error we stop the search
-                    break
+        # Search the tags in parallel, yielding the news as they are found
+        news = iter_concurrently(
+            lambda tag: instance.__tag_search(tag, starting_date, ending_date),
+            tags,
+            max_workers=getattr(settings, "NEWS_SEARCH_MAX_PARALLEL_TERMS", 5),
+        )
+
+        # Remove (possible) duplicates
+        seen_urls = set()
+        with closing(news):
+            for single_news in news:
+                if single_news.url not in seen_urls:
+                    seen_urls.add(single_news.url)
+                    yield single_news
+
+    def __tag_search(
+        self,
+        tag: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> Iterator[News]:
+        """
+        Performs the tag search for a single tag, yielding the news
+        found page by page
+        """
+        # Skip the listing pages newer than the date range
+        start = self._find_tag_search_start(tag, starting_date, ending_date)
+        pages = self._iter_search_pages(
+            "tag", tag, starting_date, ending_date, start
+        )
+        # Stop prefetching pages once the search is over
+        with closing(pages):
+            for response in pages:
                 # Get urls present in this page
-                urls = [
-                    article.xpath(".//h2/a")[0].attrib["data-name"]
-                    for article in tree.xpath("//article")
-                ]
+                urls, should_continue_search = self._parse_tag_search_page(
+                    response, starting_date, ending_date
+                )
+                if not should_continue_search:
+                    break
 
                 # Call the internal method
-                should_continue_search = instance.__single_page_tag_search(
+                news, should_continue_search = self.__single_page_tag_search(
                     urls,
                     starting_date,
                     ending_date,
                 )
+                yield from news
 
                 # Check if we should break search (move to next tag)
                 if should_continue_search is False:
                     break
 
-                # CM tag search returns news in batches of 8
-                index += 8
-
-        return instance
-
     def __single_page_tag_search(
         self,
         urls: list[str],
         starting_date: datetime.date,
         ending_date: datetime.date,
-    ) -> bool:
+    ) -> tuple[list[News], bool]:
         """
         Performs the tag search on a single page. URLs present in the page
         should be passed as argument.
 
         Returns
         -------
-        bool
-            Whether the search should continue to the next page or should be halted.
+        tuple[list[News], bool]
+            The news of the page inside the date range, and whether the
+            search should continue to the next page or should be halted.
         """
-        for url in urls:
-            # Make sure URL is correct. Check if it's not a href
-            url = "https://www.cmjornal.pt" + url if url[0] == "/" else url
-
-            # Get news html
-            news_html = self.session.get(url).text
-
-            # Build news object. Since we are not using the default
-            # `from_url_search` we need to catch UnsupportedNews exception.
-            try:
-                news = self.from_html_string(news_html)
-            except UnsupportedNews:
-                # If the news is not supported skip ahead
-                continue
-
-            # Check if we are above date treshold. If so skip ahead
-            if news.published_at.date() > ending_date:
-                continue
-            # Check if we are bellow date treshold.
-            # If so we stop the search by returning "False"
-            if news.published_at.date() < starting_date:
-                return False
-            # If news inside date range we collect it
-            if starting_date <= news.published_at.date() <= ending_date:
-                self.news.append(news)
-
-        # Return True to continue the search to the next page
-        return True
+        # Build the news objects concurrently, but evaluate them in listing
+        # order. Unsupported news are returned as None
+        page_news = iter_urls_cancellable(
+            self._fetch_news,
+            urls,
+            max_workers=getattr(settings, "NEWS_FACTORY_MAX_WORKERS", 8),
+            max_per_host=getattr(settings, "NEWS_FACTORY_MAX_PER_HOST", 4),
+        )
+
+        # Collect the news inside the date range. Once the date treshold
+        # is crossed, closing `page_news` cancels the remaining downloads
+        with closing(page_news):
+            return self._filter_by_date(page_news, starting_date, ending_date)
@@ -0,0 +1,40 @@
+import os
+
+from django.test import SimpleTestCase
+from lxml import html
+
+from ..benchmarks import extract, legacy_extract
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class ExtractionTest(SimpleTestCase):
+    def parse(self, name):
+        with open(os.path.join(FIXTURES, name), "rb") as fixture:
+            return html.fromstring(fixture.read())
+
+    def test_extraction_plans(self):
+        """
+        Tests that the extraction plans find the same fields as the
+        string XPath expressions they replaced, for CM and Vidas
+        """
+        for name in [
+            "news.html",
+            "vidas.html",
+            os.path.join("pages", "article.html"),
+            os.path.join("pages", "vidas.html"),
+        ]:
+            with self.subTest(name):
+                tree = self.parse(name)
+                self.assertEqual(extract(tree), legacy_extract(tree))
+
+    def test_text_exclusions(self):
+        """
+        Tests that asides, ads and quotes are left out of CM's text
+        """
+        _, _, text, *_ = extract(self.parse("news.html"))
+
+        self.assertIn("Terceiro parágrafo", text)
+        self.assertNotIn("Leia também", text)
+        self.assertNotIn("Publicidade", text)
+        self.assertNotIn("Uma citação", text)
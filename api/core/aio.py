@@ -0,0 +1,374 @@
+"""
+Contains the asyncio based scraping engine.
+
+`AsyncNewsFactory` drives any concrete `NewsFactory` (its listing hooks and
+its `from_html_string`) over a single `httpx.AsyncClient`, keeping many
+requests in flight on one event loop with HTTP keep-alive (and HTTP/2 when
+enabled and the `h2` package is installed).
+
+Like the synchronous engine, news already in the article store (see
+`articles.store`) are read from it instead of being downloaded. Keyword
+searches are always searched live though: the local keyword search (see
+`articles.index`) only applies to the synchronous engine.
+"""
+from __future__ import annotations
+import asyncio
+import datetime
+from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import http
+from .exceptions import UnsupportedNews
+from .models import News, NewsFactory
+from .pagination import aiter_pages
+
+
+class AsyncNewsFactory:
+    """
+    Asyncio counterpart of a concrete news factory.
+
+    The async search methods return the same `NewsFactory` instance the
+    synchronous class methods would. `run` is a thin synchronous wrapper
+    around them, so it can be used from e.g. a Celery task.
+
+    Example
+    -------
+    >>> AsyncNewsFactory(PublicoNewsFactory).run("from_url_search", urls=urls)
+    """
+
+    def __init__(
+        self,
+        news_factory_class: type[NewsFactory],
+        max_connections: Optional[int] = None,
+        max_per_host: Optional[int] = None,
+        http2: Optional[bool] = None,
+    ) -> None:
+        self.news_factory_class = news_factory_class
+        self.max_connections = max_connections or getattr(
+            settings, "NEWS_FACTORY_ASYNC_MAX_CONNECTIONS", 32
+        )
+        self.max_per_host = max_per_host or getattr(
+            settings, "NEWS_FACTORY_ASYNC_MAX_PER_HOST", 16
+        )
+        self.http2 = (
+            http2
+            if http2 is not None
+            else getattr(settings, "NEWS_FACTORY_HTTP2", False)
+        )
+        # Set while a search is running
+        self.factory = None
+        self.client = None
+        self._host_semaphores = {}
+
+    def run(self, method: str, **kwargs) -> NewsFactory:
+        """
+        Runs one of the async search methods (e.g. "from_tag_search")
+        in a new event loop and returns its result.
+        """
+        return asyncio.run(getattr(self, method)(**kwargs))
+
+    @asynccontextmanager
+    async def _open(self):
+        """
+        Logs in (in a thread, since logins are blocking) and creates the
+        HTTP client, reusing the login cookies and headers.
+        """
+        self.factory = await asyncio.to_thread(self.news_factory_class)
+        connect_timeout, read_timeout = http.get_timeout()
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        async with httpx.AsyncClient(
+            headers=dict(self.factory.session.headers),
+            cookies=self.factory.session.cookies,
+            limits=limits,
+            http2=self.http2,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            follow_redirects=True,
+        ) as client:
+            self.client = client
+            try:
+                yield self.factory
+            finally:
+                self.client = None
+                self._host_semaphores = {}
+
+    async def _get(self, url: str) -> tuple[int, str]:
+        """
+        Makes a GET request, never running more than `max_per_host`
+        requests against the same host at once.
+        """
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+
+        async with self._host_semaphores[host]:
+            response = await self.client.get(url)
+        return response.status_code, response.text
+
+    async def _fetch_news(self, url: str) -> Optional[News]:
+        """
+        Async version of `NewsFactory._fetch_news`. Any extra resources
+        the factory needs (see `NewsFactory._prefetch_urls`) are downloaded
+        together with the news page.
+        """
+        url = self.factory._normalize_url(url)
+        extra_urls = self.factory._prefetch_urls(url)
+        (status_code, text), *extra = await asyncio.gather(
+            self._get(url),
+            *(self._get(extra_url) for extra_url in extra_urls),
+        )
+        if status_code != 200:
+            return None
+
+        # Hand the extra resources over to the factory
+        self.factory.prefetched.update(zip(extra_urls, extra))
+        try:
+            return self.factory.from_html_string(text)
+        except UnsupportedNews:
+            return None
+        finally:
+            for extra_url in extra_urls:
+                self.factory.prefetched.pop(extra_url, None)
+
+    async def _url_search(self, urls: list[str]) -> None:
+        """
+        Async version of `NewsFactory.iter_url_search`: the stored news
+        are read from the article store, the others are fetched
+        """
+        # Imported here, as the articles app depends on the core models
+        from articles.store import canonical_url, get_news
+
+        stored = await sync_to_async(get_news)(urls)
+        fetched = iter(
+            await asyncio.gather(
+                *(
+                    self._fetch_news(url)
+                    for url in urls
+                    if canonical_url(url) not in stored
+                )
+            )
+        )
+        for url in urls:
+            news_obj = stored.get(canonical_url(url))
+            if news_obj is None:
+                news_obj = next(fetched)
+            # Skip unsupported (or unreachable) news, keeping the URLs order
+            if news_obj is not None:
+                self.factory.news.append(news_obj)
+
+    def _iter_search_pages(
+        self,
+        search_type: str,
+        term: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+        start: int = 0,
+    ):
+        """
+        Async version of `NewsFactory._iter_search_pages`
+        """
+        page_url = getattr(self.factory, f"_{search_type}_search_page_url")
+
+        async def fetch_page(page: int) -> str:
+            _, text = await self._get(
+                page_url(term, page, starting_date, ending_date)
+            )
+            return text
+
+        return aiter_pages(
+            fetch_page,
+            start=start,
+            window=getattr(settings, "NEWS_PAGINATION_WINDOW", 4),
+        )
+
+    async def _find_tag_search_start(
+        self,
+        tag: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> int:
+        """
+        Runs `NewsFactory._find_tag_search_start` in a thread. Its probes
+        depend on each other, so there is little to gain from running
+        them on the event loop.
+        """
+        return await asyncio.to_thread(
+            self.factory._find_tag_search_start,
+            tag,
+            starting_date,
+            ending_date,
+        )
+
+    async def _collect_term_urls(
+        self,
+        search_type: str,
+        term: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> list[str]:
+        """
+        Walks the listing pages of a single search term
+        """
+        parse_page = getattr(self.factory, f"_parse_{search_type}_search_page")
+
+        # Skip the tag listing pages newer than the date range
+        start = (
+            await self._find_tag_search_start(term, starting_date, ending_date)
+            if search_type == "tag"
+            else 0
+        )
+
+        collected_news_urls = []
+        pages = self._iter_search_pages(
+            search_type, term, starting_date, ending_date, start
+        )
+        try:
+            async for text in pages:
+                urls, should_continue = parse_page(
+                    text, starting_date, ending_date
+                )
+                collected_news_urls += urls
+                if not should_continue:
+                    break
+        finally:
+            # Stop prefetching pages once the listing is over
+            await pages.aclose()
+        return collected_news_urls
+
+    async def _collect_term_news(
+        self,
+        term: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> list[News]:
+        """
+        Tag search for factories whose listings have no dates: the news of
+        each page are built concurrently and then filtered in listing order.
+        """
+        # Skip the listing pages newer than the date range
+        start = await self._find_tag_search_start(
+            term, starting_date, ending_date
+        )
+
+        collected_news = []
+        pages = self._iter_search_pages(
+            "tag", term, starting_date, ending_date, start
+        )
+        try:
+            async for text in pages:
+                urls, should_continue = self.factory._parse_tag_search_page(
+                    text, starting_date, ending_date
+                )
+                if not should_continue:
+                    break
+
+                news, should_continue = await self._filter_page_by_date(
+                    urls, starting_date, ending_date
+                )
+                collected_news += news
+                if not should_continue:
+                    break
+        finally:
+            # Stop prefetching pages once the search is over
+            await pages.aclose()
+        return collected_news
+
+    async def _filter_page_by_date(
+        self,
+        urls: list[str],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> tuple[list[News], bool]:
+        """
+        Builds the news of a listing page concurrently and filters them
+        (in listing order) with `NewsFactory._filter_by_date`. Downloads
+        still running once the date treshold is crossed are cancelled.
+        """
+        tasks = [asyncio.ensure_future(self._fetch_news(url)) for url in urls]
+        collected_news = []
+        try:
+            for task in tasks:
+                news, should_continue = self.factory._filter_by_date(
+                    [await task], starting_date, ending_date
+                )
+                collected_news += news
+                if not should_continue:
+                    return collected_news, False
+        finally:
+            for task in tasks:
+                task.cancel()
+        return collected_news, True
+
+    async def _search(
+        self,
+        search_type: str,
+        terms: list[str],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> NewsFactory:
+        async with self._open() as factory:
+            if search_type == "tag" and not factory.tag_listing_has_dates:
+                results = await asyncio.gather(
+                    *(
+                        self._collect_term_news(
+                            term, starting_date, ending_date
+                        )
+                        for term in terms
+                    )
+                )
+                for news in results:
+                    factory.news += news
+                return factory
+
+            # Search every term concurrently
+            results = await asyncio.gather(
+                *(
+                    self._collect_term_urls(
+                        search_type, term, starting_date, ending_date
+                    )
+                    for term in terms
+                )
+            )
+            # Remove (possible) duplicates
+            urls = list(dict.fromkeys(url for urls in results for url in urls))
+            await self._url_search(urls)
+            return factory
+
+    async def from_url_search(self, urls: list[str]) -> NewsFactory:
+        """
+        Async version of `NewsFactory.from_url_search`
+        """
+        async with self._open() as factory:
+            await self._url_search(urls)
+            return factory
+
+    async def from_tag_search(
+        self,
+        tags: list[str],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> NewsFactory:
+        """
+        Async version of `NewsFactory.from_tag_search`
+        """
+        return await self._search("tag", tags, starting_date, ending_date)
+
+    async def from_keyword_search(
+        self,
+        keywords: list[str],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> NewsFactory:
+        """
+        Async version of `NewsFactory.from_keyword_search`
+        """
+        return await self._search(
+            "keyword", keywords, starting_date, ending_date
+        )
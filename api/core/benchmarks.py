@@ -0,0 +1,332 @@
+"""
+Contains the performance benchmarks run by the `benchmark` management
+command (e.g. `python manage.py benchmark news`).
+
+Each benchmark is a function registered with `@benchmark`, taking the
+command options and returning the rows (label, value) of its report.
+Apps register their own benchmarks in a `benchmarks` module.
+"""
+import datetime
+import glob
+import inspect
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from lxml import html
+
+import typeguard
+
+from .models import News
+from .utils import _parse_dmy_datetime, datetime_from_string, og_url, to_json
+
+# Benchmark name -> function
+BENCHMARKS = {}
+
+
+def benchmark(name: str) -> Callable:
+    """
+    Registers a benchmark function under `name`
+    """
+
+    def register(func: Callable) -> Callable:
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def measure_time(func: Callable, number: int) -> float:
+    """
+    Returns the mean time of `func()`, in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number * 1e6
+
+
+def measure_memory(build: Callable[[], list]) -> int:
+    """
+    Returns the memory held by the objects `build()` returns, in bytes
+    """
+    tracemalloc.start()
+    try:
+        objects = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del objects
+    return size
+
+
+def load_fixtures(directory: Optional[str], hosts: list[str]) -> list:
+    """
+    Returns the parsed trees of the saved news pages (`*.html` files)
+    in `directory` whose `og:url` belongs to one of `hosts`
+    """
+    trees = []
+    for path in sorted(glob.glob(os.path.join(directory or "", "*.html"))):
+        with open(path, "rb") as fixture:
+            tree = html.fromstring(fixture.read())
+        url = og_url(tree)
+        if url and urlparse(url).netloc in hosts:
+            trees.append(tree)
+    return trees
+
+
+def extraction_benchmark(
+    trees: list, extractors: dict[str, Callable], number: int
+) -> list[tuple[str, str]]:
+    """
+    Compares the throughput (articles/second) of functions extracting
+    the fields of already parsed news pages. Every extractor must return
+    the same fields as the first one.
+    """
+    if not trees:
+        return [("fixtures", "none found")]
+
+    baseline = next(iter(extractors.values()))
+    for tree in trees:
+        expected = baseline(tree)
+        for label, extract in extractors.items():
+            if extract(tree) != expected:
+                raise AssertionError(f"{label} extracted different fields")
+
+    # Best of 5 runs, as other processes easily slow some of them down
+    rounds = max(number // len(trees) // 5, 1)
+    rows = [("fixtures", str(len(trees)))]
+    for label, extract in extractors.items():
+        mean = min(
+            measure_time(lambda: list(map(extract, trees)), rounds)
+            for _ in range(5)
+        )
+        rows.append((label, f"{len(trees) / mean * 1e6:.0f} articles/s"))
+    return rows
+
+
+class DictNews:
+    """
+    News stored in a per-instance `__dict__` without interned strings
+    (how `News` used to be), to compare against
+    """
+
+    def __init__(
+        self,
+        title,
+        description,
+        url,
+        rubric,
+        published_at,
+        authors,
+        is_opinion,
+        text,
+    ):
+        self.title = title
+        self.description = description
+        self.url = url
+        self.rubric = rubric
+        self.is_opinion = is_opinion
+        self.published_at = published_at
+        self.authors = authors
+        self.text = text
+
+    @property
+    def json(self):
+        return json.dumps(self.__dict__, default=str)
+
+
+def unchecked_news_class() -> type:
+    """
+    Returns a `News` class without runtime type checks
+    (whatever the `NEWS_TYPE_CHECKS` setting)
+    """
+    return type(
+        "UncheckedNews",
+        (News,),
+        {
+            "__slots__": (),
+            "__init__": inspect.unwrap(News.__init__),
+            "as_dict": inspect.unwrap(News.as_dict),
+        },
+    )
+
+
+def news_arguments(i: int) -> tuple:
+    """
+    Returns the arguments of a typical news. Strings are copied, as if
+    each news was parsed from its own page.
+    """
+
+    def copy(string: str) -> str:
+        return "".join(list(string))
+
+    return (
+        f"Título da notícia {i}",
+        "Descrição da notícia " * 5,
+        f"https://www.publico.pt/2021/01/31/politica/noticia/{i}",
+        copy("Política"),
+        datetime.datetime(2021, 1, 31, 16, 54, 12),
+        [copy("Luciano Alvarez"), copy("Maria Lopes")],
+        False,
+        # Shared between news, so only the record overhead is measured
+        "Texto",
+    )
+
+
+@benchmark("news")
+def news_benchmark(number: int, **options) -> list[tuple[str, str]]:
+    """
+    Per-news memory and CPU costs of the `News` records: dict vs slots
+    (with interned strings), typeguard on vs off, and double vs single
+    pass JSON encoding.
+    """
+    unchecked_news = unchecked_news_class()
+    checked_news = type(
+        "CheckedNews",
+        (unchecked_news,),
+        {
+            "__slots__": (),
+            "__init__": typeguard.typechecked(unchecked_news.__init__),
+        },
+    )
+
+    def build(news_class):
+        # The arguments are built inside, as if parsed from each page
+        return lambda: [news_class(*news_arguments(i)) for i in range(number)]
+
+    dict_memory = measure_memory(build(DictNews)) / number
+    slots_memory = measure_memory(build(unchecked_news)) / number
+
+    rows = [
+        ("memory per news (dict)", f"{dict_memory:.0f} B"),
+        ("memory per news (slots + interning)", f"{slots_memory:.0f} B"),
+    ]
+
+    args = news_arguments(0)
+    for label, news_class in [
+        ("build news (dict)", DictNews),
+        ("build news (slots, typeguard on)", checked_news),
+        ("build news (slots, typeguard off)", unchecked_news),
+    ]:
+        mean = measure_time(lambda: news_class(*args), number)
+        rows.append((label, f"{mean:.2f} us"))
+
+    # JSON of a 100 news factory
+    dict_news = [DictNews(*news_arguments(i)) for i in range(100)]
+    slots_news = [unchecked_news(*news_arguments(i)) for i in range(100)]
+    rows += [
+        (
+            "encode 100 news (double pass)",
+            "{:.2f} us".format(
+                measure_time(
+                    lambda: json.dumps([news.json for news in dict_news]),
+                    max(number // 100, 1),
+                )
+            ),
+        ),
+        (
+            "encode 100 news (single pass)",
+            "{:.2f} us".format(
+                measure_time(
+                    lambda: to_json([news.as_dict() for news in slots_news]),
+                    max(number // 100, 1),
+                )
+            ),
+        ),
+    ]
+    return rows
+
+
+@benchmark("dates")
+def dates_benchmark(number: int, **options) -> list[tuple[str, str]]:
+    """
+    Mean time to parse a CM/Vidas news date: dateparser vs the day first
+    fast path, without and with memoization
+    """
+    import dateparser
+
+    # A month of CM and Vidas dates (after the "às" and "•" cleanup)
+    date_strings = [
+        f"{day:02d}/03/2021  {day % 24:02d}:{day:02d}" for day in range(1, 32)
+    ] + [
+        f"{day:02d}.03.2021  {day % 24:02d}:{day:02d}" for day in range(1, 32)
+    ]
+
+    def parse_all(parse):
+        return lambda: [parse(date_string) for date_string in date_strings]
+
+    dmy = {"DATE_ORDER": "DMY"}
+    rounds = max(number // len(date_strings), 1)
+    rows = []
+    for label, parse, repetitions in [
+        (
+            "dateparser",
+            lambda date_string: dateparser.parse(date_string, settings=dmy),
+            # Much slower than the others
+            max(rounds // 100, 1),
+        ),
+        ("fast path", _parse_dmy_datetime.__wrapped__, rounds),
+        ("fast path (memoized)", datetime_from_string, rounds),
+    ]:
+        # Warm up (lazy imports and caches)
+        parse_all(parse)()
+        mean = measure_time(parse_all(parse), repetitions)
+        rows.append((label, f"{mean / len(date_strings):.2f} us"))
+    return rows
+
+
+# What a web or Celery process imports at startup
+STARTUP_CODE = """
+import time
+start = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+loaded = time.perf_counter()
+import django
+django.setup()
+import opennews.urls, opennews.celery
+print(loaded - start, time.perf_counter() - start)
+"""
+
+
+@benchmark("startup")
+def startup_benchmark(number: int, **options) -> list[tuple[str, str]]:
+    """
+    Startup cost of a process (with the current settings), measured in a
+    new interpreter: total time, time to load the settings (which may
+    fetch secrets) and the modules that take longest to import
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines are "import time: <self us> | <cumulative us> | <module>",
+    # indented modules being imported by the ones below them
+    cumulative = {}
+    for line in process.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        if not parts[2].startswith("  "):
+            cumulative[parts[2].strip()] = int(parts[1])
+
+    settings_time, total_time = map(float, process.stdout.split())
+    rows = [
+        ("total", f"{total_time * 1000:.1f} ms"),
+        # Including the `opennews` package, which loads Celery
+        ("settings", f"{settings_time * 1000:.1f} ms"),
+    ]
+    for module, time_us in sorted(
+        cumulative.items(), key=lambda item: item[1], reverse=True
+    )[:15]:
+        rows.append((module, f"{time_us / 1000:.1f} ms"))
+    return rows
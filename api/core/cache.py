@@ -0,0 +1,460 @@
+"""
+Contains the caching layers used by the news factories
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .http import PooledHTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Sentinel for cache misses (None is a valid cached value)
+_MISSING = object()
+
+
+class HTTPCache:
+    """
+    On-disk (SQLite) cache of HTTP responses, keyed by URL.
+
+    Entries keep their `ETag` and `Last-Modified` headers so they can be
+    revalidated with conditional requests once they are older than
+    `max_age` seconds. When the stored bodies exceed `max_size` bytes the
+    least recently used entries are evicted.
+
+    The database can be shared by several processes (e.g. Celery workers).
+    """
+
+    def __init__(self, path: str, max_age: int, max_size: int) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.max_size = max_size
+        # SQLite connections can't be shared between threads
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    status_code INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        if not hasattr(self._local, "connection"):
+            connection = sqlite3.connect(self.path, timeout=30)
+            # Allow readers while another process is writing
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return self._local.connection
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        Returns the cached entry for `url` (or None), marking it as used.
+        The entry has a `fresh` key telling if it can be used without
+        revalidation.
+        """
+        with self._connection as connection:
+            row = connection.execute(
+                "SELECT status_code, headers, body, stored_at "
+                "FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?",
+                (now, url),
+            )
+
+        status_code, headers, body, stored_at = row
+        return {
+            "status_code": status_code,
+            "headers": json.loads(headers),
+            "body": zlib.decompress(body),
+            "fresh": now - stored_at < self.max_age,
+        }
+
+    def set(self, url: str, status_code: int, headers: dict, body: bytes):
+        """
+        Stores a response, evicting old entries if the cache is too big
+        """
+        body = zlib.compress(body)
+        now = time.time()
+        with self._connection as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    status_code,
+                    json.dumps(headers),
+                    body,
+                    len(body),
+                    now,
+                    now,
+                ),
+            )
+        self._evict()
+
+    def refresh(self, url: str, headers: dict) -> None:
+        """
+        Marks an entry as fresh again (after a "304 Not Modified"),
+        updating its validators.
+        """
+        with self._connection as connection:
+            row = connection.execute(
+                "SELECT headers FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return
+            stored_headers = json.loads(row[0])
+            stored_headers.update(
+                {
+                    key: value
+                    for key, value in headers.items()
+                    if key.lower() in ("etag", "last-modified")
+                }
+            )
+            connection.execute(
+                "UPDATE responses SET headers = ?, stored_at = ? WHERE url = ?",
+                (json.dumps(stored_headers), time.time(), url),
+            )
+
+    def _evict(self) -> None:
+        """
+        Deletes the least recently used entries until the cache
+        is back under its size budget
+        """
+        with self._connection as connection:
+            (total_size,) = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            if total_size <= self.max_size:
+                return
+            excess = total_size - self.max_size
+            # Running sum of the sizes, from the least recently used entry
+            rows = connection.execute(
+                "SELECT url, size FROM responses ORDER BY accessed_at"
+            )
+            urls = []
+            for url, size in rows:
+                if excess <= 0:
+                    break
+                urls.append((url,))
+                excess -= size
+            connection.executemany("DELETE FROM responses WHERE url = ?", urls)
+
+
+class _CachingStream:
+    """
+    Wraps the raw body of a streamed response, calling `on_complete` with
+    the (decoded) body once it has been fully read. Bodies that are not
+    read until the end (e.g. aborted downloads) are never passed on.
+    """
+
+    # Readers that stop early should read the rest of the body (see
+    # `core.http.parse_until`), so that it is cached
+    caches_body = True
+
+    def __init__(self, raw, on_complete: Callable[[bytes], Any]) -> None:
+        self._raw = raw
+        self._on_complete = on_complete
+
+    def stream(self, amt: int = 2 ** 16, decode_content: bool = None):
+        chunks = []
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            chunks.append(chunk)
+            yield chunk
+        self._on_complete(b"".join(chunks))
+
+    def __getattr__(self, name: str):
+        return getattr(self._raw, name)
+
+
+class CachingHTTPAdapter(PooledHTTPAdapter):
+    """
+    Transport adapter that serves GET requests from an `HTTPCache`.
+    Fresh entries are returned without touching the network, and stale
+    ones are revalidated with a conditional GET.
+
+    Mount it on a `requests.Session` to cache every GET made through it.
+    Streamed responses are only stored once their body is fully read,
+    which streamed parses do even if they stop early (see
+    `core.http.parse_until`).
+    """
+
+    def __init__(self, cache: HTTPCache, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    def send(self, request, stream=False, **kwargs) -> Response:
+        if request.method != "GET":
+            return super().send(request, stream=stream, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry is not None and entry["fresh"]:
+            return self._build_cached_response(request, entry)
+
+        # Revalidate the stale entry with a conditional request
+        if entry is not None:
+            headers = CaseInsensitiveDict(entry["headers"])
+            if "etag" in headers:
+                request.headers["If-None-Match"] = headers["etag"]
+            if "last-modified" in headers:
+                request.headers["If-Modified-Since"] = headers["last-modified"]
+
+        response = super().send(request, stream=stream, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(request.url, dict(response.headers))
+            response.close()
+            return self._build_cached_response(request, entry)
+
+        if response.status_code == 200:
+            store = partial(
+                self.cache.set,
+                request.url,
+                response.status_code,
+                dict(response.headers),
+            )
+            if stream:
+                response.raw = _CachingStream(response.raw, store)
+            else:
+                store(response.content)
+
+        return response
+
+    @staticmethod
+    def _build_cached_response(request, entry: dict) -> Response:
+        """
+        Builds a `requests.Response` from a cache entry
+        """
+        response = Response()
+        response.status_code = entry["status_code"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        # The stored body is already decoded
+        response.headers.pop("content-encoding", None)
+        response.headers.pop("content-length", None)
+        response._content = entry["body"]
+        # Streamed requests read the body from `_content` as well
+        response._content_consumed = True
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = "OK"
+        return response
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache whose entries expire after `ttl` seconds,
+    holding at most `max_entries` (least recently used entries are evicted).
+
+    Values can also be shared through Redis (e.g. between the processes of
+    a worker) by passing a `redis_url`. In that case values must be JSON
+    serializable. Redis failures are ignored, falling back to memory only.
+
+    Concurrent `get_or_load` calls for the same key are coalesced: only one
+    of them runs the loader, the others wait for its result.
+    """
+
+    def __init__(
+        self,
+        ttl: int,
+        max_entries: int,
+        redis_url: Optional[str] = None,
+        namespace: str = "opennews",
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            # Only needed when sharing the cache
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+
+    def _redis_key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _get_local(self, key):
+        """
+        Returns the value stored in memory (or `_MISSING`)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key, value, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for `key`, or `default` if there is none
+        """
+        with self._lock:
+            value = self._get_local(key)
+        if value is not _MISSING:
+            return value
+
+        if self._redis is not None:
+            try:
+                with self._redis.pipeline() as pipe:
+                    stored, ttl = (
+                        pipe.get(self._redis_key(key))
+                        .pttl(self._redis_key(key))
+                        .execute()
+                    )
+            except redis_errors() as exc:
+                logger.warning("Redis cache lookup failed: %s", exc)
+            else:
+                if stored is not None:
+                    value = json.loads(stored)
+                    # Keep it in memory for the rest of its lifetime
+                    with self._lock:
+                        self._set_local(key, value, max(ttl, 0) / 1000)
+                    return value
+
+        return default
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def set(self, key, value) -> None:
+        """
+        Caches `value` under `key` for `ttl` seconds
+        """
+        with self._lock:
+            self._set_local(key, value, self.ttl)
+
+        if self._redis is not None:
+            try:
+                self._redis.set(
+                    self._redis_key(key), json.dumps(value), ex=self.ttl
+                )
+            except redis_errors() as exc:
+                logger.warning("Redis cache store failed: %s", exc)
+
+    def get_or_load(
+        self,
+        key,
+        loader: Callable[[], Any],
+        cache_if: Callable[[Any], bool] = lambda value: True,
+    ):
+        """
+        Returns the cached value for `key`, calling `loader` to build
+        (and cache) it if there is none. Values for which `cache_if`
+        returns False are returned but not cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            # Someone may have cached it in the meantime
+            value = self._get_local(key)
+            if value is not _MISSING:
+                return value
+            future = self._inflight.get(key)
+            is_loader = future is None
+            if is_loader:
+                future = self._inflight[key] = Future()
+
+        # Another thread is already loading this key, wait for it
+        if not is_loader:
+            return future.result()
+
+        try:
+            value = loader()
+            if cache_if(value):
+                self.set(key, value)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+        return value
+
+
+def redis_errors() -> tuple:
+    """
+    Returns the Redis exceptions that caches should tolerate
+    """
+    import redis
+
+    return (redis.exceptions.RedisError, OSError)
+
+
+# Per process `HTTPCache` instance (see `get_http_cache`)
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[HTTPCache]:
+    """
+    Returns the process wide HTTP cache configured in the settings,
+    or None if the cache is disabled (or can't be opened, e.g. when its
+    directory is not writable).
+    """
+    global _http_cache
+
+    if not getattr(settings, "NEWS_HTTP_CACHE_ENABLED", False):
+        return None
+
+    with _http_cache_lock:
+        if _http_cache is None:
+            try:
+                _http_cache = HTTPCache(
+                    path=os.path.join(
+                        settings.NEWS_HTTP_CACHE_DIR, "http-cache.sqlite3"
+                    ),
+                    max_age=settings.NEWS_HTTP_CACHE_MAX_AGE,
+                    max_size=settings.NEWS_HTTP_CACHE_MAX_SIZE,
+                )
+            except (OSError, sqlite3.Error) as exc:
+                logger.warning("HTTP cache disabled: %s", exc)
+                return None
+    return _http_cache
@@ -0,0 +1,207 @@
+"""
+Contains concurrency helpers shared by the news factories
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class HostLimiter:
+    """
+    Caps the number of concurrent requests made to a single host.
+    Each host gets its own bounded semaphore, created on first use.
+    """
+
+    def __init__(self, max_per_host: int) -> None:
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def for_url(self, url: str) -> threading.BoundedSemaphore:
+        """
+        Returns the semaphore guarding the host of `url`
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_per_host
+                )
+            return self._semaphores[host]
+
+
+# Process wide `HostLimiter` instances, by cap (see `get_host_limiter`)
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(max_per_host: int) -> HostLimiter:
+    """
+    Returns the process wide limiter with the given cap, so that the cap
+    holds across every concurrent search (e.g. the tags of a job, each
+    fetching its own pages)
+    """
+    with _host_limiters_lock:
+        if max_per_host not in _host_limiters:
+            _host_limiters[max_per_host] = HostLimiter(max_per_host)
+        return _host_limiters[max_per_host]
+
+
+def map_urls(
+    func: Callable[[str], T],
+    urls: Iterable[str],
+    max_workers: int,
+    max_per_host: int,
+) -> Iterator[T]:
+    """
+    Applies `func` to every URL using a bounded thread pool, never
+    running more than `max_per_host` calls against the same host at once
+    (across every call of this process, see `get_host_limiter`).
+
+    Results are yielded in the same order as `urls`, regardless of the
+    order in which the calls complete. With `max_workers` of 1 (or less)
+    the URLs are processed sequentially in the calling thread.
+    """
+    if max_workers <= 1:
+        yield from map(func, urls)
+        return
+
+    limiter = get_host_limiter(max_per_host)
+
+    def call(url: str) -> T:
+        with limiter.for_url(url):
+            return func(url)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # `executor.map` keeps the input order
+        yield from executor.map(call, urls)
+
+
+def iter_urls_cancellable(
+    func: Callable[[str, threading.Event], T],
+    urls: Iterable[str],
+    max_workers: int,
+    max_per_host: int,
+) -> Iterator[T]:
+    """
+    Like `map_urls`, but for consumers that may stop early: `func` also
+    receives a `threading.Event` that is set once the iterator is closed,
+    so in-flight calls can abort. Calls that did not start yet are
+    cancelled (and yield None if they were about to run).
+    """
+    limiter = get_host_limiter(max_per_host)
+    cancelled = threading.Event()
+
+    def call(url: str) -> T:
+        with limiter.for_url(url):
+            if cancelled.is_set():
+                return None
+            return func(url, cancelled)
+
+    executor = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+    futures = [executor.submit(call, url) for url in urls]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        cancelled.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def map_concurrently(
+    func: Callable[[T], R],
+    items: list[T],
+    max_workers: int,
+) -> list[R]:
+    """
+    Calls `func` on every item in its own thread (up to `max_workers` at
+    once) and returns the results in the same order as `items`. Used to
+    fan out the independent parts of a job, e.g. one search per keyword.
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(items))
+    ) as executor:
+        return list(executor.map(func, items))
+
+
+def iter_concurrently(
+    func: Callable[[T], Iterator[R]],
+    items: list[T],
+    max_workers: int,
+    buffer_size: int = 64,
+) -> Iterator[R]:
+    """
+    Runs the generators `func(item)` of every item in their own thread
+    (up to `max_workers` at once), yielding their values as soon as they
+    are produced. Values of different items are interleaved, but the
+    values of each item keep their order.
+
+    At most `buffer_size` values are kept waiting for the consumer, so
+    producers pause when it falls behind. Closing the iterator stops the
+    producers after their current value, and the items that did not
+    start yet are never run.
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield from func(item)
+        return
+
+    buffer = queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+    done = object()
+
+    def put(entry: tuple) -> bool:
+        # Wait for room in the buffer, unless the consumer is gone
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(item: T) -> None:
+        # The consumer may be gone before this item started
+        if stopped.is_set():
+            return
+        values = iter(())
+        try:
+            values = func(item)
+            for value in values:
+                if not put((value, None)):
+                    return
+        except BaseException as exc:
+            put((done, exc))
+        else:
+            put((done, None))
+        finally:
+            if hasattr(values, "close"):
+                values.close()
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    for item in items:
+        executor.submit(produce, item)
+    try:
+        remaining = len(items)
+        while remaining:
+            value, exc = buffer.get()
+            if exc is not None:
+                raise exc
+            if value is done:
+                remaining -= 1
+            else:
+                yield value
+    finally:
+        stopped.set()
+        # Items that did not start yet never run
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,173 @@
+"""
+Contains the HTTP client layer used for every outbound request.
+
+Sessions built here share the same connection pool sizes, keep-alive
+connections (so TLS handshakes are paid once per connection, not once per
+request), connect/read timeouts and User-Agent, all set in the settings.
+"""
+import threading
+from typing import Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+def get_timeout() -> tuple[float, float]:
+    """
+    Returns the configured (connect, read) timeouts, in seconds
+    """
+    return (
+        getattr(settings, "NEWS_HTTP_CONNECT_TIMEOUT", 5.0),
+        getattr(settings, "NEWS_HTTP_READ_TIMEOUT", 30.0),
+    )
+
+
+def get_user_agent() -> str:
+    """
+    Returns the User-Agent sent in every request
+    """
+    return getattr(
+        settings,
+        "NEWS_HTTP_USER_AGENT",
+        "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:40.0) Gecko/20100101 Firefox/40.1",
+    )
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    Transport adapter with the configured pool sizes, that applies
+    the default timeouts to requests made without one.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        # Number of hosts with a pool, and connections kept per host
+        kwargs.setdefault(
+            "pool_connections",
+            getattr(settings, "NEWS_HTTP_POOL_CONNECTIONS", 10),
+        )
+        kwargs.setdefault(
+            "pool_maxsize", getattr(settings, "NEWS_HTTP_POOL_MAXSIZE", 10)
+        )
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = get_timeout()
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+def build_session() -> requests.Session:
+    """
+    Creates a new `requests.Session` using pooled adapters
+    and the default headers.
+    """
+    session = requests.Session()
+    session.mount("https://", PooledHTTPAdapter())
+    session.mount("http://", PooledHTTPAdapter())
+    session.headers.update({"user-agent": get_user_agent()})
+    return session
+
+
+# Per process session for anonymous requests (see `get_session`)
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process wide session used for requests that don't need
+    authentication (listings, searches, APIs), so that their connections
+    are reused between jobs.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = build_session()
+    return _session
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    Makes a GET request through the shared session
+    """
+    return get_session().get(url, **kwargs)
+
+
+def read_unless_cancelled(
+    response: requests.Response,
+    cancelled: threading.Event,
+    chunk_size: int = 16 * 1024,
+) -> bool:
+    """
+    Reads the body of a streamed response, unless `cancelled` is set in
+    the meantime. In that case the download is aborted and the connection
+    closed.
+
+    Returns
+    -------
+    bool
+        Whether the body was fully read (available in `response.content`)
+    """
+    chunks = []
+    for chunk in response.iter_content(chunk_size):
+        if cancelled.is_set():
+            response.close()
+            return False
+        chunks.append(chunk)
+    # Make the body available as if the response was not streamed
+    response._content = b"".join(chunks)
+    return True
+
+
+def parse_until(
+    response: requests.Response,
+    required: set[tuple[str, Optional[str]]],
+    cancelled: Optional[threading.Event] = None,
+    chunk_size: int = 16 * 1024,
+) -> tuple:
+    """
+    Parses the body of a streamed HTML response while it is downloaded,
+    stopping (and closing the connection) as soon as every `required`
+    element has been closed. Elements are given as (tag, class) pairs,
+    where a None class matches any element with that tag.
+
+    The download is also aborted if `cancelled` is set in the meantime.
+
+    Responses on their way to the HTTP cache (see `core.cache`) are still
+    downloaded until the end, without parsing the rest, so that the page
+    is cached. Only the first download of a page pays for it.
+
+    Returns
+    -------
+    tuple
+        The parsed tree (None if cancelled), with the elements read so far,
+        and whether the download was stopped early
+    """
+    from lxml import etree, html
+
+    parser = etree.HTMLPullParser(events=("end",), encoding=response.encoding)
+    # Build `lxml.html` elements, like `html.fromstring`
+    parser.set_element_class_lookup(html.HtmlElementClassLookup())
+
+    remaining = set(required)
+    truncated = False
+    chunks = response.iter_content(chunk_size)
+    for chunk in chunks:
+        if cancelled is not None and cancelled.is_set():
+            response.close()
+            return None, False
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            remaining.discard((element.tag, element.get("class")))
+            remaining.discard((element.tag, None))
+        if not remaining:
+            if getattr(response.raw, "caches_body", False):
+                for _ in chunks:
+                    if cancelled is not None and cancelled.is_set():
+                        break
+            response.close()
+            truncated = True
+            break
+    return parser.close(), truncated
@@ -0,0 +1,38 @@
+"""
+Management command running the performance benchmarks
+"""
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from core.benchmarks import BENCHMARKS
+
+# Register the benchmarks of every app
+autodiscover_modules("benchmarks")
+
+
+class Command(BaseCommand):
+    help = "Runs the performance benchmarks (every benchmark by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "benchmarks",
+            nargs="*",
+            choices=sorted(BENCHMARKS),
+            help="Benchmarks to run",
+        )
+        parser.add_argument(
+            "--number",
+            type=int,
+            default=10000,
+            help="Number of repetitions (or records) per measure",
+        )
+        parser.add_argument(
+            "--fixtures",
+            help="Directory with saved news pages (.html files)",
+        )
+
+    def handle(self, *args, benchmarks, **options):
+        for name in benchmarks or sorted(BENCHMARKS):
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, value in BENCHMARKS[name](**options):
+                self.stdout.write(f"  {label:<45} {value:>12}")
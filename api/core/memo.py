@@ -0,0 +1,149 @@
+"""
+Contains the memo of the search jobs, so identical searches share a job.
+
+Each job is indexed in Redis by a hash of its arguments (see `job_key`).
+A search with the same arguments submitted while the job runs, or less
+than `ttl` seconds after it finished (e.g. the same tag over the last
+week, asked by many users), gets the id of that job instead of scraping
+everything again.
+"""
+import hashlib
+import threading
+from typing import Optional
+
+from django.conf import settings
+
+from .utils import to_json
+
+# Job arguments whose order matters (the news keep it)
+ORDERED_ARGUMENTS = {"urls"}
+
+
+def normalize_arguments(data: dict) -> dict:
+    """
+    Returns the job arguments in canonical form: strings are stripped, and
+    lists of search terms (e.g. tags) are sorted, without duplicates, as
+    their order does not change the news found
+    """
+
+    def normalize(key, value):
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, (list, tuple)):
+            values = [normalize(key, item) for item in value]
+            if key in ORDERED_ARGUMENTS:
+                return values
+            return sorted(set(values))
+        return value
+
+    return {key: normalize(key, value) for key, value in data.items()}
+
+
+def job_key(factory: str, method: str, data: dict) -> str:
+    """
+    Returns the hash identifying a job: the factory (name), the factory
+    method and the (normalized) arguments
+    """
+    canonical = to_json(
+        [factory, method, sorted(normalize_arguments(data).items())]
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class JobMemo:
+    """
+    Redis backed index of the jobs by their key. Jobs are indexed for
+    up to `running_ttl` seconds while they run, and for `ttl` seconds
+    once they finish (see `finish`).
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl: int,
+        running_ttl: Optional[int] = None,
+        namespace: str = "opennews:jobs",
+    ):
+        # `redis.Redis` client
+        self.client = client
+        self.ttl = ttl
+        self.running_ttl = max(running_ttl or 0, ttl)
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _job_key(self, job_id: str) -> str:
+        # Key of a job, so that it can be found when the job finishes
+        return f"{self.namespace}:job:{job_id}"
+
+    def claim(self, key: str, job_id: str) -> Optional[str]:
+        """
+        Indexes `job_id` under `key`, unless another job already is.
+        Returns the id of that other job (None if `job_id` was indexed).
+        """
+        # Atomic, so concurrent requests never both claim the key
+        if self.client.set(
+            self._key(key), job_id, nx=True, ex=self.running_ttl
+        ):
+            self.client.set(self._job_key(job_id), key, ex=self.running_ttl)
+            return None
+        existing = self.client.get(self._key(key))
+        if existing is None:
+            # Expired in the meantime
+            return self.claim(key, job_id)
+        return existing.decode()
+
+    def replace(self, key: str, job_id: str) -> None:
+        """
+        Indexes `job_id` under `key`, replacing any other job
+        """
+        self.client.set(self._key(key), job_id, ex=self.running_ttl)
+        self.client.set(self._job_key(job_id), key, ex=self.running_ttl)
+
+    def release(self, key: str, job_id: str) -> None:
+        """
+        Removes `key` from the index, if it still points to `job_id`
+        """
+        if self.client.get(self._key(key)) == job_id.encode():
+            self.client.delete(self._key(key), self._job_key(job_id))
+
+    def finish(self, job_id: str) -> None:
+        """
+        Keeps a job that just finished indexed for `ttl` more seconds
+        """
+        key = self.client.get(self._job_key(job_id))
+        if key is None:
+            return
+        key = key.decode()
+        if self.client.get(self._key(key)) == job_id.encode():
+            self.client.expire(self._key(key), self.ttl)
+        self.client.delete(self._job_key(job_id))
+
+
+# Per process `JobMemo` instance (see `get_job_memo`)
+_job_memo = None
+_job_memo_lock = threading.Lock()
+
+
+def get_job_memo() -> Optional[JobMemo]:
+    """
+    Returns the process wide job memo configured in the settings,
+    or None if jobs are not memoized.
+    """
+    global _job_memo
+
+    if not getattr(settings, "NEWS_JOB_MEMO_TTL", 0):
+        return None
+
+    with _job_memo_lock:
+        if _job_memo is None:
+            import redis
+
+            _job_memo = JobMemo(
+                redis.Redis.from_url(settings.NEWS_RESULTS_REDIS_URL),
+                ttl=settings.NEWS_JOB_MEMO_TTL,
+                # Running jobs are useless once their news expire
+                running_ttl=settings.NEWS_RESULTS_TTL,
+            )
+    return _job_memo
@@ -3,13 +3,16 @@ Contains the core news models
 """
 from __future__ import annotations
 import re
+import sys
 import datetime
+import inspect
+import threading
 from urllib.parse import urlparse
 import requests
-import json
-
-from typeguard import typechecked
+from contextlib import closing
+from typing import Iterable, Iterator, Optional
 
+from django.conf import settings
 
 from abc import (
     ABC,
@@ -18,7 +21,13 @@ from abc import (
     abstractstaticmethod,
 )
 
+from . import http
+from .concurrency import map_concurrently, map_urls
+from .pagination import find_first_page, iter_pages
 from .exceptions import UnsupportedNews
+from .sessions import get_session_store
+from .typechecks import typechecked
+from .utils import to_json
 
 
 @typechecked
@@ -29,8 +38,22 @@ class News(ABC):
     Type hints are hard checked, and a error is raised if type does not match the type hint.
 
     * Abstract class
+
+    News are kept in slots (there may be many thousands of them in memory),
+    and the strings shared by many news (rubric and authors) are interned.
     """
 
+    __slots__ = (
+        "title",
+        "description",
+        "url",
+        "rubric",
+        "published_at",
+        "authors",
+        "is_opinion",
+        "text",
+    )
+
     def __init__(
         self,
         title: str,
@@ -64,18 +87,26 @@ class News(ABC):
         text: str
             The news body.
         """
-        self.title = title
-        self.description = description
-        self.url = url
-        self.rubric = rubric
+        # Strings may be lxml "smart strings", which keep a reference to
+        # their whole HTML tree. Keep plain strings instead.
+        self.title = str(title)
+        self.description = str(description)
+        self.url = str(url)
+        self.rubric = sys.intern(str(rubric))
         self.is_opinion = is_opinion
         self.published_at = published_at
-        self.authors = authors
-        self.text = text
+        self.authors = [sys.intern(str(author)) for author in authors]
+        self.text = str(text)
+
+    def as_dict(self) -> dict:
+        """
+        Returns the news fields as a dict
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
 
     @property
     def json(self) -> str:
-        return json.dumps(self.__dict__)
+        return to_json(self.as_dict())
 
 
 @typechecked
@@ -87,10 +118,39 @@ class NewsFactory(ABC):
 
     """
 
+    # Whether tag search listings carry the news dates. When they don't,
+    # every listed news must be built to know if it is inside the date range.
+    tag_listing_has_dates: bool = True
+
+    # Names of the cookies the site keeps the login in. Sites serve their
+    # (paywalled) pages to logged out sessions as well, so a session is
+    # known to be logged out when the site drops one of them (see
+    # `_is_logged_out`). Sessions are also renewed as soon as one of them
+    # expires (see `core.sessions`).
+    auth_cookies: tuple[str, ...] = ()
+
     def __init__(self) -> None:
         # Empty list for storing found news
         self.news = []
-        self.session = self._login()
+        # Responses already downloaded by someone else (e.g. the async engine),
+        # indexed by URL. Consumed by `_get_text`.
+        self.prefetched = {}
+        # Logged in session, shared by every factory of this class
+        # in the process (see `core.sessions`)
+        self.session = get_session_store().get(type(self))
+
+    @classmethod
+    def registered_factories(cls) -> list:
+        """
+        Returns every concrete news factory class (i.e. the ones
+        defined by the installed apps)
+        """
+        factories = []
+        for subclass in cls.__subclasses__():
+            if not inspect.isabstract(subclass):
+                factories.append(subclass)
+            factories += subclass.registered_factories()
+        return factories
 
     @abstractstaticmethod
     def _login() -> requests.Session:
@@ -100,11 +160,183 @@ class NewsFactory(ABC):
         and return the login session.
         """
 
+    def _is_logged_out(self, response: requests.Response) -> bool:
+        """
+        Whether a news page response shows the session is no longer
+        logged in: it was refused, or the site dropped one of the login
+        cookies (see `auth_cookies`) the request was sent with.
+        Factories can override this with site specific checks.
+        """
+        if response.status_code in (401, 403):
+            return True
+
+        request = response.request
+        sent_cookies = request.headers.get("Cookie", "") if request else ""
+        sent = {
+            cookie.split("=", 1)[0].strip()
+            for cookie in sent_cookies.split(";")
+        }
+        kept = {cookie.name for cookie in self.session.cookies}
+        return any(
+            name in sent and name not in kept for name in self.auth_cookies
+        )
+
+    @staticmethod
+    def _normalize_url(url: str) -> str:
+        """
+        Forces the https schema on a news URL
+        """
+        return "https://" + re.sub(r"^.*?www", "www", url)
+
+    def _get_text(self, url: str) -> tuple[int, str]:
+        """
+        Returns the status code and body of a GET request to `url`.
+        Uses the prefetched response if there is one.
+        """
+        if url in self.prefetched:
+            return self.prefetched.pop(url)
+        response = http.get(url)
+        return response.status_code, response.text
+
+    def _prefetch_urls(self, url: str) -> list[str]:
+        """
+        Returns the URLs of any extra resources `from_html_string` will
+        request (through `_get_text`) to build the news at `url`.
+        Factories that need extra lookups should override this, so that
+        they can be downloaded ahead of time.
+        """
+        return []
+
+    def _fetch_news(
+        self,
+        url: str,
+        cancelled: Optional[threading.Event] = None,
+    ) -> Optional[News]:
+        """
+        Downloads and builds a single news from its URL.
+
+        If a `cancelled` event is given, the page is streamed and its
+        download aborted as soon as the event is set. With the
+        `NEWS_STREAMING_PARSE` setting the page is parsed while it is
+        streamed (see `_build_streamed`).
+
+        Returns
+        -------
+        News or None
+            The built news, or None if the page could not be fetched,
+            the news type is unsupported or the download was cancelled.
+        """
+        url = self._normalize_url(url)
+        streaming_parse = getattr(settings, "NEWS_STREAMING_PARSE", False)
+        stream = streaming_parse or cancelled is not None
+        # Make GET request
+        session = self.session
+        response = session.get(url, stream=stream)
+        # If we were logged out, log in again and retry once
+        if self._is_logged_out(response):
+            response.close()
+            get_session_store().invalidate(type(self), session)
+            self.session = get_session_store().get(type(self))
+            response = self.session.get(url, stream=stream)
+        if response.status_code != 200:
+            response.close()
+            return None
+        try:
+            if streaming_parse:
+                return self._build_streamed(url, response, cancelled)
+            if stream and not http.read_unless_cancelled(response, cancelled):
+                return None
+            return self.from_html_string(response.text)
+        # Catch unsupported news
+        except UnsupportedNews:
+            return None
+
+    def _build_streamed(
+        self,
+        url: str,
+        response: requests.Response,
+        cancelled: Optional[threading.Event] = None,
+    ) -> Optional[News]:
+        """
+        Builds a news while its (streamed) page is downloaded, stopping
+        the download once the elements `from_html_tree` needs are parsed
+        (see `_required_elements`). If the page turns out to miss some of
+        them, it is downloaded again in full.
+        """
+        tree, truncated = http.parse_until(
+            response, self._required_elements(url), cancelled
+        )
+        if tree is None:
+            return None
+        try:
+            return self.from_html_tree(tree)
+        except IndexError:
+            if not truncated:
+                raise
+        # Some field comes after the required elements
+        response = self.session.get(url)
+        if response.status_code != 200:
+            return None
+        return self.from_html_string(response.text)
+
+    def _required_elements(self, url: str) -> set[tuple[str, Optional[str]]]:
+        """
+        Returns the elements, as (tag, class) pairs, of the news page at
+        `url` after which it has every field `from_html_tree` reads. The
+        rest of the page is not downloaded (see `NEWS_STREAMING_PARSE`),
+        unless it is cached. Factories should override this, by default the whole page is read.
+        """
+        return {("html", None)}
+
+    @classmethod
+    def from_news(cls, news: Iterable[News]) -> NewsFactory:
+        """
+        Instanciates a news factory holding the given news
+        """
+        instance = cls()
+        instance.news = list(news)
+        return instance
+
+    @classmethod
+    def iter_url_search(cls, urls: list[str]) -> Iterator[News]:
+        """
+        Builds the news from a list of URLs, yielding them one by one
+        as they are ready (so callers don't need to hold every news).
+
+        News already in the article store (see `articles.store`) are read
+        from it. The others are fetched concurrently (see the
+        `NEWS_FACTORY_MAX_WORKERS` and `NEWS_FACTORY_MAX_PER_HOST`
+        settings), but the news keep the order of the given URLs.
+
+        Parameters
+        ----------
+        urls: list of str
+            List of strings containing news URLs
+        """
+        # Imported here, as the articles app depends on this module
+        from articles.store import canonical_url, get_news
+
+        stored = get_news(urls)
+        instance = cls()
+        fetched = map_urls(
+            instance._fetch_news,
+            [url for url in urls if canonical_url(url) not in stored],
+            max_workers=getattr(settings, "NEWS_FACTORY_MAX_WORKERS", 8),
+            max_per_host=getattr(settings, "NEWS_FACTORY_MAX_PER_HOST", 4),
+        )
+        for url in urls:
+            news_obj = stored.get(canonical_url(url))
+            if news_obj is None:
+                news_obj = next(fetched)
+            # Skip unsupported (or unreachable) news
+            if news_obj is not None:
+                yield news_obj
+
     @classmethod
     def from_url_search(cls, urls: list[str]) -> NewsFactory:
         """
         Instanciates a news factory, and build the news list from
-        a list of URLs.
+        a list of URLs (see `iter_url_search`).
 
         Parameters
         ----------
@@ -115,36 +347,284 @@ class NewsFactory(ABC):
         -------
         NewsFactory
         """
-        instance = cls()
-        for url in urls:
-            # Force https schema
-            url = "https://" + re.sub(r"^.*?www", "www", url)
-            # Make GET request
-            response = instance.session.get(url)
-            if response.status_code == 200:
-                try:
-                    news_obj = instance.from_html_string(response.text)
-                    instance.news.append(news_obj)
-                # Catch unsupported news
-                # Continue
-                except UnsupportedNews:
-                    continue
+        return cls.from_news(cls.iter_url_search(urls))
 
-        return instance
+    @abstractclassmethod
+    def _tag_search_page_url(
+        cls,
+        tag: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> str:
+        """
+        Child factories must return the URL of the tag search
+        listing page number `page` (starting at 0).
+        """
 
     @abstractclassmethod
-    def from_tag_search(
+    def _parse_tag_search_page(
+        cls,
+        page_content: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> tuple[list[str], bool]:
+        """
+        Child factories must parse a tag search listing page, returning
+        the news URLs found in it and whether the search should continue
+        to the next page.
+        """
+
+    @abstractclassmethod
+    def _keyword_search_page_url(
+        cls,
+        keyword: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> str:
+        """
+        Child factories must return the URL of the keyword search
+        listing page number `page` (starting at 0).
+        """
+
+    @abstractclassmethod
+    def _parse_keyword_search_page(
+        cls,
+        page_content: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> tuple[list[str], bool]:
+        """
+        Child factories must parse a keyword search listing page, returning
+        the news URLs found in it and whether the search should continue
+        to the next page.
+        """
+
+    @classmethod
+    def _iter_search_pages(
+        cls,
+        search_type: str,
+        term: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+        start: int = 0,
+    ) -> Iterator[str]:
+        """
+        Yields the content of the listing pages of a search (`search_type`
+        is either "tag" or "keyword") for a single term, in order, from
+        page `start` onwards. Upcoming pages are prefetched in parallel
+        (see `NEWS_PAGINATION_WINDOW`), so close the iterator as soon as
+        the listing is over.
+        """
+        page_url = getattr(cls, f"_{search_type}_search_page_url")
+
+        def fetch_page(page: int) -> str:
+            return http.get(
+                page_url(term, page, starting_date, ending_date)
+            ).text
+
+        return iter_pages(
+            fetch_page,
+            start=start,
+            window=getattr(settings, "NEWS_PAGINATION_WINDOW", 4),
+        )
+
+    @classmethod
+    def _oldest_date_in_tag_page(
+        cls,
+        tag: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> Optional[datetime.date]:
+        """
+        Returns the date of the oldest news in a tag search listing page,
+        or None if the page is empty or its date can't be cheaply known.
+        Factories that can probe their listings should override this, so
+        that tag searches skip the pages newer than the date range.
+        """
+        return None
+
+    @classmethod
+    def _find_tag_search_start(
+        cls,
+        tag: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> int:
+        """
+        Returns the first tag search listing page that overlaps the date
+        range, probing the listing with an exponential and binary search.
+        """
+        # Ranges up to today always start at the first page
+        if ending_date >= datetime.date.today():
+            return 0
+
+        def is_newer(page: int) -> bool:
+            oldest_date = cls._oldest_date_in_tag_page(
+                tag, page, starting_date, ending_date
+            )
+            return oldest_date is not None and oldest_date > ending_date
+
+        return find_first_page(is_newer)
+
+    @classmethod
+    def _collect_term_urls(
+        cls,
+        search_type: str,
+        term: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> list[str]:
+        """
+        Walks the listing pages of a search (`search_type` is either "tag"
+        or "keyword") for a single term and returns the collected news URLs.
+        """
+        parse_page = getattr(cls, f"_parse_{search_type}_search_page")
+
+        # Skip the tag listing pages newer than the date range
+        start = (
+            cls._find_tag_search_start(term, starting_date, ending_date)
+            if search_type == "tag"
+            else 0
+        )
+        pages = cls._iter_search_pages(
+            search_type, term, starting_date, ending_date, start
+        )
+
+        collected_news_urls = []
+        # Stop prefetching pages once the listing is over
+        with closing(pages):
+            for page_content in pages:
+                urls, should_continue = parse_page(
+                    page_content, starting_date, ending_date
+                )
+                collected_news_urls += urls
+                if not should_continue:
+                    break
+        return collected_news_urls
+
+    @classmethod
+    def _collect_search_urls(
+        cls,
+        search_type: str,
+        terms: list[str],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> list[str]:
+        """
+        Collects the news URLs of a search for every term, without
+        duplicates. Terms are searched in parallel, so a job costs about
+        as much as its slowest term.
+        """
+        urls_per_term = map_concurrently(
+            lambda term: cls._collect_term_urls(
+                search_type, term, starting_date, ending_date
+            ),
+            terms,
+            max_workers=getattr(settings, "NEWS_SEARCH_MAX_PARALLEL_TERMS", 5),
+        )
+
+        # Merge in the order of the terms, removing (possible) duplicates
+        return list(
+            dict.fromkeys(url for urls in urls_per_term for url in urls)
+        )
+
+    @staticmethod
+    def _filter_by_date(
+        news: Iterable[Optional[News]],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> tuple[list[News], bool]:
+        """
+        Filters a page of news (sorted from newest to oldest) by date.
+        `None` entries (unsupported news) are skipped. `news` is consumed
+        lazily, and only up to the first news older than `starting_date`.
+
+        Returns
+        -------
+        tuple
+            The news inside the date range and whether the search
+            should continue to the next page.
+        """
+        collected = []
+        for news_obj in news:
+            if news_obj is None:
+                continue
+            # Check if we are above date treshold. If so skip ahead
+            if news_obj.published_at.date() > ending_date:
+                continue
+            # Check if we are bellow date treshold.
+            # If so we stop the search
+            if news_obj.published_at.date() < starting_date:
+                return collected, False
+            # News inside date range, we collect it
+            collected.append(news_obj)
+
+        return collected, True
+
+    @abstractclassmethod
+    def iter_tag_search(
         cls,
         tags: list[str],
         starting_date: datetime.date,
         ending_date: datetime.date,
-    ) -> NewsFactory:
+    ) -> Iterator[News]:
         """
         Abstract class method that child classes must implement
-        to instantiate a factory with news collected from a tag search.
+        to yield the news collected from a tag search.
         """
 
     @abstractclassmethod
+    def iter_live_keyword_search(
+        cls,
+        keywords: list[str],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> Iterator[News]:
+        """
+        Abstract class method that child classes must implement
+        to yield the news collected from a keyword search in the
+        newspaper's website.
+        """
+
+    @classmethod
+    def iter_keyword_search(
+        cls,
+        keywords: list[str],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> Iterator[News]:
+        """
+        Yields the news collected from a keyword search. Dates already
+        searched for the keyword are answered from the article store's
+        full-text index, the others are searched live
+        (see `articles.index`).
+        """
+        # Imported here, as the article store needs the app registry
+        from articles.index import iter_keyword_search
+
+        yield from iter_keyword_search(
+            cls, keywords, starting_date, ending_date
+        )
+
+    @classmethod
+    def from_tag_search(
+        cls,
+        tags: list[str],
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> NewsFactory:
+        """
+        Instantiates a factory with news collected from a tag search
+        (see `iter_tag_search`).
+        """
+        return cls.from_news(
+            cls.iter_tag_search(tags, starting_date, ending_date)
+        )
+
+    @classmethod
     def from_keyword_search(
         cls,
         keywords: list[str],
@@ -152,17 +632,29 @@ class NewsFactory(ABC):
         ending_date: datetime.date,
     ) -> NewsFactory:
         """
-        Abstract class method that child classes must implement
-        to instantiate a factory with news collected from a keyword search.
+        Instantiates a factory with news collected from a keyword search
+        (see `iter_keyword_search`).
         """
+        return cls.from_news(
+            cls.iter_keyword_search(keywords, starting_date, ending_date)
+        )
 
-    @abstractmethod
     def from_html_string(self, html_string: str) -> News:
         """
-        Child factories must implement 'from_html_string' to
-        build a `News` object from a news html page.
+        Builds a `News` object from a news html page
+        """
+        from lxml import html
+
+        return self.from_html_tree(html.fromstring(html_string))
+
+    @abstractmethod
+    def from_html_tree(self, tree) -> News:
+        """
+        Child factories must implement 'from_html_tree' to
+        build a `News` object from a parsed news html page.
         """
 
     @property
-    def json(self):
-        return json.dumps([obj.json for obj in self.news])
+    def json(self) -> str:
+        # Encode every news in a single pass
+        return to_json([obj.as_dict() for obj in self.news])
@@ -0,0 +1,117 @@
+"""
+Contains the pagination engine used to walk search listings.
+
+Listings are walked page by page, but upcoming pages are requested
+speculatively (a `window` of pages is kept in flight), so the next page
+is usually ready by the time the current one is parsed. Consumers stop
+iterating at the first empty or date boundary page, and any over-fetched
+pages are cancelled or discarded.
+
+Listings sorted from newest to oldest can also be searched with
+`find_first_page`, to skip the pages that are newer than a date window.
+"""
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+def iter_pages(
+    fetch_page: Callable[[int], T],
+    start: int = 0,
+    window: int = 4,
+) -> Iterator[T]:
+    """
+    Yields `fetch_page(start)`, `fetch_page(start + 1)`, ... in order,
+    fetching up to `window` pages in parallel ahead of the consumer.
+
+    The iterator is endless: close it (or stop iterating) once a page
+    shows the listing is over. With a `window` of 1 (or less) pages are
+    fetched one by one in the calling thread.
+    """
+    page = start
+    if window <= 1:
+        while True:
+            yield fetch_page(page)
+            page += 1
+
+    executor = ThreadPoolExecutor(max_workers=window)
+    futures = deque()
+    try:
+        for page in range(start, start + window):
+            futures.append(executor.submit(fetch_page, page))
+        while True:
+            result = futures.popleft().result()
+            # Keep the window full
+            page += 1
+            futures.append(executor.submit(fetch_page, page))
+            yield result
+    finally:
+        # Discard the pages fetched ahead
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+async def aiter_pages(
+    fetch_page: Callable[[int], Awaitable[T]],
+    start: int = 0,
+    window: int = 4,
+) -> AsyncIterator[T]:
+    """
+    Async version of `iter_pages`. Remember to call `aclose()` when
+    stopping early, so that pages fetched ahead are cancelled right away.
+    """
+    window = max(window, 1)
+    tasks = deque(
+        asyncio.ensure_future(fetch_page(page))
+        for page in range(start, start + window)
+    )
+    page = start + window - 1
+    try:
+        while True:
+            result = await tasks.popleft()
+            # Keep the window full
+            page += 1
+            tasks.append(asyncio.ensure_future(fetch_page(page)))
+            yield result
+    finally:
+        # Discard the pages fetched ahead
+        for task in tasks:
+            task.cancel()
+
+
+def find_first_page(
+    is_newer: Callable[[int], bool],
+    start: int = 0,
+) -> int:
+    """
+    Returns the first page (from `start` onwards) for which `is_newer`
+    is False, assuming it is True up to some page and False from then on
+    (e.g. "every news in this page is newer than the date window").
+
+    Pages are probed with an exponential search (start + 1, 2, 4, 8, ...)
+    followed by a binary search, so only a logarithmic number of pages
+    is requested.
+    """
+    if not is_newer(start):
+        return start
+
+    # Exponential search: `lower` is newer, `upper` is not
+    lower, step = start, 1
+    while is_newer(start + step):
+        lower = start + step
+        step *= 2
+    upper = start + step
+
+    # Binary search between both bounds
+    while upper - lower > 1:
+        middle = (lower + upper) // 2
+        if is_newer(middle):
+            lower = middle
+        else:
+            upper = middle
+
+    return upper
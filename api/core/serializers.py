@@ -2,6 +2,7 @@
 Contains the core news serializers
 """
 from rest_framework import serializers
+from django.conf import settings
 from django.urls import reverse
 
 
@@ -68,16 +69,44 @@ class KeywordSearchSerializer(BaseDateSearchSerializer):
 
 class URLSearchSerializer(serializers.Serializer):
     """
-    Core serializer for URLs search
+    Core serializer for URLs search. URLs can either be given as a list,
+    or uploaded as a text file (one URL per line).
     """
 
     # The list of urls to search
     urls = serializers.ListField(
         child=serializers.URLField(),
         allow_empty=False,
-        max_length=200,  # Maximum 200 URLs
+        max_length=getattr(settings, "NEWS_URL_SEARCH_MAX_URLS", 20000),
+        required=False,
     )
 
+    # Text file with the urls to search (one per line)
+    urls_file = serializers.FileField(required=False, write_only=True)
+
+    def validate_urls_file(self, urls_file):
+        try:
+            lines = urls_file.read().decode("utf-8").splitlines()
+        except UnicodeDecodeError:
+            raise serializers.ValidationError("The file must be UTF-8 text.")
+
+        # Validate the URLs (skipping blank lines) as if they were listed
+        return self.fields["urls"].run_validation(
+            [line.strip() for line in lines if line.strip()]
+        )
+
+    def validate(self, attrs):
+        # Exactly one of the URL sources must be given
+        if ("urls" in attrs) == ("urls_file" in attrs):
+            raise serializers.ValidationError(
+                "Please provide either 'urls' or 'urls_file'."
+            )
+
+        if "urls_file" in attrs:
+            attrs["urls"] = attrs.pop("urls_file")
+
+        return super().validate(attrs)
+
 
 class NewsSerializer(serializers.Serializer):
     """
@@ -0,0 +1,217 @@
+"""
+Contains the store of authenticated sessions used by the news factories.
+
+Logging in is slow, so each process keeps one logged in session per
+factory class and reuses it for every job. The login cookies can also be
+shared through Redis, so that other processes (and containers) skip the
+login as well. Sessions are renewed after `NEWS_SESSION_TTL` seconds, as
+soon as one of their cookies expires, or when a factory detects it was
+logged out.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Optional
+
+import requests
+from django.conf import settings
+from requests.cookies import create_cookie
+
+from . import http
+from .cache import CachingHTTPAdapter, get_http_cache, redis_errors
+
+logger = logging.getLogger(__name__)
+
+
+def dump_cookies(session: requests.Session) -> str:
+    """
+    Serializes the cookies of a session to JSON
+    """
+    return json.dumps(
+        [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+                "secure": cookie.secure,
+                "rest": cookie._rest,
+            }
+            for cookie in session.cookies
+        ]
+    )
+
+
+def load_cookies(session: requests.Session, cookies: str) -> None:
+    """
+    Adds the cookies serialized with `dump_cookies` to a session
+    """
+    for cookie in json.loads(cookies):
+        session.cookies.set_cookie(create_cookie(**cookie))
+
+
+class SessionStore:
+    """
+    Per process store of logged in sessions, indexed by factory class
+    """
+
+    def __init__(self, ttl: int, redis_url: Optional[str] = None) -> None:
+        self.ttl = ttl
+        # Factory class -> (session, expiration timestamp)
+        self._sessions = {}
+        # One lock per factory class, so that concurrent jobs
+        # wait for a single login instead of logging in again
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            # Only needed when sharing the sessions
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+
+    def _lock(self, factory_class) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(factory_class, threading.Lock())
+
+    @staticmethod
+    def _redis_key(factory_class) -> str:
+        return f"opennews:session:{factory_class.__module__}.{factory_class.__name__}"
+
+    def _expires_at(self, factory_class, session: requests.Session) -> float:
+        """
+        Returns when a session must be renewed: after `ttl` seconds, or as
+        soon as one of its login cookies expires. Other cookies (e.g. for
+        tracking) may be short lived, and don't matter.
+        """
+        auth_cookies = getattr(factory_class, "auth_cookies", ())
+        return min(
+            [time.time() + self.ttl]
+            + [
+                cookie.expires
+                for cookie in session.cookies
+                if cookie.expires and cookie.name in auth_cookies
+            ]
+        )
+
+    def _load_shared(self, factory_class) -> Optional[requests.Session]:
+        """
+        Builds a session from the cookies shared in Redis (if any)
+        """
+        if self._redis is None:
+            return None
+        try:
+            cookies = self._redis.get(self._redis_key(factory_class))
+        except redis_errors() as exc:
+            logger.warning("Could not load shared session: %s", exc)
+            return None
+        if cookies is None:
+            return None
+
+        session = http.build_session()
+        load_cookies(session, cookies)
+        return session
+
+    def _share(self, factory_class, session: requests.Session) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.set(
+                self._redis_key(factory_class),
+                dump_cookies(session),
+                ex=self.ttl,
+            )
+        except redis_errors() as exc:
+            logger.warning("Could not share session: %s", exc)
+
+    def _unshare(self, factory_class) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.delete(self._redis_key(factory_class))
+        except redis_errors() as exc:
+            logger.warning("Could not delete shared session: %s", exc)
+
+    @staticmethod
+    def _prepare(session: requests.Session) -> requests.Session:
+        """
+        Serve news pages from the on-disk HTTP cache (when enabled).
+        Mounted after the login, so only news pages go through it.
+        """
+        http_cache = get_http_cache()
+        if http_cache is not None:
+            session.mount("https://", CachingHTTPAdapter(http_cache))
+        return session
+
+    def get(self, factory_class) -> requests.Session:
+        """
+        Returns a logged in session for `factory_class`, logging in
+        only if there is no valid session in this process or in Redis
+        """
+        with self._lock(factory_class):
+            if factory_class in self._sessions:
+                session, expires_at = self._sessions[factory_class]
+                if expires_at > time.time():
+                    return session
+
+            session = self._load_shared(factory_class)
+            if session is None:
+                session = factory_class._login()
+                self._share(factory_class, session)
+
+            session = self._prepare(session)
+            self._sessions[factory_class] = (
+                session,
+                self._expires_at(factory_class, session),
+            )
+            return session
+
+    def invalidate(self, factory_class, session: requests.Session) -> None:
+        """
+        Discards `session` (e.g. after an authentication failure),
+        so that the next `get` logs in again. Does nothing if the
+        session was already replaced by another thread.
+        """
+        with self._lock(factory_class):
+            current = self._sessions.get(factory_class)
+            if current is not None and current[0] is session:
+                del self._sessions[factory_class]
+                self._unshare(factory_class)
+
+
+# Per process `SessionStore` instance (see `get_session_store`)
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    Returns the process wide session store configured in the settings
+    """
+    global _session_store
+
+    with _session_store_lock:
+        if _session_store is None:
+            _session_store = SessionStore(
+                ttl=getattr(settings, "NEWS_SESSION_TTL", 6 * 60 * 60),
+                redis_url=getattr(settings, "NEWS_SESSION_REDIS_URL", ""),
+            )
+    return _session_store
+
+
+def prewarm_sessions() -> None:
+    """
+    Logs in every registered news factory, so that the first job
+    of a worker process does not pay the login cost
+    """
+    # Imported here to avoid a circular import
+    from .models import NewsFactory
+
+    for factory_class in NewsFactory.registered_factories():
+        try:
+            get_session_store().get(factory_class)
+        except Exception:
+            # The job will try to log in again
+            logger.exception("Could not pre-warm %s", factory_class.__name__)
@@ -0,0 +1,280 @@
+import asyncio
+import datetime
+import json
+from unittest import mock
+from urllib.parse import parse_qs
+
+import httpx
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from ..aio import AsyncNewsFactory
+from ..models import News, NewsFactory
+
+# News of the fake newspaper (by id), from newest to oldest
+DATES = [datetime.datetime(2021, 1, 20 - i, 12) for i in range(10)]
+# News per tag listing page
+PAGE_SIZE = 3
+
+
+def news_url(news_id):
+    return f"https://www.news.pt/noticia-{news_id}"
+
+
+class FakeNewsFactory(NewsFactory):
+    """
+    News factory of a fake newspaper, whose pages are served
+    by `FakeNewspaper`
+    """
+
+    @staticmethod
+    def _login():
+        return requests.Session()
+
+    @classmethod
+    def _tag_search_page_url(cls, tag, page, starting_date, ending_date):
+        return f"https://www.news.pt/tag/{tag}?page={page}"
+
+    @classmethod
+    def _parse_tag_search_page(cls, page_content, starting_date, ending_date):
+        items = json.loads(page_content)
+        if not items:
+            return [], False
+        if not cls.tag_listing_has_dates:
+            return [item["url"] for item in items], True
+        urls = []
+        for item in items:
+            date = datetime.date.fromisoformat(item["date"])
+            if date < starting_date:
+                return urls, False
+            if date <= ending_date:
+                urls.append(item["url"])
+        return urls, True
+
+    @classmethod
+    def _keyword_search_page_url(
+        cls, keyword, page, starting_date, ending_date
+    ):
+        return f"https://www.news.pt/search?query={keyword}&page={page}"
+
+    @classmethod
+    def _parse_keyword_search_page(
+        cls, page_content, starting_date, ending_date
+    ):
+        items = json.loads(page_content)
+        return [item["url"] for item in items], bool(items)
+
+    @classmethod
+    def iter_tag_search(cls, tags, starting_date, ending_date):
+        raise NotImplementedError
+
+    @classmethod
+    def iter_live_keyword_search(cls, keywords, starting_date, ending_date):
+        raise NotImplementedError
+
+    def from_html_tree(self, tree):
+        return News(
+            tree.findtext(".//h1"),
+            "",
+            tree.find(".//link[@rel='canonical']").get("href"),
+            "Política",
+            datetime.datetime.fromisoformat(
+                tree.find(".//time").get("datetime")
+            ),
+            [],
+            False,
+            tree.findtext(".//p"),
+        )
+
+
+class FakeNewspaper:
+    """
+    Serves the pages of the fake newspaper (as an `httpx.MockTransport`
+    handler), recording the requests. News pages listed in `delays`
+    take that many seconds to be served.
+    """
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.requested = []
+        self.served = []
+        # Requests being served, and the most at once
+        self.active = 0
+        self.max_active = 0
+
+    def listing(self, news_ids):
+        return json.dumps(
+            [
+                {"url": news_url(news_id), "date": str(DATES[news_id].date())}
+                for news_id in news_ids
+            ]
+        )
+
+    def news_page(self, news_id):
+        return (
+            f"<html><head><link rel='canonical' href='{news_url(news_id)}'>"
+            f"</head><body><h1>Notícia {news_id}</h1>"
+            f"<time datetime='{DATES[news_id].isoformat()}'></time>"
+            f"<p>Texto</p></body></html>"
+        )
+
+    def route(self, url):
+        path, query = url.path, parse_qs(url.query.decode())
+        if path.startswith("/tag/"):
+            page = int(query["page"][0])
+            news_ids = range(len(DATES))[
+                page * PAGE_SIZE : (page + 1) * PAGE_SIZE
+            ]
+            return 200, self.listing(news_ids)
+        if path == "/search":
+            pages = {"covid": [[3, 1], [2]], "vacina": [[2, 5]]}
+            results = pages.get(query["query"][0], [])
+            page = int(query["page"][0])
+            return 200, self.listing(
+                results[page] if page < len(results) else []
+            )
+        if path.startswith("/noticia-"):
+            news_id = int(path.split("-")[-1])
+            if news_id < len(DATES):
+                return 200, self.news_page(news_id)
+        return 404, "Not found"
+
+    async def __call__(self, request):
+        url = str(request.url)
+        self.requested.append(url)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(url, 0.01))
+        finally:
+            self.active -= 1
+        self.served.append(url)
+        status_code, text = self.route(request.url)
+        return httpx.Response(status_code, text=text)
+
+
+@override_settings(NEWS_ARTICLE_STORE_MAX_AGE=0)
+class AsyncNewsFactoryTest(SimpleTestCase):
+    def setUp(self):
+        self.newspaper = FakeNewspaper()
+
+        # Serve every request from the fake newspaper
+        async_client = httpx.AsyncClient
+
+        def build_client(**kwargs):
+            transport = httpx.MockTransport(self.newspaper)
+            return async_client(transport=transport, **kwargs)
+
+        patcher = mock.patch("httpx.AsyncClient", side_effect=build_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Don't log in (nor share the session)
+        patcher = mock.patch("core.models.get_session_store")
+        patcher.start().return_value.get.return_value = requests.Session()
+        self.addCleanup(patcher.stop)
+
+    def run_search(self, method, max_per_host=None, **kwargs):
+        factory = AsyncNewsFactory(
+            FakeNewsFactory, max_per_host=max_per_host
+        ).run(method, **kwargs)
+        return [news.url for news in factory.news]
+
+    def test_url_search(self):
+        """
+        Tests that the news are returned in the order of the URLs,
+        however long each one takes, skipping the missing ones
+        """
+        self.newspaper.delays = {news_url(2): 0.1, news_url(0): 0.05}
+        urls = [news_url(2), news_url(99), news_url(0), news_url(1)]
+
+        self.assertEqual(
+            self.run_search("from_url_search", urls=urls),
+            [news_url(2), news_url(0), news_url(1)],
+        )
+        # Later URLs did not wait for the slow ones
+        self.assertLess(
+            self.newspaper.served.index(news_url(1)),
+            self.newspaper.served.index(news_url(2)),
+        )
+
+    @override_settings(NEWS_ARTICLE_STORE_MAX_AGE=60)
+    @mock.patch("articles.store.get_news")
+    def test_stored_news(self, get_news):
+        """
+        Tests that the news in the article store are not downloaded,
+        but keep their place among the others
+        """
+        stored = FakeNewsFactory().from_html_string(
+            self.newspaper.news_page(1)
+        )
+        get_news.return_value = {news_url(1): stored}
+        urls = [news_url(2), news_url(1), news_url(0)]
+
+        self.assertEqual(self.run_search("from_url_search", urls=urls), urls)
+        self.assertNotIn(news_url(1), self.newspaper.requested)
+
+    def test_max_per_host(self):
+        """
+        Tests that at most `max_per_host` requests run at once
+        """
+        urls = [news_url(news_id) for news_id in range(6)]
+
+        news = self.run_search("from_url_search", max_per_host=2, urls=urls)
+
+        self.assertEqual(news, urls)
+        self.assertEqual(self.newspaper.max_active, 2)
+
+    def test_tag_search(self):
+        """
+        Tests that a tag search collects the news inside the date range,
+        in listing order, and stops at the first page past it
+        """
+        news = self.run_search(
+            "from_tag_search",
+            tags=["politica"],
+            starting_date=datetime.date(2021, 1, 13),
+            ending_date=datetime.date(2021, 1, 18),
+        )
+
+        self.assertEqual(news, [news_url(news_id) for news_id in range(2, 8)])
+        # News outside the date range were never downloaded
+        self.assertNotIn(news_url(0), self.newspaper.requested)
+        self.assertNotIn(news_url(8), self.newspaper.requested)
+
+    def test_keyword_search(self):
+        """
+        Tests that the news of every keyword are collected in the order
+        of the keywords and results, without duplicates
+        """
+        news = self.run_search(
+            "from_keyword_search",
+            keywords=["covid", "vacina"],
+            starting_date=datetime.date(2021, 1, 1),
+            ending_date=datetime.date(2021, 1, 31),
+        )
+
+        self.assertEqual(
+            news, [news_url(3), news_url(1), news_url(2), news_url(5)]
+        )
+
+    @mock.patch.object(FakeNewsFactory, "tag_listing_has_dates", False)
+    def test_tag_search_cancellation(self):
+        """
+        Tests that, when the listings have no dates, the news are filtered
+        in listing order and the downloads still running once the date
+        range is over are cancelled
+        """
+        self.newspaper.delays = {news_url(7): 5, news_url(8): 5}
+
+        news = self.run_search(
+            "from_tag_search",
+            tags=["politica"],
+            starting_date=datetime.date(2021, 1, 15),
+            ending_date=datetime.date(2021, 1, 18),
+        )
+
+        self.assertEqual(news, [news_url(news_id) for news_id in range(2, 6)])
+        self.assertIn(news_url(7), self.newspaper.requested)
+        self.assertNotIn(news_url(7), self.newspaper.served)
+        self.assertNotIn(news_url(8), self.newspaper.served)
@@ -0,0 +1,214 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+import requests
+from django.test import SimpleTestCase, override_settings
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from urllib3.response import HTTPResponse
+
+from ..cache import CachingHTTPAdapter, HTTPCache, TTLCache, get_http_cache
+from ..http import parse_until
+
+
+def build_response(status_code, body=b"", headers=None):
+    response = Response()
+    response.status_code = status_code
+    response._content = body
+    response.raw = io.BytesIO(body)
+    response.headers.update(headers or {})
+    return response
+
+
+class HTTPCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lru_eviction(self):
+        """
+        Tests that the least recently used entries are evicted
+        once the size budget is exceeded
+        """
+        cache = HTTPCache(self.path, max_age=60, max_size=120)
+        # Random bytes don't compress, so each entry takes 45-51 bytes:
+        # two entries fit in the budget, three don't
+        for url in ["a", "b"]:
+            cache.set(url, 200, {}, os.urandom(40))
+        # Use "a", so that "b" becomes the least recently used
+        cache.get("a")
+        cache.set("c", 200, {}, os.urandom(40))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_conditional_revalidation(self):
+        """
+        Tests that fresh entries are served locally and stale ones
+        are revalidated with the stored validators
+        """
+        session = requests.Session()
+        cache = HTTPCache(self.path, max_age=60, max_size=10 ** 6)
+        session.mount("https://", CachingHTTPAdapter(cache))
+        url = "https://www.publico.pt/noticia-1"
+
+        with mock.patch.object(
+            HTTPAdapter,
+            "send",
+            return_value=build_response(200, b"<html/>", {"ETag": '"v1"'}),
+        ) as send:
+            self.assertEqual(session.get(url).text, "<html/>")
+            # Second request is a local hit
+            self.assertEqual(session.get(url).text, "<html/>")
+            self.assertEqual(send.call_count, 1)
+
+        # Make the entry stale
+        cache.max_age = 0
+        with mock.patch.object(
+            HTTPAdapter, "send", return_value=build_response(304)
+        ) as send:
+            response = session.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "<html/>")
+        request = send.call_args[0][0]
+        self.assertEqual(request.headers["If-None-Match"], '"v1"')
+
+    def test_streamed_response(self):
+        """
+        Tests that streamed responses are only stored once fully read
+        """
+        session = requests.Session()
+        cache = HTTPCache(self.path, max_age=60, max_size=10 ** 6)
+        session.mount("https://", CachingHTTPAdapter(cache))
+
+        def send(request, **kwargs):
+            response = build_response(200)
+            response._content = False
+            response.raw = HTTPResponse(
+                body=io.BytesIO(b"<html>body</html>"), preload_content=False
+            )
+            return response
+
+        with mock.patch.object(HTTPAdapter, "send", side_effect=send):
+            # Aborted download
+            response = session.get("https://www.cmjornal.pt/1", stream=True)
+            next(response.iter_content(4))
+            response.close()
+            self.assertIsNone(cache.get("https://www.cmjornal.pt/1"))
+
+            # Complete download
+            response = session.get("https://www.cmjornal.pt/1", stream=True)
+            self.assertEqual(response.text, "<html>body</html>")
+
+        # Served from the cache, streamed or not
+        for stream in (False, True):
+            response = session.get("https://www.cmjornal.pt/1", stream=stream)
+            self.assertEqual(response.text, "<html>body</html>")
+
+    def test_streamed_parse(self):
+        """
+        Tests that pages parsed while streamed are cached whole, even if
+        the parse stops early
+        """
+        session = requests.Session()
+        cache = HTTPCache(self.path, max_age=60, max_size=10 ** 6)
+        session.mount("https://", CachingHTTPAdapter(cache))
+        body = b"<html><body><h1>Title</h1><p>Rest</p></body></html>"
+
+        def send(request, **kwargs):
+            response = build_response(200)
+            response._content = False
+            response.raw = HTTPResponse(
+                body=io.BytesIO(body), preload_content=False
+            )
+            return response
+
+        with mock.patch.object(HTTPAdapter, "send", side_effect=send):
+            response = session.get("https://www.publico.pt/1", stream=True)
+            tree, truncated = parse_until(
+                response, {("h1", None)}, chunk_size=8
+            )
+
+        self.assertTrue(truncated)
+        self.assertEqual(tree.findtext(".//h1"), "Title")
+        self.assertEqual(cache.get("https://www.publico.pt/1")["body"], body)
+
+    @mock.patch("core.cache._http_cache", None)
+    def test_unusable_directory(self):
+        """
+        Tests that the cache is disabled (instead of failing every
+        session) when its directory can't be used
+        """
+        # A file where the directory should be
+        open(self.path, "w").close()
+
+        with override_settings(
+            NEWS_HTTP_CACHE_ENABLED=True, NEWS_HTTP_CACHE_DIR=self.path
+        ):
+            with self.assertLogs("core.cache", "WARNING"):
+                self.assertIsNone(get_http_cache())
+
+
+class TTLCacheTest(SimpleTestCase):
+    def test_expiry_and_lru(self):
+        """
+        Tests that entries expire after the TTL and that the least
+        recently used entry is evicted when the cache is full
+        """
+        cache = TTLCache(ttl=60, max_entries=2)
+        cache.set(1, "a")
+        cache.set(2, "b")
+        cache.get(1)
+        cache.set(3, "c")
+
+        self.assertEqual(cache.get(1), "a")
+        self.assertNotIn(2, cache)
+        self.assertEqual(cache.get(3), "c")
+
+        cache.ttl = 0
+        cache.set(4, "d")
+        self.assertNotIn(4, cache)
+
+    def test_coalesced_loads(self):
+        """
+        Tests that concurrent loads of the same key run the loader once
+        """
+        cache = TTLCache(ttl=60, max_entries=10)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return "summary"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_load(1, loader))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["summary"] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_cache_if(self):
+        """
+        Tests that values rejected by `cache_if` are not cached
+        """
+        cache = TTLCache(ttl=60, max_entries=10)
+        cache.get_or_load(1, lambda: (503, ""), lambda value: value[0] < 500)
+
+        self.assertNotIn(1, cache)
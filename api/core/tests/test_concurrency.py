@@ -0,0 +1,181 @@
+import threading
+import time
+from django.test import SimpleTestCase
+
+from ..concurrency import (
+    iter_concurrently,
+    iter_urls_cancellable,
+    map_concurrently,
+    map_urls,
+)
+
+
+class MapURLsTest(SimpleTestCase):
+    def test_keeps_input_order(self):
+        """
+        Tests that results are returned in the order of the input URLs,
+        even when later URLs complete first
+        """
+        urls = [f"https://www.example{i % 3}.pt/{i}" for i in range(12)]
+
+        def fetch(url):
+            # Make the first URLs the slowest ones
+            time.sleep(0.02 * (12 - int(url.rsplit("/", 1)[1])) / 12)
+            return url
+
+        results = list(map_urls(fetch, urls, max_workers=6, max_per_host=2))
+
+        self.assertEqual(results, urls)
+
+    def test_per_host_cap(self):
+        """
+        Tests that no more than `max_per_host` calls run at once
+        against the same host
+        """
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+
+        def fetch(url):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.01)
+            with lock:
+                running["now"] -= 1
+            return url
+
+        urls = [f"https://www.publico.pt/{i}" for i in range(10)]
+        list(map_urls(fetch, urls, max_workers=8, max_per_host=3))
+
+        self.assertLessEqual(running["max"], 3)
+
+    def test_per_host_cap_across_calls(self):
+        """
+        Tests that the cap holds across concurrent calls (e.g. the tags
+        of a job, each fetching its own pages)
+        """
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+
+        def fetch(url, cancelled=None):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.01)
+            with lock:
+                running["now"] -= 1
+            return url
+
+        urls = [f"https://www.cmjornal.pt/{i}" for i in range(8)]
+        searches = [
+            threading.Thread(
+                target=lambda: list(map_urls(fetch, urls, 8, max_per_host=2))
+            ),
+            threading.Thread(
+                target=lambda: list(
+                    iter_urls_cancellable(fetch, urls, 8, max_per_host=2)
+                )
+            ),
+        ]
+        for search in searches:
+            search.start()
+        for search in searches:
+            search.join()
+
+        self.assertEqual(running["max"], 2)
+
+    def test_sequential_mode(self):
+        """
+        Tests that a single worker processes the URLs in the calling thread
+        """
+        threads = set()
+
+        def fetch(url):
+            threads.add(threading.get_ident())
+            return url
+
+        list(map_urls(fetch, ["https://a/1", "https://b/2"], 1, 1))
+
+        self.assertEqual(threads, {threading.get_ident()})
+
+
+class MapConcurrentlyTest(SimpleTestCase):
+    def test_runs_items_in_parallel(self):
+        """
+        Tests that every item is processed, in parallel, and that the
+        results keep the order of the items
+        """
+        barrier = threading.Barrier(5, timeout=2)
+
+        def search(keyword):
+            # Only passes if the five keywords run at the same time
+            barrier.wait()
+            return keyword.upper()
+
+        keywords = ["a", "b", "c", "d", "e"]
+        results = map_concurrently(search, keywords, max_workers=5)
+
+        self.assertEqual(results, ["A", "B", "C", "D", "E"])
+
+
+class IterConcurrentlyTest(SimpleTestCase):
+    def test_yields_values_as_produced(self):
+        """
+        Tests that the values of every item are yielded, keeping
+        the order of each item, before the slower items finish
+        """
+        release = threading.Event()
+
+        def search(tag):
+            yield f"{tag}-1"
+            if tag == "slow":
+                # Blocks until the fast values were consumed
+                release.wait(timeout=2)
+            yield f"{tag}-2"
+
+        values = iter_concurrently(search, ["slow", "fast"], max_workers=2)
+        consumed = []
+        for value in values:
+            consumed.append(value)
+            if "fast-2" in consumed:
+                release.set()
+
+        self.assertCountEqual(
+            consumed, ["slow-1", "slow-2", "fast-1", "fast-2"]
+        )
+        self.assertLess(consumed.index("fast-2"), consumed.index("slow-2"))
+
+    def test_propagates_errors(self):
+        """
+        Tests that errors raised by an item reach the consumer
+        """
+
+        def search(tag):
+            yield tag
+            raise ValueError(tag)
+
+        with self.assertRaises(ValueError):
+            list(iter_concurrently(search, ["a", "b"], max_workers=2))
+
+    def test_close_skips_queued_items(self):
+        """
+        Tests that closing the iterator stops the running items,
+        and the items waiting for a worker never run
+        """
+        started = []
+        release = threading.Event()
+
+        def search(tag):
+            started.append(tag)
+            yield f"{tag}-1"
+            release.wait(timeout=2)
+            yield f"{tag}-2"
+
+        values = iter_concurrently(search, ["a", "b", "c", "d"], max_workers=2)
+        next(values)
+        values.close()
+        release.set()
+        # Give the workers time to pick up any queued item
+        time.sleep(0.3)
+
+        self.assertCountEqual(started, ["a", "b"])
@@ -0,0 +1,111 @@
+import io
+import threading
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+
+from ..http import parse_until
+from ..models import NewsFactory
+
+PAGE = (
+    b"<html><head><meta property='og:url' content='https://www.publico.pt/1'>"
+    b"</head><body><div class='story'><p>Texto</p></div>"
+    b"<div class='comments'><p>Comentario</p></div></body></html>"
+)
+
+
+class FakeResponse:
+    """
+    Streamed response serving a body in small chunks
+    """
+
+    encoding = "utf-8"
+    # Not on its way to the HTTP cache
+    raw = None
+
+    def __init__(self, body, chunk_size=16):
+        self.chunks = [
+            body[i : i + chunk_size] for i in range(0, len(body), chunk_size)
+        ]
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class ParseUntilTest(SimpleTestCase):
+    def test_stops_after_required_elements(self):
+        """
+        Tests that the download stops once the required elements
+        are parsed, keeping them in the tree
+        """
+        response = FakeResponse(PAGE)
+
+        tree, truncated = parse_until(response, {("div", "story")})
+
+        self.assertTrue(truncated)
+        self.assertTrue(response.closed)
+        self.assertLess(response.read, len(response.chunks))
+        self.assertEqual(
+            tree.xpath("//div[@class='story']//text()"), ["Texto"]
+        )
+        self.assertEqual(tree.xpath("//div[@class='comments']"), [])
+
+    def test_reads_whole_page(self):
+        """
+        Tests that the whole page is parsed when some required
+        element is missing
+        """
+        response = FakeResponse(PAGE)
+
+        tree, truncated = parse_until(response, {("aside", None)})
+
+        self.assertFalse(truncated)
+        self.assertEqual(response.read, len(response.chunks))
+        self.assertEqual(tree.xpath("//p/text()"), ["Texto", "Comentario"])
+
+    def test_cancelled(self):
+        """
+        Tests that the download is aborted once cancelled
+        """
+        response = FakeResponse(PAGE)
+        cancelled = threading.Event()
+        cancelled.set()
+
+        self.assertEqual(
+            parse_until(response, {("div", "story")}, cancelled),
+            (None, False),
+        )
+        self.assertTrue(response.closed)
+
+
+class BuildStreamedTest(SimpleTestCase):
+    def test_fallback_error_page(self):
+        """
+        Tests that no news is built when the page must be downloaded
+        again in full and that download fails
+        """
+        factory = mock.Mock()
+        factory._required_elements.return_value = {("div", "story")}
+        factory.from_html_tree.side_effect = IndexError
+        factory.session.get.return_value = mock.Mock(
+            status_code=404, text="<html>Not found</html>"
+        )
+
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(PAGE)
+
+        news = NewsFactory._build_streamed(
+            factory, "https://www.publico.pt/1", response
+        )
+
+        self.assertIsNone(news)
+        factory.from_html_string.assert_not_called()
@@ -0,0 +1,88 @@
+import datetime
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from ..models import News
+from ..typechecks import typechecked
+
+
+def build_news(rubric="Política", authors=("Luciano Alvarez",)):
+    return News(
+        "Title",
+        "Description",
+        "https://www.publico.pt/1",
+        rubric,
+        datetime.datetime(2021, 1, 31, 16, 54, 12),
+        list(authors),
+        False,
+        "Text",
+    )
+
+
+class NewsTest(SimpleTestCase):
+    def test_slots_and_interning(self):
+        """
+        Tests that news have no `__dict__`, and that repeated
+        strings are shared between news
+        """
+        first = build_news(
+            "".join(["Polí", "tica"]), ["".join(["Ana", " Sá"])]
+        )
+        second = build_news(
+            "".join(["Polí", "tica"]), ["".join(["Ana", " Sá"])]
+        )
+
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIs(first.rubric, second.rubric)
+        self.assertIs(first.authors[0], second.authors[0])
+
+    def test_json(self):
+        """
+        Tests that news are encoded once, as JSON objects
+        """
+        self.assertEqual(
+            json.loads(build_news().json),
+            {
+                "title": "Title",
+                "description": "Description",
+                "url": "https://www.publico.pt/1",
+                "rubric": "Política",
+                "published_at": "2021-01-31T16:54:12",
+                "authors": ["Luciano Alvarez"],
+                "is_opinion": False,
+                "text": "Text",
+            },
+        )
+
+
+class TypeChecksTest(SimpleTestCase):
+    def check(self, value: int) -> int:
+        return value
+
+    def test_enabled(self):
+        """
+        Tests that type hints are checked by default
+        """
+        with self.assertRaises(TypeError):
+            typechecked(TypeChecksTest.check)(self, "1")
+
+    @override_settings(NEWS_TYPE_CHECKS=False)
+    def test_disabled(self):
+        """
+        Tests that type checks can be turned off
+        """
+        self.assertEqual(typechecked(TypeChecksTest.check)(self, "1"), "1")
+
+
+class BenchmarkCommandTest(SimpleTestCase):
+    def test_news_benchmark(self):
+        """
+        Tests that the news benchmark runs and reports its measures
+        """
+        out = StringIO()
+        call_command("benchmark", "news", number=20, stdout=out)
+
+        self.assertIn("memory per news", out.getvalue())
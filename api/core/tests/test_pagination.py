@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from contextlib import closing
+from django.test import SimpleTestCase
+
+from ..pagination import aiter_pages, find_first_page, iter_pages
+
+
+class IterPagesTest(SimpleTestCase):
+    def test_pages_in_order(self):
+        """
+        Tests that pages are yielded in order, even when later
+        pages are fetched first
+        """
+
+        def fetch_page(page):
+            time.sleep(0.01 * (page % 3))
+            return page
+
+        with closing(iter_pages(fetch_page, start=2, window=3)) as pages:
+            results = [page for page, _ in zip(pages, range(6))]
+
+        self.assertEqual(results, [2, 3, 4, 5, 6, 7])
+
+    def test_bounded_prefetch(self):
+        """
+        Tests that no more than `window` pages are fetched ahead
+        """
+        fetched = []
+        lock = threading.Lock()
+
+        def fetch_page(page):
+            with lock:
+                fetched.append(page)
+            return page
+
+        with closing(iter_pages(fetch_page, window=4)) as pages:
+            for page in pages:
+                if page == 2:
+                    break
+
+        # Give cancelled/running fetches time to finish
+        time.sleep(0.05)
+        self.assertLessEqual(max(fetched), 2 + 4)
+
+    def test_async_pages_in_order(self):
+        """
+        Tests the async version of the pagination engine
+        """
+
+        async def fetch_page(page):
+            await asyncio.sleep(0.01 * (page % 3))
+            return page
+
+        async def walk():
+            results = []
+            pages = aiter_pages(fetch_page, window=3)
+            async for page in pages:
+                results.append(page)
+                if page == 4:
+                    break
+            await pages.aclose()
+            return results
+
+        self.assertEqual(asyncio.run(walk()), [0, 1, 2, 3, 4])
+
+
+class FindFirstPageTest(SimpleTestCase):
+    def test_finds_first_page(self):
+        """
+        Tests that the first "not newer" page is found for every boundary
+        """
+        for boundary in [0, 1, 2, 3, 7, 8, 100, 1000]:
+            self.assertEqual(
+                find_first_page(lambda page: page < boundary), boundary
+            )
+
+    def test_logarithmic_probes(self):
+        """
+        Tests that the number of probed pages is logarithmic
+        """
+        probes = []
+
+        def is_newer(page):
+            probes.append(page)
+            return page < 1000
+
+        self.assertEqual(find_first_page(is_newer, start=10), 1000)
+        self.assertLessEqual(len(probes), 2 * 10 + 2)
@@ -0,0 +1,62 @@
+import os
+import stat
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from opennews.settings.vault import cached_secrets
+
+
+class CachedSecretsTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "secrets.json")
+        self.fetch = mock.Mock(return_value={"DJANGO_SECRET_KEY": "secret"})
+
+    def test_fetches_once(self):
+        """
+        Tests that secrets are fetched once and then read from the
+        cache file, which only its owner can read
+        """
+        for _ in range(2):
+            secrets = cached_secrets(self.fetch, self.path, ttl=60)
+
+        self.assertEqual(secrets, {"DJANGO_SECRET_KEY": "secret"})
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_expired(self):
+        """
+        Tests that secrets are fetched again once the cache expires
+        """
+        cached_secrets(self.fetch, self.path, ttl=60)
+        old = time.time() - 120
+        os.utime(self.path, (old, old))
+
+        cached_secrets(self.fetch, self.path, ttl=60)
+
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_readable_by_others(self):
+        """
+        Tests that cache files other users could have written are ignored
+        """
+        cached_secrets(self.fetch, self.path, ttl=60)
+        os.chmod(self.path, 0o644)
+
+        cached_secrets(self.fetch, self.path, ttl=60)
+
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_missing_directory(self):
+        """
+        Tests that secrets are not cached without the cache directory
+        """
+        path = os.path.join(self.path, "missing", "secrets.json")
+        for _ in range(2):
+            cached_secrets(self.fetch, path, ttl=60)
+
+        self.assertEqual(self.fetch.call_count, 2)
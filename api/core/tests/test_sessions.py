@@ -0,0 +1,152 @@
+import time
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+from requests.cookies import create_cookie
+
+from cm.models import CMNewsFactory
+from publico.models import PublicoNewsFactory
+
+from .. import http
+from ..models import NewsFactory
+from ..sessions import SessionStore
+
+
+class FakeFactory:
+    """
+    Stands for a news factory class, counting its logins
+    """
+
+    logins = 0
+    auth_cookies = ("token",)
+
+    @classmethod
+    def _login(cls):
+        cls.logins += 1
+        session = http.build_session()
+        session.cookies.set_cookie(create_cookie("token", str(cls.logins)))
+        return session
+
+
+class SessionStoreTest(SimpleTestCase):
+    def setUp(self):
+        FakeFactory.logins = 0
+
+    def test_session_is_reused(self):
+        """
+        Tests that the login is made only once per process
+        """
+        store = SessionStore(ttl=60)
+
+        self.assertIs(store.get(FakeFactory), store.get(FakeFactory))
+        self.assertEqual(FakeFactory.logins, 1)
+
+    def test_expired_session(self):
+        """
+        Tests that sessions are renewed after the TTL and
+        when one of their login cookies expires
+        """
+        store = SessionStore(ttl=0)
+        store.get(FakeFactory)
+        store.get(FakeFactory)
+        self.assertEqual(FakeFactory.logins, 2)
+
+        store = SessionStore(ttl=60)
+        session = store.get(FakeFactory)
+        session.cookies.set_cookie(
+            create_cookie("token", "x", expires=int(time.time()) - 1)
+        )
+        # The expiry is computed at login, so simulate a new login
+        store.invalidate(FakeFactory, session)
+        with mock.patch.object(
+            FakeFactory, "_login", return_value=session
+        ) as login:
+            store.get(FakeFactory)
+            store.get(FakeFactory)
+        self.assertEqual(login.call_count, 2)
+
+    def test_short_lived_cookie(self):
+        """
+        Tests that other cookies expiring don't renew the session
+        """
+        session = FakeFactory._login()
+        session.cookies.set_cookie(
+            create_cookie("tracking", "x", expires=int(time.time()) - 1)
+        )
+        store = SessionStore(ttl=60)
+
+        with mock.patch.object(
+            FakeFactory, "_login", return_value=session
+        ) as login:
+            store.get(FakeFactory)
+            store.get(FakeFactory)
+        self.assertEqual(login.call_count, 1)
+
+    def test_invalidate(self):
+        """
+        Tests that an invalidated session is replaced by a new login,
+        and that stale invalidations are ignored
+        """
+        store = SessionStore(ttl=60)
+        old_session = store.get(FakeFactory)
+        store.invalidate(FakeFactory, old_session)
+        new_session = store.get(FakeFactory)
+
+        self.assertIsNot(old_session, new_session)
+        store.invalidate(FakeFactory, old_session)
+        self.assertIs(store.get(FakeFactory), new_session)
+        self.assertEqual(FakeFactory.logins, 2)
+
+
+class LoggedOutTest(SimpleTestCase):
+    def response(self, factory, status_code=200):
+        """
+        Returns a news page response to a request sent with the
+        factory's session cookies
+        """
+        response = requests.Response()
+        response.status_code = status_code
+        response.request = factory.session.prepare_request(
+            requests.Request("GET", "https://www.news.pt/noticia")
+        )
+        return response
+
+    @mock.patch("core.models.get_session_store")
+    def test_logged_out(self, get_session_store):
+        """
+        Tests that each factory finds out it was logged out when the
+        site drops its login cookie, or refuses the request
+        """
+        for factory_class in (PublicoNewsFactory, CMNewsFactory):
+            with self.subTest(factory_class.__name__):
+                get_session_store().get.return_value = requests.Session()
+                factory = factory_class()
+                (name,) = factory_class.auth_cookies
+
+                # Never logged in
+                self.assertFalse(
+                    factory._is_logged_out(self.response(factory))
+                )
+                self.assertTrue(
+                    factory._is_logged_out(self.response(factory, 403))
+                )
+
+                factory.session.cookies.set_cookie(create_cookie(name, "x"))
+                response = self.response(factory)
+                self.assertFalse(factory._is_logged_out(response))
+
+                # The site dropped the cookie
+                factory.session.cookies.clear()
+                self.assertTrue(factory._is_logged_out(response))
+
+
+class RegisteredFactoriesTest(SimpleTestCase):
+    def test_registered_factories(self):
+        """
+        Tests that every concrete factory is registered
+        """
+        factories = NewsFactory.registered_factories()
+
+        self.assertIn(PublicoNewsFactory, factories)
+        self.assertIn(CMNewsFactory, factories)
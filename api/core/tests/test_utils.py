@@ -0,0 +1,37 @@
+import datetime
+
+import dateparser
+from django.test import SimpleTestCase
+
+from ..utils import datetime_from_string
+
+
+class DatetimeFromStringTest(SimpleTestCase):
+    def test_known_formats(self):
+        """
+        Tests that CM and Vidas dates are parsed as dateparser would
+        """
+        for date_string in [
+            "07/02/2021  15:19",
+            "07.02.2021  15:19",
+            "7/2/2021 9:05",
+            " 07/02/2021 15:19:33 ",
+            "07/02/2021",
+        ]:
+            with self.subTest(date_string):
+                self.assertEqual(
+                    datetime_from_string(date_string),
+                    dateparser.parse(
+                        date_string, settings={"DATE_ORDER": "DMY"}
+                    ),
+                )
+
+    def test_other_formats(self):
+        """
+        Tests that other dates (and invalid ones) fall back to dateparser
+        """
+        self.assertEqual(
+            datetime_from_string("7 de fevereiro de 2021"),
+            datetime.datetime(2021, 2, 7),
+        )
+        self.assertIsNone(datetime_from_string("31/02/2021"))
@@ -0,0 +1,317 @@
+import datetime
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from opennews.celery import app
+from results.store import ResultStore
+from results.tests.fakes import FakeRedis
+from ..memo import JobMemo, job_key
+from ..models import News, NewsFactory
+from ..serializers import URLSearchSerializer
+from ..views import (
+    BaseKeywordSearchView,
+    BaseURLSearchView,
+    CombinedKeywordSearchView,
+)
+
+
+def build_news(url):
+    return News(
+        "Title",
+        "Description",
+        url,
+        "Política",
+        datetime.datetime(2021, 1, 31),
+        ["Author"],
+        False,
+        "Text",
+    )
+
+
+class FakeFactory:
+    """
+    Stands for a newspaper factory, finding a news for each keyword
+    """
+
+    @classmethod
+    def iter_url_search(cls, urls):
+        for url in urls:
+            yield build_news(url)
+
+    @classmethod
+    def iter_keyword_search(cls, keywords, starting_date, ending_date):
+        for keyword in keywords:
+            yield build_news(f"https://www.{cls.host}.pt/{keyword}")
+        yield build_news("https://www.shared.pt/news")
+
+
+class FakePublico(FakeFactory):
+    host = "publico"
+
+
+class FakeCM(FakeFactory):
+    host = "cm"
+
+
+class JobTestCase(SimpleTestCase):
+    def setUp(self):
+        # Run the jobs (and chords) in this process
+        always_eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, "task_always_eager", always_eager)
+
+        self.store = ResultStore(FakeRedis(), ttl=60)
+        patcher = mock.patch(
+            "core.views.get_result_store", return_value=self.store
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Jobs are not memoized (see `JobMemoTest`)
+        patcher = mock.patch("core.views.get_job_memo", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Keep the news out of the article store
+        patcher = mock.patch("core.views.save_news")
+        self.save_news = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stored_urls(self, job):
+        return [news["url"] for news in self.store.get(job.id)]
+
+
+class CombinedSearchTest(JobTestCase):
+    @mock.patch.object(
+        NewsFactory,
+        "registered_factories",
+        return_value=[FakePublico, FakeCM],
+    )
+    def test_searches_every_factory(self, registered_factories):
+        """
+        Tests that a combined job searches every registered factory,
+        storing the news found by several factories once
+        """
+        job = CombinedKeywordSearchView().enqueue_job(
+            {
+                "keywords": ["covid"],
+                "starting_date": datetime.date(2021, 1, 1),
+                "ending_date": datetime.date(2021, 1, 31),
+            }
+        )
+
+        self.assertEqual(job.get(), 3)
+        self.assertCountEqual(
+            self.stored_urls(job),
+            [
+                "https://www.publico.pt/covid",
+                "https://www.shared.pt/news",
+                "https://www.cm.pt/covid",
+            ],
+        )
+
+
+class FakeURLSearchView(BaseURLSearchView):
+    news_factory_class = FakePublico
+
+
+class URLSearchTest(JobTestCase):
+    @override_settings(NEWS_RESULTS_CHUNK_SIZE=2)
+    def test_stores_news_in_chunks(self):
+        """
+        Tests that the news are stored in chunks while the job runs
+        """
+        urls = [f"https://www.publico.pt/{i}" for i in range(5)]
+
+        with mock.patch.object(
+            self.store, "append", wraps=self.store.append
+        ) as append:
+            job = FakeURLSearchView().enqueue_job({"urls": urls})
+
+        self.assertEqual(job.get(), 5)
+        self.assertEqual(append.call_count, 3)
+        self.assertEqual(self.save_news.call_count, 3)
+        self.assertEqual(self.stored_urls(job), urls)
+
+    @override_settings(NEWS_URL_SEARCH_CHUNK_SIZE=2)
+    def test_splits_urls_into_chunks(self):
+        """
+        Tests that large URL jobs are split into subtasks,
+        which store their news under the job id
+        """
+        urls = [f"https://www.publico.pt/{i}" for i in range(5)]
+
+        with mock.patch.object(
+            FakePublico, "iter_url_search", wraps=FakePublico.iter_url_search
+        ) as iter_url_search:
+            job = FakeURLSearchView().enqueue_job({"urls": urls})
+
+        self.assertEqual(job.get(), 5)
+        self.assertEqual(iter_url_search.call_count, 3)
+        self.assertEqual(self.stored_urls(job), urls)
+
+    @override_settings(NEWS_URL_SEARCH_CHUNK_SIZE=2)
+    def test_split_job_arguments(self):
+        """
+        Tests that split jobs only keep a summary of their URLs
+        as the job arguments
+        """
+        urls = [f"https://www.publico.pt/{i}" for i in range(5)]
+
+        with mock.patch.object(
+            FakeURLSearchView.merge_job,
+            "s",
+            wraps=FakeURLSearchView.merge_job.s,
+        ) as merge_job:
+            FakeURLSearchView().enqueue_job({"urls": urls})
+
+        merge_job.assert_called_once_with(number_of_urls=5, number_of_chunks=3)
+
+    def test_urls_file(self):
+        """
+        Tests that URLs can be uploaded as a text file
+        """
+        urls_file = SimpleUploadedFile(
+            "urls.txt",
+            b"https://www.publico.pt/1\n\nhttps://www.publico.pt/2\n",
+        )
+        serializer = URLSearchSerializer(data={"urls_file": urls_file})
+
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(
+            serializer.data["urls"],
+            ["https://www.publico.pt/1", "https://www.publico.pt/2"],
+        )
+
+    def test_urls_file_with_invalid_url(self):
+        """
+        Tests that every URL in the uploaded file is validated
+        """
+        urls_file = SimpleUploadedFile(
+            "urls.txt", b"https://www.publico.pt/1\nnope"
+        )
+        serializer = URLSearchSerializer(data={"urls_file": urls_file})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("urls_file", serializer.errors)
+
+
+class FakeKeywordSearchView(BaseKeywordSearchView):
+    news_factory_class = FakePublico
+
+
+class JobMemoTest(JobTestCase):
+    data = {
+        "keywords": ["covid", "vacina"],
+        "starting_date": datetime.date(2021, 1, 1),
+        "ending_date": datetime.date(2021, 1, 31),
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.memo = JobMemo(FakeRedis(), ttl=60, running_ttl=3600)
+        patcher = mock.patch("core.views.get_job_memo", return_value=self.memo)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # State of the memoized jobs
+        patcher = mock.patch("core.views.AsyncResult")
+        self.async_result = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.async_result.side_effect = lambda job_id: mock.Mock(
+            id=job_id, state="SUCCESS"
+        )
+
+    def submit(self, **data):
+        return FakeKeywordSearchView().submit_job({**self.data, **data})
+
+    def test_reuses_identical_job(self):
+        """
+        Tests that a search with the same (normalized) arguments as a
+        previous one gets its job, instead of searching again
+        """
+        with mock.patch.object(
+            FakePublico,
+            "iter_keyword_search",
+            wraps=FakePublico.iter_keyword_search,
+        ) as iter_keyword_search:
+            job = self.submit()
+            same_job = self.submit(keywords=[" vacina", "covid", "covid"])
+
+        self.assertEqual(same_job.id, job.id)
+        self.assertEqual(iter_keyword_search.call_count, 1)
+
+    def test_running_job_older_than_ttl(self):
+        """
+        Tests that a job is reused while it runs, however long it takes,
+        and for `ttl` seconds after it finished
+        """
+        self.async_result.side_effect = lambda job_id: mock.Mock(
+            id=job_id, state="STARTED"
+        )
+        with mock.patch.object(
+            FakeKeywordSearchView,
+            "enqueue_job",
+            side_effect=lambda data, job_id: mock.Mock(id=job_id),
+        ):
+            job = self.submit()
+            self.memo.client.time += 600
+            self.assertEqual(self.submit().id, job.id)
+
+            self.memo.finish(job.id)
+            self.memo.client.time += 59
+            self.assertEqual(self.submit().id, job.id)
+            self.memo.client.time += 1
+            self.assertNotEqual(self.submit().id, job.id)
+
+    def test_finished_job_ttl(self):
+        """
+        Tests that finished jobs are reused for `ttl` seconds
+        from when they finished
+        """
+        job = self.submit()
+
+        self.memo.client.time += 60
+        self.assertNotEqual(self.submit().id, job.id)
+
+    def test_different_arguments(self):
+        """
+        Tests that searches with different arguments get their own job
+        """
+        job = self.submit()
+        other_job = self.submit(ending_date=datetime.date(2021, 1, 30))
+
+        self.assertNotEqual(other_job.id, job.id)
+
+    def test_failed_job(self):
+        """
+        Tests that failed jobs are not reused
+        """
+        job = self.submit()
+        self.async_result.side_effect = lambda job_id: mock.Mock(
+            id=job_id, state="FAILURE"
+        )
+
+        new_job = self.submit()
+
+        self.assertNotEqual(new_job.id, job.id)
+        self.assertEqual(self.memo.claim(self.key(), "other"), new_job.id)
+
+    def test_enqueue_error(self):
+        """
+        Tests that jobs that could not be enqueued are not memoized
+        """
+        with mock.patch.object(
+            FakeKeywordSearchView,
+            "enqueue_job",
+            side_effect=ConnectionError,
+        ):
+            with self.assertRaises(ConnectionError):
+                self.submit()
+
+        self.assertIsNone(self.memo.claim(self.key(), "other"))
+
+    def key(self):
+        return job_key("FakePublico", "from_keyword_search", self.data)
@@ -0,0 +1,21 @@
+"""
+Contains the runtime type checking switch.
+
+Factories and news are type checked with typeguard, which is great for
+catching scraping bugs but costs time on every call. Production workers
+can turn it off with the `NEWS_TYPE_CHECKS` setting.
+"""
+from django.conf import settings
+
+
+def typechecked(obj):
+    """
+    Same as `typeguard.typechecked`, unless type checks are
+    disabled in the settings (in which case `obj` is returned as is)
+    """
+    if not getattr(settings, "NEWS_TYPE_CHECKS", True):
+        return obj
+
+    import typeguard
+
+    return typeguard.typechecked(obj)
@@ -0,0 +1,20 @@
+from django.urls import path
+
+from .views import (
+    CombinedTagSearchView,
+    CombinedKeywordSearchView,
+)
+
+
+urlpatterns = [
+    path(
+        "tag_search/",
+        CombinedTagSearchView.as_view(),
+        name="combined_tag_search",
+    ),
+    path(
+        "keyword_search/",
+        CombinedKeywordSearchView.as_view(),
+        name="combined_keyword_search",
+    ),
+]
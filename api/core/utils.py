@@ -1,5 +1,16 @@
-import dateparser
+import json
+import re
 from datetime import datetime, date
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+# Day first dates, as found in news pages: "dd/mm/YYYY HH:MM" (CM),
+# "dd.mm.YYYY HH:MM" (Vidas), with an optional time and seconds
+_dmy_datetime = re.compile(
+    r"\s*(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})"
+    r"(?:\s+(\d{1,2})[:h](\d{2})(?::(\d{2}))?)?\s*"
+)
 
 
 def datetime_from_string(date_string: str, order="DMY") -> datetime:
@@ -7,7 +18,100 @@ def datetime_from_string(date_string: str, order="DMY") -> datetime:
 
     if isinstance(date_string, (datetime, date)):
         return date_string
+    if order == "DMY":
+        parsed = _parse_dmy_datetime(date_string)
+        if parsed is not None:
+            return parsed
+
+    # Slow to import and to call, only needed for other formats
+    import dateparser
+
     return dateparser.parse(
         date_string,
         settings={"DATE_ORDER": order},
     )
+
+
+@lru_cache(maxsize=4096)
+def _parse_dmy_datetime(date_string: str) -> Optional[datetime]:
+    """
+    Parses the day first formats of `_dmy_datetime` (None for any other
+    string). Memoized, as news of the same listing often share their dates.
+    """
+
+    match = _dmy_datetime.fullmatch(date_string)
+    if match is None:
+        return None
+    day, month, year, hour, minute, second = (
+        int(group or 0) for group in match.groups()
+    )
+    try:
+        return datetime(year, month, day, hour, minute, second)
+    except ValueError:
+        # Out of range, let dateparser decide
+        return None
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Splits an iterable into lists of (at most) `size` items, lazily"""
+
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _json_default(obj):
+    """Encodes the values the `json` module doesn't know about"""
+
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+# Compact encoder, shared by every `to_json` call
+_json_encoder = json.JSONEncoder(
+    ensure_ascii=False,
+    separators=(",", ":"),
+    default=_json_default,
+)
+
+
+def to_json(obj) -> str:
+    """Encodes an object to JSON in a single pass (dates as ISO 8601)"""
+
+    return _json_encoder.encode(obj)
+
+
+class LazyXPath:
+    """
+    XPath expression compiled (with `lxml.etree.XPath`) on its first call,
+    so that lxml is only imported by the processes parsing pages. Called
+    like the compiled expression.
+    """
+
+    def __init__(self, path: str, **kwargs) -> None:
+        self.path = path
+        self.kwargs = kwargs
+        self._xpath = None
+
+    def __call__(self, tree, **variables):
+        if self._xpath is None:
+            from lxml import etree
+
+            self._xpath = etree.XPath(self.path, **self.kwargs)
+        return self._xpath(tree, **variables)
+
+
+# `og:url` of a page, in its head (where it belongs) or anywhere else
+_og_url_in_head = LazyXPath(
+    "/html/head/meta[@property='og:url']/@content", smart_strings=False
+)
+_og_url = LazyXPath("//meta[@property='og:url']/@content", smart_strings=False)
+
+
+def og_url(tree) -> Optional[str]:
+    """Returns the `og:url` of a parsed HTML page (None if it has none)"""
+
+    # Looking in the head first saves a walk through the whole body
+    urls = _og_url_in_head(tree) or _og_url(tree)
+    return urls[0] if urls else None
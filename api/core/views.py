@@ -1,18 +1,46 @@
 """
 Core views
 """
+import logging
+
+from celery import chord, states, uuid
 from celery.app import shared_task
+from celery.result import AsyncResult
+from django.conf import settings
 from drf_spectacular.utils import extend_schema
 from rest_framework import mixins, generics, status
 from rest_framework.response import Response
 
+from articles.store import save_news, source_of
+from results.store import get_result_store
+
 from .serializers import (
     JobSerializer,
     KeywordSearchSerializer,
     URLSearchSerializer,
     TagSearchSerializer,
 )
+from .cache import redis_errors
+from .memo import get_job_memo, job_key
 from .models import NewsFactory
+from .utils import chunked
+
+logger = logging.getLogger(__name__)
+
+
+def finish_memoized_job(job_id: str) -> None:
+    """
+    Keeps a job that just finished for identical searches for a while
+    (see `core.memo`)
+    """
+    memo = get_job_memo()
+    if memo is None:
+        return
+    # The job's news are stored, don't fail it because of the memo
+    try:
+        memo.finish(job_id)
+    except redis_errors() as exc:
+        logger.warning("Job memo update failed: %s", exc)
 
 
 class BaseJobCreationView(mixins.CreateModelMixin, generics.GenericAPIView):
@@ -30,24 +58,150 @@ class BaseJobCreationView(mixins.CreateModelMixin, generics.GenericAPIView):
     serializer_class = None
 
     @staticmethod
-    @shared_task
+    @shared_task(bind=True)
     def celery_job(
+        task,
         news_factory_class: NewsFactory,
         news_factory_method: str,
+        job_id: str = None,
+        part: int = None,
         **data,
-    ):
+    ) -> int:
         """
-        Child classes must implement this static method to create
-        a celery job.
+        Celery job running a search. The news are stored in the result
+        store (see `results.store`) as they are found, under `job_id`
+        (by default the id of this task) and in the given `part` of it
+        (for the subtasks of a job).
+
+        Returns the number of news stored.
         """
-        # First get the factory instance
-        factory = news_factory_class()
+        job_id = job_id or task.request.id
 
-        # Now get the factory method that should be called
-        factory_method = getattr(factory, news_factory_method)
+        # With the async engine the whole job runs on a single event loop,
+        # and the news are only stored once it finishes
+        if getattr(settings, "NEWS_FACTORY_ENGINE", "sync") == "async":
+            # Imported here, so that the sync engine does not need httpx
+            from .aio import AsyncNewsFactory
+
+            news = (
+                AsyncNewsFactory(news_factory_class)
+                .run(news_factory_method, **data)
+                .news
+            )
+        else:
+            # Get the streaming version of the factory method
+            # (e.g. `iter_tag_search` for `from_tag_search`).
+            # It creates the factory instance itself.
+            factory_method = getattr(
+                news_factory_class,
+                news_factory_method.replace("from_", "iter_", 1),
+            )
+            news = factory_method(**data)
+
+        # Store the news in chunks, as they are found, and keep them
+        # in the article store for later jobs
+        source = source_of(news_factory_class)
+        stored = 0
+        for chunk in chunked(
+            news, getattr(settings, "NEWS_RESULTS_CHUNK_SIZE", 50)
+        ):
+            stored += get_result_store().append(job_id, chunk, part)
+            save_news(chunk, source)
+
+        # Subtasks are part of a job, which finishes with `merge_job`
+        if part is None:
+            finish_memoized_job(job_id)
+        return stored
+
+    def enqueue_job(self, data: dict, job_id: str = None):
+        """
+        Enqueues the search job with the validated request `data`,
+        returning its result (whose id is the job id). A `job_id`
+        is generated if none is given.
+        """
+        return self.celery_job.apply_async(
+            (self.news_factory_class, self.news_factory_method),
+            data,  # keyword arguments of the factory method
+            task_id=job_id,
+        )
 
-        # Call the method with the data
-        return factory_method(**data)
+    def submit_job(self, data: dict):
+        """
+        Returns the job searching the validated request `data`: an
+        identical job submitted recently, either running or finished
+        (see `core.memo`), or a new one.
+        """
+        memo = get_job_memo()
+        if memo is None:
+            return self.enqueue_job(data)
+
+        factory = getattr(self.news_factory_class, "__name__", "combined")
+        key = job_key(factory, self.news_factory_method, data)
+        job_id = uuid()
+        existing_id = memo.claim(key, job_id)
+        if existing_id is not None:
+            existing = AsyncResult(existing_id)
+            # Failed jobs are searched again
+            if existing.state not in (states.FAILURE, states.REVOKED):
+                return existing
+            memo.replace(key, job_id)
+
+        try:
+            return self.enqueue_job(data, job_id)
+        except BaseException:
+            # Don't point identical searches to a job that never ran
+            memo.release(key, job_id)
+            raise
+
+    @staticmethod
+    @shared_task(bind=True)
+    def merge_job(task, results: list, **data) -> int:
+        """
+        Final step of a job made of subtasks (see `enqueue_subjobs`),
+        which stored their news in the parts of this task's id. Merges
+        the parts, in the order of the subtasks. `data` are the job
+        arguments, kept for the results endpoint.
+
+        Returns the number of news stored (without duplicates).
+        """
+        stored = get_result_store().merge_parts(task.request.id)
+        finish_memoized_job(task.request.id)
+        return stored
+
+    def enqueue_subjobs(self, subjobs: list, data: dict, job_id: str = None):
+        """
+        Enqueues a job made of several subtasks, running in parallel across
+        the workers (a Celery chord). Each subjob is a tuple with the news
+        factory class and the arguments of `news_factory_method`. They all
+        store their news under the job id, dropping duplicates, and the job
+        finishes once all of them finish (see `merge_job`). Its news keep
+        the order of the subjobs.
+
+        `data` are the job arguments shown by the results endpoint.
+
+        Returns the result of the merge task (whose id is the job id,
+        generated if no `job_id` is given).
+        """
+        merge_job = self.merge_job.s(**data).set(task_id=job_id or uuid())
+
+        # The merge task is only sent once every subtask finished.
+        # Until then it would look unknown, so mark it as 'WAITING'
+        # (see `opennews.celery.update_sent_state`)
+        if not self.merge_job.app.conf.task_always_eager:
+            self.merge_job.backend.store_result(merge_job.id, None, "WAITING")
+
+        # Each subjob stores its news in its own part
+        get_result_store().start_parts(merge_job.id, len(subjobs))
+        return chord(
+            self.celery_job.s(
+                news_factory_class,
+                self.news_factory_method,
+                job_id=merge_job.id,
+                part=part,
+                **subjob_data,
+            )
+            for part, (news_factory_class, subjob_data) in enumerate(subjobs)
+        )(merge_job)
 
     @extend_schema(responses={201: JobSerializer})
     def post(self, request, *args, **kwargs):
@@ -58,12 +212,8 @@ class BaseJobCreationView(mixins.CreateModelMixin, generics.GenericAPIView):
         # Return a 400 response if the data was invalid.
         serializer.is_valid(raise_exception=True)
 
-        # Enqueue job
-        job = self.celery_job.delay(
-            self.news_factory_class,
-            self.news_factory_method,
-            **serializer.data,  # unpack dict data to factory method
-        )
+        # Enqueue job (or reuse an identical one)
+        job = self.submit_job(serializer.data)
 
         # Create a job serializer
         job_serializer = JobSerializer(
@@ -80,7 +230,8 @@ class BaseJobCreationView(mixins.CreateModelMixin, generics.GenericAPIView):
 
 class BaseURLSearchView(BaseJobCreationView):
     """
-    Abstract View to create a URL Search Job
+    Abstract View to create a URL Search Job. Jobs with many URLs
+    are split into subtasks, searched in parallel by the workers.
     """
 
     # Define serializer class
@@ -89,6 +240,27 @@ class BaseURLSearchView(BaseJobCreationView):
     # Define the factory method to be called
     news_factory_method = "from_url_search"
 
+    def enqueue_job(self, data: dict, job_id: str = None):
+        urls = data["urls"]
+        chunk_size = getattr(settings, "NEWS_URL_SEARCH_CHUNK_SIZE", 100)
+
+        # Small jobs run in a single task
+        if len(urls) <= chunk_size:
+            return super().enqueue_job(data, job_id)
+
+        # Split the URLs into chunks, searched by different workers
+        subjobs = [
+            (self.news_factory_class, {"urls": urls[i : i + chunk_size]})
+            for i in range(0, len(urls), chunk_size)
+        ]
+        # Only a summary of the URLs is kept as the job arguments,
+        # they are shown whenever the results are polled
+        return self.enqueue_subjobs(
+            subjobs,
+            {"number_of_urls": len(urls), "number_of_chunks": len(subjobs)},
+            job_id,
+        )
+
 
 class BaseTagSearchView(BaseJobCreationView):
     """
@@ -112,3 +284,43 @@ class BaseKeywordSearchView(BaseJobCreationView):
 
     # Define the factory method to be called
     news_factory_method = "from_keyword_search"
+
+
+class BaseCombinedSearchView(BaseJobCreationView):
+    """
+    Abstract view to create a search job against every newspaper.
+
+    The search runs in parallel for each registered news factory (a Celery
+    chord), and the news found are merged into a single result, without
+    duplicates. The job id is the id of the merge task.
+    """
+
+    def enqueue_job(self, data: dict, job_id: str = None):
+        return self.enqueue_subjobs(
+            [
+                (news_factory_class, data)
+                for news_factory_class in NewsFactory.registered_factories()
+            ],
+            data,
+            job_id,
+        )
+
+
+class CombinedTagSearchView(BaseCombinedSearchView):
+    """
+    Creates a Tag search job in every newspaper. A list of tags
+    must be provided (e.g. "Política" / "Sociedade" / "Economia" / "Cultura")
+    """
+
+    serializer_class = TagSearchSerializer
+    news_factory_method = "from_tag_search"
+
+
+class CombinedKeywordSearchView(BaseCombinedSearchView):
+    """
+    Creates a Keyword search job in every newspaper. A list of keywords
+    must be provided (e.g. "desporto português")
+    """
+
+    serializer_class = KeywordSearchSerializer
+    news_factory_method = "from_keyword_search"
@@ -25,7 +25,7 @@ from celery import current_app
 
 # `after_task_publish` is available in celery 3.1+
 # for older versions use the deprecated `task_sent` signal
-from celery.signals import after_task_publish
+from celery.signals import after_task_publish, worker_process_init
 
 # when using celery versions older than 4.0, use body instead of headers
 
@@ -51,3 +51,16 @@ def update_sent_state(sender=None, headers=None, body=None, **kwargs):
     backend = task.backend if task else current_app.backend
     # Change status of task to 'WAITING'
     backend.store_result(info["id"], None, "WAITING")
+
+
+@worker_process_init.connect
+def prewarm_news_sessions(**kwargs):
+    """
+    Logs in every news factory as soon as a worker process starts, so the
+    first job does not pay the login cost. Runs in a background thread,
+    since Celery kills processes that take too long to initialize.
+    """
+    import threading
+    from core.sessions import prewarm_sessions
+
+    threading.Thread(target=prewarm_sessions, daemon=True).start()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 import os
+import tempfile
 
 
 def get_env(key: str, default: str = None) -> str:
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
     "publico",
     "cm",
     "results",
+    "articles",
 ]
 
 REST_FRAMEWORK = {
@@ -101,7 +103,12 @@ WSGI_APPLICATION = "opennews.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        # Not `get_env`, which would read the (existing) file
+        "NAME": os.getenv(
+            "DATABASE_PATH", os.path.join(BASE_DIR, "db.sqlite3")
+        ),
+        # Wait for the other worker processes writing to the article store
+        "OPTIONS": {"timeout": 20},
     }
 }
 
@@ -153,11 +160,113 @@ CELERY_RESULT_BACKEND = get_env(
 )
 CELERY_ACCEPT_CONTENT = ["json", "pickle"]
 CELERY_TASK_SERIALIZER = "pickle"
+# Jobs only return the number of news found (the news themselves are kept
+# in `results.store`), but extended results also keep the job arguments,
+# which include the news factory class
 CELERY_RESULT_SERIALIZER = "pickle"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TIMEZONE = "Europe/Lisbon"
 CELERY_RESULT_EXTENDED = True
 
+# News factories settings
+
+# Number of threads used to download news concurrently (1 disables concurrency)
+NEWS_FACTORY_MAX_WORKERS = int(get_env("NEWS_FACTORY_MAX_WORKERS", "8"))
+# Maximum number of simultaneous requests against the same host
+NEWS_FACTORY_MAX_PER_HOST = int(get_env("NEWS_FACTORY_MAX_PER_HOST", "4"))
+# Number of listing pages requested ahead while walking a search (1 disables it)
+NEWS_PAGINATION_WINDOW = int(get_env("NEWS_PAGINATION_WINDOW", "4"))
+# Maximum number of URLs in a URL search job
+NEWS_URL_SEARCH_MAX_URLS = int(get_env("NEWS_URL_SEARCH_MAX_URLS", "20000"))
+# URL search jobs are split into subtasks of (at most) this many URLs
+NEWS_URL_SEARCH_CHUNK_SIZE = int(get_env("NEWS_URL_SEARCH_CHUNK_SIZE", "100"))
+# Number of keywords/tags of a single job searched in parallel (1 disables it)
+NEWS_SEARCH_MAX_PARALLEL_TERMS = int(
+    get_env("NEWS_SEARCH_MAX_PARALLEL_TERMS", "5")
+)
+# Jobs store their news in Redis in chunks of this many news, as they run
+NEWS_RESULTS_CHUNK_SIZE = int(get_env("NEWS_RESULTS_CHUNK_SIZE", "50"))
+NEWS_RESULTS_REDIS_URL = get_env(
+    "NEWS_RESULTS_REDIS_URL", CELERY_RESULT_BACKEND
+)
+# Seconds the news of a job are kept (Celery keeps results for a day)
+NEWS_RESULTS_TTL = int(get_env("NEWS_RESULTS_TTL", "86400"))
+# Seconds after a job finished during which a search with the same
+# arguments reuses it (0 to always create new jobs). Must not exceed
+# NEWS_RESULTS_TTL. Running jobs are reused until they finish (for up
+# to NEWS_RESULTS_TTL seconds).
+NEWS_JOB_MEMO_TTL = int(get_env("NEWS_JOB_MEMO_TTL", "600"))
+# Seconds the scraped news are reused by later jobs (0 to always scrape)
+NEWS_ARTICLE_STORE_MAX_AGE = int(
+    get_env("NEWS_ARTICLE_STORE_MAX_AGE", str(7 * 24 * 60 * 60))
+)
+# Seconds between the deletions of the expired news from the article store
+NEWS_ARTICLE_STORE_PRUNE_INTERVAL = int(
+    get_env("NEWS_ARTICLE_STORE_PRUNE_INTERVAL", "3600")
+)
+# Runtime type checks of the news factories (typeguard)
+NEWS_TYPE_CHECKS = get_env("NEWS_TYPE_CHECKS", "true").lower() == "true"
+# Scraping engine used by search jobs: "sync" (requests) or "async" (httpx)
+NEWS_FACTORY_ENGINE = get_env("NEWS_FACTORY_ENGINE", "sync")
+# Async engine limits
+NEWS_FACTORY_ASYNC_MAX_CONNECTIONS = int(
+    get_env("NEWS_FACTORY_ASYNC_MAX_CONNECTIONS", "32")
+)
+NEWS_FACTORY_ASYNC_MAX_PER_HOST = int(
+    get_env("NEWS_FACTORY_ASYNC_MAX_PER_HOST", "16")
+)
+# Use HTTP/2 in the async engine (requires the `h2` package)
+NEWS_FACTORY_HTTP2 = get_env("NEWS_FACTORY_HTTP2", "false").lower() == "true"
+# Parse news pages while they are downloaded (sync engine), stopping the
+# download once the story is read. Pages missing from the HTTP cache are
+# still downloaded in full (without parsing the rest), to be cached
+NEWS_STREAMING_PARSE = (
+    get_env("NEWS_STREAMING_PARSE", "false").lower() == "true"
+)
+
+# HTTP client settings (shared by every outbound request)
+NEWS_HTTP_CONNECT_TIMEOUT = float(get_env("NEWS_HTTP_CONNECT_TIMEOUT", "5"))
+NEWS_HTTP_READ_TIMEOUT = float(get_env("NEWS_HTTP_READ_TIMEOUT", "30"))
+# Number of hosts to keep a connection pool for
+NEWS_HTTP_POOL_CONNECTIONS = int(get_env("NEWS_HTTP_POOL_CONNECTIONS", "10"))
+# Number of connections kept alive per host
+NEWS_HTTP_POOL_MAXSIZE = int(get_env("NEWS_HTTP_POOL_MAXSIZE", "10"))
+NEWS_HTTP_USER_AGENT = get_env(
+    "NEWS_HTTP_USER_AGENT",
+    "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:40.0) Gecko/20100101 Firefox/40.1",
+)
+
+# On-disk cache of news pages, revalidated with conditional requests
+NEWS_HTTP_CACHE_ENABLED = (
+    get_env("NEWS_HTTP_CACHE_ENABLED", "true").lower() == "true"
+)
+NEWS_HTTP_CACHE_DIR = get_env(
+    "NEWS_HTTP_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "opennews"),
+)
+# Seconds before a cached page must be revalidated (default: 1 day)
+NEWS_HTTP_CACHE_MAX_AGE = int(get_env("NEWS_HTTP_CACHE_MAX_AGE", "86400"))
+# Size budget (in bytes) of the cached pages (default: 512 MB)
+NEWS_HTTP_CACHE_MAX_SIZE = int(
+    get_env("NEWS_HTTP_CACHE_MAX_SIZE", str(512 * 1024 * 1024))
+)
+
+# Logged in sessions are reused for this many seconds (default: 6 hours)
+NEWS_SESSION_TTL = int(get_env("NEWS_SESSION_TTL", str(6 * 60 * 60)))
+# Share the login cookies between workers through Redis
+# (e.g. "redis://redis:6379/1")
+NEWS_SESSION_REDIS_URL = get_env("NEWS_SESSION_REDIS_URL", "")
+
+# Cache of Publico's summary API responses, by news id
+PUBLICO_SUMMARY_CACHE_TTL = int(get_env("PUBLICO_SUMMARY_CACHE_TTL", "3600"))
+PUBLICO_SUMMARY_CACHE_MAX_ENTRIES = int(
+    get_env("PUBLICO_SUMMARY_CACHE_MAX_ENTRIES", "10000")
+)
+# Share the cache between workers through Redis (e.g. "redis://redis:6379/1")
+PUBLICO_SUMMARY_CACHE_REDIS_URL = get_env(
+    "PUBLICO_SUMMARY_CACHE_REDIS_URL", ""
+)
+
 # Disable Authentication Section from API Documentation
 SWAGGER_SETTINGS = {"SECURITY_DEFINITIONS": None}
 
@@ -1,36 +1,41 @@
 from .base import *
 
-from .vault import Vault
-
-unseal_keys = get_env("VAULT_KEYS_CSV").split(",")
+from .vault import Vault, cached_secrets
+
+
+def fetch_secrets() -> dict:
+    """
+    Reads the API secrets from Vault
+    """
+    vault = Vault(
+        vault_url=get_env("VAULT_URL"),
+        vault_token=get_env("VAULT_TOKEN"),
+        ensure_unseal=True,
+        unseal_keys=get_env("VAULT_KEYS_CSV").split(","),
+    )
+    secrets = vault.get_secrets(mount_point="opennews_kv", path="api")
+    # Only keep (and cache) the secrets used here
+    return {key: secrets[key] for key in ["DEBUG", "DJANGO_SECRET_KEY"]}
 
 
-# Create Vault instance
-VAULT = Vault(
-    vault_url=get_env("VAULT_URL"),
-    vault_token=get_env("VAULT_TOKEN"),
-    ensure_unseal=True,
-    unseal_keys=unseal_keys,
+# Secrets are fetched once per container (see `cached_secrets`)
+vault_secrets = cached_secrets(
+    fetch_secrets,
+    path=get_env("VAULT_SECRETS_CACHE", "/dev/shm/opennews-secrets.json"),
+    ttl=int(get_env("VAULT_SECRETS_CACHE_TTL", "3600")),
 )
 
 
-DEBUG = bool(
-    VAULT.get_secret(
-        mount_point="opennews_kv",
-        path="api",
-        key="DEBUG",
-    )
-)
+DEBUG = bool(vault_secrets["DEBUG"])
 
 
-SECRET_KEY = VAULT.get_secret(
-    mount_point="opennews_kv",
-    path="api",
-    key="DJANGO_SECRET_KEY",
-)
+SECRET_KEY = vault_secrets["DJANGO_SECRET_KEY"]
 
 ALLOWED_HOSTS = ["api.onews.dsilva.dev", "localhost", "127.0.0.1"]
 
+# Skip the runtime type checks on the hot path of the workers
+NEWS_TYPE_CHECKS = get_env("NEWS_TYPE_CHECKS", "false").lower() == "true"
+
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
@@ -1,7 +1,11 @@
 """
 Module to interact with Hashicorp Vault.
 """
-import hvac
+import fcntl
+import json
+import os
+import time
+from typing import Callable
 
 
 class Vault:
@@ -12,6 +16,9 @@ class Vault:
         ensure_unseal: bool = True,
         unseal_keys: list = [],
     ) -> None:
+        # Only needed when the secrets are not cached (see `cached_secrets`)
+        import hvac
+
         self.client = hvac.Client(url=vault_url, token=vault_token)
 
         if self.client.sys.is_sealed():
@@ -34,13 +41,67 @@ class Vault:
                 "Vault authentication failed. Please check credentials"
             )
 
-    def get_secret(self, mount_point: str, path: str, key: str) -> str:
+    def get_secrets(self, mount_point: str, path: str) -> dict:
         """
-        Returns the secret (defined by a key) located at a given path
+        Returns every secret (key -> value) located at a given path
         """
 
         read_response = self.client.secrets.kv.read_secret_version(
             path=path, mount_point=mount_point
         )
 
-        return read_response["data"]["data"][key]
+        return read_response["data"]["data"]
+
+    def get_secret(self, mount_point: str, path: str, key: str) -> str:
+        """
+        Returns the secret (defined by a key) located at a given path
+        """
+
+        return self.get_secrets(mount_point, path)[key]
+
+
+def cached_secrets(fetch: Callable[[], dict], path: str, ttl: int) -> dict:
+    """
+    Returns the secrets returned by `fetch`, cached for `ttl` seconds in
+    the file at `path`. The file should be in a tmpfs (e.g. /dev/shm, which
+    is private to each container), so secrets never reach the disk.
+
+    Every process of the container (web and Celery workers, management
+    commands) reads the cached secrets instead of calling Vault at startup.
+    The file is only readable by its owner, and processes starting at the
+    same time wait for the first one to fetch the secrets.
+
+    Secrets are fetched without caching if `ttl` is 0 or the directory of
+    `path` does not exist.
+    """
+    if not ttl or not os.path.isdir(os.path.dirname(path)):
+        return fetch()
+
+    lock = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as cache:
+                stat = os.fstat(cache.fileno())
+                # Ignore files anyone else could have written
+                if (
+                    stat.st_uid == os.getuid()
+                    and stat.st_mode & 0o077 == 0
+                    and time.time() - stat.st_mtime < ttl
+                ):
+                    return json.load(cache)
+        except (OSError, ValueError):
+            pass
+
+        secrets = fetch()
+        # Write the new secrets aside, then swap them in at once
+        temporary_path = f"{path}.{os.getpid()}"
+        fd = os.open(
+            temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        with os.fdopen(fd, "w") as cache:
+            json.dump(secrets, cache)
+        os.replace(temporary_path, path)
+        return secrets
+    finally:
+        os.close(lock)
@@ -16,5 +16,6 @@ urlpatterns = [
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
     path("publico/", include("publico.urls")),
     path("cm/", include("cm.urls")),
+    path("combined/", include("core.urls")),
     path("results/", include("results.urls")),
 ]
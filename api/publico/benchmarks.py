@@ -0,0 +1,53 @@
+"""
+Contains Publico's benchmarks (see `core.benchmarks`)
+"""
+import os
+
+from core.benchmarks import benchmark, extraction_benchmark, load_fixtures
+from core.utils import og_url
+
+from . import models
+from .models import PublicoNewsFactory
+
+# Full size news pages, saved with the tests
+FIXTURES = os.path.join(
+    os.path.dirname(__file__), "tests", "fixtures", "pages"
+)
+
+
+def legacy_extract(tree) -> tuple:
+    """
+    Extracts the fields of a news page with the string XPath expressions
+    searching the whole document (compiled on every call)
+    """
+    url = tree.xpath("//meta[@property='og:url']")[0].get("content")
+    is_live = len(tree.xpath("//span[@class='label label--live']")) != 0
+    text = tree.xpath(
+        "//div[@class='story__body']//p//text()[not(ancestor::aside)][not(ancestor::div[contains(@class, 'supplemental-slot')])] | "
+        "//div[@class='story__body']//blockquote//text()[not(ancestor::aside)][not(ancestor::div[contains(@class, 'supplemental-slot')])] | "
+        "//div[@class='story__body']//*[self::h1 or self::h2 or self::h3 or self::h4]//text()[not(ancestor::aside)][not(ancestor::div[contains(@class, 'supplemental-slot')])]"
+    )
+    return url, is_live, " ".join(text)
+
+
+def extract(tree) -> tuple:
+    """
+    Extracts the fields of a news page with the compiled extraction plan
+    """
+    url = og_url(tree)
+    is_live = bool(models._LIVE_LABEL(tree))
+    text = PublicoNewsFactory._story_text(tree)
+    return url, is_live, " ".join(text)
+
+
+@benchmark("publico-extraction")
+def extraction(number: int, fixtures: str = None, **options) -> list:
+    """
+    Articles/second extracted from the saved news pages in the `fixtures`
+    directory (by default `FIXTURES`), with string XPath expressions vs the extraction plan
+    """
+    return extraction_benchmark(
+        load_fixtures(fixtures or FIXTURES, ["www.publico.pt"]),
+        {"string XPaths": legacy_extract, "extraction plan": extract},
+        number,
+    )
@@ -5,23 +5,68 @@ import datetime
 import requests
 import os
 import json
+import threading
+from typing import Iterator, Optional
 from urllib.parse import urlparse
-from lxml import html
 
+from django.conf import settings
 from django.utils.dateparse import parse_datetime
 
-from typeguard import typechecked
 
+from core import http
+from core.cache import TTLCache
 from core.models import NewsFactory, News
+from core.typechecks import typechecked
+from core.utils import LazyXPath, og_url
 from core.exceptions import UnsupportedNews
 
 
+# Per process cache of the summary API responses (see `get_summary_cache`)
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> TTLCache:
+    """
+    Returns the process wide cache of Publico's summary API responses,
+    indexed by news id.
+    """
+    global _summary_cache
+
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = TTLCache(
+                ttl=settings.PUBLICO_SUMMARY_CACHE_TTL,
+                max_entries=settings.PUBLICO_SUMMARY_CACHE_MAX_ENTRIES,
+                redis_url=settings.PUBLICO_SUMMARY_CACHE_REDIS_URL,
+                namespace="opennews:publico:summary",
+            )
+    return _summary_cache
+
+
+# Extraction plan of the news pages: XPath expressions compiled once
+# (instead of on every `tree.xpath` call). The text is only searched
+# inside the story container, and returned as plain strings (not "smart"
+# ones, which keep a reference to the whole tree).
+_LIVE_LABEL = LazyXPath("//span[@class='label label--live']")
+_STORY_BODY = LazyXPath("//div[@class='story__body']")
+_STORY_TEXT = LazyXPath(
+    "(.//p | .//blockquote | .//h1 | .//h2 | .//h3 | .//h4)//text()"
+    "[not(ancestor::aside)]"
+    "[not(ancestor::div[contains(@class, 'supplemental-slot')])]",
+    smart_strings=False,
+)
+
+
 @typechecked
 class PublicoNewsFactory(NewsFactory):
     """
     Performs and stores different types of search in Publico's website
     """
 
+    # Cookie of Publico's login (see `_login`)
+    auth_cookies = ("PUBLICO_AUTH",)
+
     @staticmethod
     def _login() -> requests.Session:
         """
@@ -32,144 +77,207 @@ class PublicoNewsFactory(NewsFactory):
             "password": os.getenv("PUBLICO_PW"),
         }
         login_url = "https://www.publico.pt/api/user/login"
-        session = requests.Session()
-        session.headers.update(
-            {
-                "user-agent": "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:40.0) Gecko/20100101 Firefox/40.1",
-            }
-        )
+        session = http.build_session()
         # send POST request to login
         session.post(login_url, data=login_payload)
         return session
 
-    def _validate_url(self, url: str) -> bool:
-        # First we try to obtain news id from url
-        try:
-            news_id = urlparse(url).path.split("-")[-1]
-        except IndexError:
-            return False
+    @staticmethod
+    def _summary_url(news_id: int) -> str:
+        """
+        Returns the URL of Publico's news summary API endpoint
+        """
+        return f"https://api.publico.pt/content/summary/scriptor_noticias/{news_id}"
 
-        # Check if is integer (try parse)
+    @staticmethod
+    def _news_id(url: str) -> Optional[int]:
+        """
+        Extracts the news id from a Publico news URL (None if not found)
+        """
         try:
-            news_id = int(news_id)
+            return int(urlparse(url).path.split("-")[-1])
         except ValueError:
+            return None
+
+    def _get_summary(self, news_id: int) -> tuple[int, str]:
+        """
+        Returns the status code and body of the summary API response
+        for `news_id`. Responses are cached, and concurrent lookups of
+        the same id are made only once.
+        """
+        status_code, summary = get_summary_cache().get_or_load(
+            news_id,
+            lambda: self._get_text(self._summary_url(news_id)),
+            # Don't keep server errors
+            cache_if=lambda response: response[0] < 500,
+        )
+        return status_code, summary
+
+    def _prefetch_urls(self, url: str) -> list[str]:
+        # Building the news needs a request to the summary API
+        # (unless it is already cached)
+        news_id = self._news_id(url)
+        if news_id is None or news_id in get_summary_cache():
+            return []
+        return [self._summary_url(news_id)]
+
+    def _validate_url(self, url: str) -> bool:
+        # First we try to obtain news id from url
+        news_id = self._news_id(url)
+        if news_id is None:
             return False
 
         # Make a request with this id and check for valid response (200)
-        response = requests.get(
-            f"https://api.publico.pt/content/summary/scriptor_noticias/{news_id}"
-        )
-        if not response.status_code == 200:
+        status_code, _ = self._get_summary(news_id)
+        if not status_code == 200:
             return False
         return super()._validate_url(url)
 
     @classmethod
-    def from_tag_search(
+    def _tag_search_page_url(
+        cls,
+        tag: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> str:
+        # Normalize tag
+        tag = tag.replace(" ", "-").lower()
+        # Publico's pages start at 1
+        return f"https://www.publico.pt/api/list/{tag}?page={page + 1}"
+
+    @classmethod
+    def _parse_tag_search_page(
+        cls,
+        page_content: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> tuple[list[str], bool]:
+        # Read the json data
+        data = json.loads(page_content)
+        # An empty page means we reached the end of the listing
+        if not data:
+            return [], False
+
+        urls = []
+        # iterate over each news dict
+        for item in data:
+            # If news out of lower bound date, stop the search
+            if parse_datetime(item.get("data")).date() < starting_date:
+                return urls, False
+
+            # If news more recent that end date, SKIP AHEAD
+            elif parse_datetime(item.get("data")).date() > ending_date:
+                continue
+
+            # If news inside the date rage, collect the URL
+            else:
+                urls.append(item.get("shareUrl"))
+
+        return urls, True
+
+    @classmethod
+    def _oldest_date_in_tag_page(
+        cls,
+        tag: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> Optional[datetime.date]:
+        # Listings are sorted from newest to oldest
+        data = json.loads(
+            http.get(
+                cls._tag_search_page_url(tag, page, starting_date, ending_date)
+            ).text
+        )
+        if not data:
+            return None
+        return parse_datetime(data[-1].get("data")).date()
+
+    @classmethod
+    def _keyword_search_page_url(
+        cls,
+        keyword: str,
+        page: int,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> str:
+        # Normalize keyword
+        keyword = keyword.lower()
+        # Publico's pages start at 1
+        return f"https://www.publico.pt/api/list/search/?query={keyword}&start={starting_date.strftime('%d-%m-%Y')}&end={ending_date.strftime('%d-%m-%Y')}&page={page + 1}"
+
+    @classmethod
+    def _parse_keyword_search_page(
+        cls,
+        page_content: str,
+        starting_date: datetime.date,
+        ending_date: datetime.date,
+    ) -> tuple[list[str], bool]:
+        # Read the json data
+        data = json.loads(page_content)
+        # Get the URLs (this search type needs fullUrl)
+        # An empty page means we reached the end of the results
+        return [d.get("fullUrl") for d in data], bool(data)
+
+    @classmethod
+    def iter_tag_search(
         cls,
         tags: list[str],
         starting_date: datetime.date,
         ending_date: datetime.date,
-    ) -> NewsFactory:
+    ) -> Iterator[News]:
         """
         Searches news in Publico's website by tags, in a date range.
         """
-
-        # Create news URL list
-        collected_news_urls = []
-
-        # Iterate over each tag
-        for tag in tags:
-            # Normalize tag
-            tag = tag.replace(" ", "-").lower()
-            # Start page number
-            page_number = 1
-            # Flag to stop the search
-            stop_entire_search = False
-
-            while (
-                response := requests.get(
-                    f"https://www.publico.pt/api/list/{tag}?page={page_number}"
-                ).text
-            ) != "[]":
-
-                # Read the json data
-                data = json.loads(response)
-                # iterate over each news dict
-                for item in data:
-                    # If news out of lower bound date, stop the search
-                    if parse_datetime(item.get("data")).date() < starting_date:
-                        stop_entire_search = True  # Will break main loop
-                        break  # Will break current loop
-
-                    # If news more recent that end date, SKIP AHEAD
-                    elif parse_datetime(item.get("data")).date() > ending_date:
-                        continue
-
-                    # If news inside the date rage, collect the URL
-                    else:
-
-                        collected_news_urls.append(item.get("shareUrl"))
-                if stop_entire_search:
-                    break
-                # Increment page
-                page_number += 1
-
-        # Remove (possible) duplicates
-        collected_news_urls = list(dict.fromkeys(collected_news_urls))
+        # Collect the news URLs from the tag listings
+        collected_news_urls = cls._collect_search_urls(
+            "tag", tags, starting_date, ending_date
+        )
 
         # Pass collected URLs to URL Search
-        return cls.from_url_search(collected_news_urls)
+        yield from cls.iter_url_search(collected_news_urls)
 
     @classmethod
-    def from_keyword_search(
+    def iter_live_keyword_search(
         cls,
         keywords: list[str],
         starting_date: datetime.date,
         ending_date: datetime.date,
-    ) -> NewsFactory:
-
-        # Create news URL list
-        collected_news_urls = []
-
-        # Iterate over each keyword
-        for keyword in keywords:
-            # Normalize keyword
-            keyword = keyword.lower()
-            # Start page number
-            page_number = 1
-
-            while (
-                url := f"https://www.publico.pt/api/list/search/?query={keyword}&start={starting_date.strftime('%d-%m-%Y')}&end={ending_date.strftime('%d-%m-%Y')}&page={page_number}"
-            ) != "[]":
-
-                print(url)
-                # Read the json data
-                data = json.loads(requests.get(url).text)
-
-                if not data:
-                    break
+    ) -> Iterator[News]:
+        """
+        Searches news in Publico's website by keywords, in a date range.
+        """
+        # Collect the news URLs from the search results
+        collected_news_urls = cls._collect_search_urls(
+            "keyword", keywords, starting_date, ending_date
+        )
 
-                # Get the URLs (this search type needs fullUrl)
-                urls = [d.get("fullUrl") for d in data]
-                # Append URLs to list
-                collected_news_urls += urls
-                # Increment page
-                page_number += 1
+        # Pass collected URLs to URL Search
+        yield from cls.iter_url_search(collected_news_urls)
 
-        # Remove (possible) duplicates
-        collected_news_urls = list(dict.fromkeys(collected_news_urls))
+    def _required_elements(self, url: str) -> set[tuple[str, Optional[str]]]:
+        # The live label is in the header, before the story body
+        return {("div", "story__body")}
 
-        # Pass collected URLs to URL Search
-        return cls.from_url_search(collected_news_urls)
+    @staticmethod
+    def _story_text(tree) -> list[str]:
+        """
+        Returns the text nodes of the news body (paragraphs, quotes and
+        headings), without asides and supplemental slots
+        """
+        return [
+            text for body in _STORY_BODY(tree) for text in _STORY_TEXT(body)
+        ]
 
-    def from_html_string(self, html_string: str) -> News:
+    def from_html_tree(self, tree) -> News:
         """
-        Builds a News object from a given URL.
+        Builds a News object from a parsed news page.
 
         Parameters
         ----------
-        html_string : str
-            A news page HTML's string
+        tree : lxml.html.HtmlElement
+            A news page HTML's tree
 
         Returns
         -------
@@ -182,25 +290,21 @@ class PublicoNewsFactory(NewsFactory):
             If news is minute updated.
         """
 
-        # Build HTML tree
-        tree = html.fromstring(html_string)
-
         # Extract URL
-        url = tree.xpath("//meta[@property='og:url']")[0].get("content")
+        url = og_url(tree)
+        if url is None:
+            raise UnsupportedNews
 
         # Extract news id
-        try:
-            news_id = int(urlparse(url).path.split("-")[-1])
-        except ValueError:
+        news_id = self._news_id(url)
+        if news_id is None:
             raise UnsupportedNews(url)
 
         # Make GET request to publico news summary API endpoint
-        response = requests.get(
-            f"https://api.publico.pt/content/summary/scriptor_noticias/{news_id}"
-        )
+        _, summary = self._get_summary(news_id)
 
         # Load json response
-        json_doc = json.loads(response.text)
+        json_doc = json.loads(summary)
         # Check if we got any data. If not the news type is not supported
         if json_doc is None:
             raise UnsupportedNews(url)
@@ -209,9 +313,7 @@ class PublicoNewsFactory(NewsFactory):
         json_doc = {k: v for k, v in json_doc.items() if v is not None}
 
         # If minute updated news, raise Unsupported News
-        minuteUpdated = tree.xpath("//span[@class='label label--live']")
-
-        if len(minuteUpdated) != 0:
+        if _LIVE_LABEL(tree):
             raise UnsupportedNews
 
         # Extract description, might be null.
@@ -229,15 +331,7 @@ class PublicoNewsFactory(NewsFactory):
         published_at = parse_datetime(json_doc["data"])
 
         # Extract text
-        text = " ".join(
-            tree.xpath(
-                (
-                    "//div[@class='story__body']//p//text()[not(ancestor::aside)][not(ancestor::div[contains(@class, 'supplemental-slot')])] | \
-                //div[@class='story__body']//blockquote//text()[not(ancestor::aside)][not(ancestor::div[contains(@class, 'supplemental-slot')])]  | \
-                //div[@class='story__body']//*[self::h1 or self::h2 or self::h3 or self::h4]//text()[not(ancestor::aside)][not(ancestor::div[contains(@class, 'supplemental-slot')])]"
-                )
-            )
-        ).replace(
+        text = " ".join(self._story_text(tree)).replace(
             "Subscreva gratuitamente as newsletters e receba o melhor da actualidade e os trabalhos mais profundos do Público.",
             "",
         )
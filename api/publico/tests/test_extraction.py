@@ -0,0 +1,48 @@
+import os
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from lxml import html
+
+from ..benchmarks import extract, legacy_extract
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class ExtractionTest(SimpleTestCase):
+    def setUp(self):
+        with open(os.path.join(FIXTURES, "news.html"), "rb") as fixture:
+            self.tree = html.fromstring(fixture.read())
+
+    def test_extraction_plan(self):
+        """
+        Tests that the extraction plan finds the same fields as the
+        string XPath expressions it replaced
+        """
+        url, is_live, text = extract(self.tree)
+
+        self.assertEqual((url, is_live, text), legacy_extract(self.tree))
+        self.assertIn("Um intertítulo", text)
+        self.assertIn("Uma citação", text)
+        self.assertNotIn("Leia também", text)
+        self.assertNotIn("Publicidade", text)
+        self.assertNotIn("Rodapé", text)
+
+    def test_extraction_benchmark(self):
+        """
+        Tests that the extraction benchmark runs on the saved pages,
+        by default the full size ones
+        """
+        for fixtures in [FIXTURES, None]:
+            with self.subTest(fixtures):
+                out = StringIO()
+                call_command(
+                    "benchmark",
+                    "publico-extraction",
+                    number=2,
+                    fixtures=fixtures,
+                    stdout=out,
+                )
+
+                self.assertIn("articles/s", out.getvalue())
@@ -0,0 +1,25 @@
+"""
+Contains the renderers of the results endpoint
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON (one JSON document per line).
+
+    The news of a job are streamed by `ResultsView` itself, so this renderer
+    is only used to negotiate the format and for non streamed responses
+    (e.g. errors), which are rendered as a single line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode() + b"\n"
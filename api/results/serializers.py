@@ -8,11 +8,42 @@ from rest_framework.exceptions import NotFound
 
 from core.serializers import NewsSerializer
 
+from .store import get_result_store
+
+
+class ResultsQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of the results endpoint, to read a page of
+    the news and only some of their fields
+    """
+
+    # Number of news to skip
+    offset = serializers.IntegerField(min_value=0, default=0)
+    # Maximum number of news to return (all of them by default)
+    limit = serializers.IntegerField(min_value=1, required=False)
+    # Comma separated news fields to return (e.g. "title,url")
+    fields = serializers.CharField(required=False)
+
+    def validate_fields(self, fields: str) -> list[str]:
+        fields = [
+            field.strip() for field in fields.split(",") if field.strip()
+        ]
+        unknown_fields = set(fields) - set(NewsSerializer().fields)
+        if unknown_fields:
+            raise serializers.ValidationError(
+                f"Unknown news fields: {', '.join(sorted(unknown_fields))}."
+            )
+        return fields
+
 
 class JobResultSerializer(serializers.Serializer):
     """
     Core job result serializer. Serializes the
     results from a particular job.
+
+    A page of the news can be requested with the `offset` and `limit`
+    context keys, and only some of their fields with the `fields` one
+    (see `ResultsQuerySerializer`).
     """
 
     # Id of job (always present in deserialization)
@@ -32,13 +63,37 @@ class JobResultSerializer(serializers.Serializer):
     # The list of found news (might be omitted in deserialization)
     news = NewsSerializer(many=True, required=False, allow_null=True)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only keep the requested news fields
+        fields = self.context.get("fields")
+        if fields:
+            news_fields = self.fields["news"].child.fields
+            for field in set(news_fields) - set(fields):
+                news_fields.pop(field)
+
     def get_number_of_news(self, obj) -> int:
         """
         `obj` is the dict created in `to_internal_value`.
-        We acess `news` key.
+        We acess `number_of_news` key (the number of stored news,
+        regardless of the requested page).
+        """
+        return obj.get("number_of_news", None) or None
+
+    def get_news(self, job: AsyncResult) -> dict:
+        """
+        Returns the requested page of the news stored for `job`,
+        with the total number of news
         """
-        news = obj.get("news", None)
-        return len(news) if news else None
+        store = get_result_store()
+        return {
+            "number_of_news": store.count(job.id),
+            "news": store.get(
+                job.id,
+                offset=self.context.get("offset", 0),
+                limit=self.context.get("limit"),
+            ),
+        }
 
     def to_internal_value(self, job: AsyncResult):
 
@@ -58,6 +113,11 @@ class JobResultSerializer(serializers.Serializer):
         if job.state in ["STARTED", "FAILURE"]:
             data |= {"job_arguments": job.kwargs}
 
+        # While the job runs, include the news found so far. Jobs made of
+        # subtasks stay 'WAITING' until every subtask finishes.
+        if job.state in ["WAITING", "STARTED"]:
+            data |= self.get_news(job)
+
         # If job is 'SUCCESS' include every field
         if job.state == "SUCCESS":
             data |= {
@@ -67,7 +127,8 @@ class JobResultSerializer(serializers.Serializer):
                     job.date_done
                     + datetime.timedelta(seconds=job.backend.expires)
                 ),
-                "news": job.result.news,  # result is of type 'NewsFactory'
             }
+            # Jobs store their news as they find them
+            data |= self.get_news(job)
 
         return data
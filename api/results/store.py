@@ -0,0 +1,252 @@
+"""
+Contains the store of the news found by search jobs.
+
+Jobs append their news to the store in chunks while they run, instead of
+returning them all at the end, so workers don't need to hold every news
+and the results endpoint can show the news found so far.
+
+Each job has a Redis list with its news (in the order they were stored)
+and a set with their URLs, so that news found twice (e.g. by two subtasks
+of the same job) are only stored once. Both expire after `ttl` seconds.
+
+Jobs made of subtasks (see `start_parts`) store the news of each subtask
+in its own list, read one after the other, so that the news keep the
+order of the subtasks however they finish. The lists are merged into the
+job list once every subtask finished (see `merge_parts`).
+
+News are stored as compact records (see `encode_record`), so that they
+can be read (and paginated) one by one.
+"""
+import json
+import threading
+import zlib
+from typing import Iterable, Iterator, Optional
+
+import msgpack
+from django.conf import settings
+
+from core.models import News
+from core.serializers import NewsSerializer
+
+
+# Version of the records written by `encode_record`
+RECORD_VERSION = 1
+
+
+def encode_record(news: dict) -> bytes:
+    """
+    Encodes a serialized news as a record: a version byte followed by
+    the news packed with msgpack and compressed with zlib
+    """
+    return bytes([RECORD_VERSION]) + zlib.compress(msgpack.packb(news))
+
+
+def decode_record(record: bytes) -> dict:
+    """
+    Decodes a record written by `encode_record`
+    """
+    # Records stored before versioning were plain JSON objects
+    if record[:1] == b"{":
+        return json.loads(record)
+
+    version = record[0]
+    if version == 1:
+        return msgpack.unpackb(zlib.decompress(record[1:]))
+    raise ValueError(f"Unknown result record version: {version}")
+
+
+class ResultStore:
+    """
+    Redis backed store of the news found by each job
+    """
+
+    def __init__(self, client, ttl: int, namespace: str = "opennews:results"):
+        # `redis.Redis` client
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def _news_key(self, job_id: str, part: Optional[int] = None) -> str:
+        if part is None:
+            return f"{self.namespace}:{job_id}:news"
+        return f"{self.namespace}:{job_id}:news:{part}"
+
+    def _urls_key(self, job_id: str) -> str:
+        return f"{self.namespace}:{job_id}:urls"
+
+    def _parts_key(self, job_id: str) -> str:
+        return f"{self.namespace}:{job_id}:parts"
+
+    def _news_keys(self, job_id: str) -> list[str]:
+        """
+        Returns the keys of the lists with the news of a job,
+        in the order they are read
+        """
+        parts = self.client.get(self._parts_key(job_id))
+        if parts is None:
+            return [self._news_key(job_id)]
+        return [self._news_key(job_id)] + [
+            self._news_key(job_id, part) for part in range(int(parts))
+        ]
+
+    def start_parts(self, job_id: str, parts: int) -> None:
+        """
+        Declares that the news of a job are stored by `parts` subtasks,
+        each one appending to its own part (see `append`)
+        """
+        self.client.set(self._parts_key(job_id), parts, ex=self.ttl)
+
+    def merge_parts(self, job_id: str) -> int:
+        """
+        Moves the news of every part of a job to the job list, in the
+        order of the parts. Must only be called once every part is
+        stored. Returns the number of news of the job.
+        """
+        keys = self._news_keys(job_id)
+        with self.client.pipeline() as pipe:
+            for key in keys:
+                pipe.lrange(key, 0, -1)
+            lists = pipe.execute()
+        records = [record for records in lists for record in records]
+
+        # Readers see either the parts or the merged list
+        with self.client.pipeline() as pipe:
+            pipe.delete(*keys, self._parts_key(job_id))
+            if records:
+                pipe.rpush(self._news_key(job_id), *records)
+                pipe.expire(self._news_key(job_id), self.ttl)
+            pipe.execute()
+        return len(records)
+
+    def append(
+        self, job_id: str, news: Iterable[News], part: Optional[int] = None
+    ) -> int:
+        """
+        Stores the news of a job (in the given part, if any), skipping
+        the ones whose URL was already stored. Returns the number of
+        news stored.
+        """
+        news = list(news)
+        if not news:
+            return 0
+
+        # Claim the URLs first, so concurrent subtasks never
+        # store the same news twice
+        with self.client.pipeline() as pipe:
+            for news_obj in news:
+                pipe.sadd(self._urls_key(job_id), news_obj.url)
+            pipe.expire(self._urls_key(job_id), self.ttl)
+            *claimed, _ = pipe.execute()
+
+        records = [
+            encode_record(NewsSerializer(news_obj).data)
+            for news_obj, is_new in zip(news, claimed)
+            if is_new
+        ]
+        if records:
+            with self.client.pipeline() as pipe:
+                pipe.rpush(self._news_key(job_id, part), *records)
+                pipe.expire(self._news_key(job_id, part), self.ttl)
+                pipe.execute()
+        return len(records)
+
+    def count(self, job_id: str) -> int:
+        """
+        Returns the number of news stored for a job
+        """
+        return sum(self._lengths(job_id).values())
+
+    def _lengths(self, job_id: str) -> dict[str, int]:
+        """
+        Returns the length of each list with the news of a job
+        """
+        keys = self._news_keys(job_id)
+        with self.client.pipeline() as pipe:
+            for key in keys:
+                pipe.llen(key)
+            return dict(zip(keys, pipe.execute()))
+
+    def _ranges(
+        self, job_id: str, offset: int, stop: Optional[int]
+    ) -> Iterator[tuple[str, int, Optional[int]]]:
+        """
+        Yields the (key, start, stop) ranges of the lists to read to get
+        the news of a job from `offset` to `stop` (None for the end)
+        """
+        keys = self._news_keys(job_id)
+        # Most jobs have a single list
+        if len(keys) == 1:
+            yield keys[0], offset, stop
+            return
+
+        position = 0
+        for key, length in self._lengths(job_id).items():
+            start = max(offset - position, 0)
+            end = length if stop is None else min(stop - position, length)
+            if start < end:
+                yield key, start, end
+            position += length
+
+    def iter_news(
+        self,
+        job_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        batch_size: int = 100,
+    ) -> Iterator[dict]:
+        """
+        Yields the (serialized) news stored for a job (up to `limit`
+        of them, skipping the first `offset`), fetching and decoding
+        `batch_size` of them at a time
+        """
+        # Index after the last record to read (None to read them all)
+        stop = None if limit is None else offset + limit
+        for key, start, key_stop in self._ranges(job_id, offset, stop):
+            while key_stop is None or start < key_stop:
+                end = start + batch_size
+                if key_stop is not None:
+                    end = min(end, key_stop)
+                records = self.client.lrange(key, start, end - 1)
+                yield from map(decode_record, records)
+                if len(records) < end - start:
+                    break
+                start = end
+
+    def get(
+        self, job_id: str, offset: int = 0, limit: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Returns the (serialized) news stored for a job, up to `limit`
+        of them and skipping the first `offset`. Only the requested
+        records are read and decoded.
+        """
+        stop = None if limit is None else offset + limit
+        news = []
+        for key, start, key_stop in self._ranges(job_id, offset, stop):
+            if key_stop is not None and start >= key_stop:
+                continue
+            end = -1 if key_stop is None else key_stop - 1
+            news += map(decode_record, self.client.lrange(key, start, end))
+        return news
+
+
+# Per process `ResultStore` instance (see `get_result_store`)
+_result_store = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """
+    Returns the process wide result store configured in the settings
+    """
+    global _result_store
+
+    with _result_store_lock:
+        if _result_store is None:
+            import redis
+
+            _result_store = ResultStore(
+                redis.Redis.from_url(settings.NEWS_RESULTS_REDIS_URL),
+                ttl=settings.NEWS_RESULTS_TTL,
+            )
+    return _result_store
@@ -0,0 +1,106 @@
+"""
+In-memory stand-ins used by the results tests
+"""
+
+
+class FakeRedis:
+    """
+    Implements the few Redis commands used by the result store
+    and the job memo. Keys expire according to `time` (in seconds),
+    which tests advance by hand.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.time = 0
+        # Key -> time it expires at
+        self.expires_at = {}
+
+    def _expire_keys(self):
+        for key, time in list(self.expires_at.items()):
+            if time <= self.time:
+                self.data.pop(key, None)
+                del self.expires_at[key]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def set(self, key, value, nx=False, ex=None):
+        self._expire_keys()
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        self.expires_at.pop(key, None)
+        if ex is not None:
+            self.expire(key, ex)
+        return True
+
+    def get(self, key):
+        self._expire_keys()
+        return self.data.get(key)
+
+    def delete(self, *keys):
+        self._expire_keys()
+        for key in keys:
+            self.expires_at.pop(key, None)
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def sadd(self, key, *values):
+        self._expire_keys()
+        members = self.data.setdefault(key, set())
+        added = len(set(values) - members)
+        members.update(values)
+        return added
+
+    def rpush(self, key, *values):
+        self._expire_keys()
+        items = self.data.setdefault(key, [])
+        items += [
+            value.encode() if isinstance(value, str) else value
+            for value in values
+        ]
+        return len(items)
+
+    def expire(self, key, seconds):
+        self._expire_keys()
+        if key not in self.data:
+            return False
+        self.expires_at[key] = self.time + seconds
+        return True
+
+    def llen(self, key):
+        self._expire_keys()
+        return len(self.data.get(key, []))
+
+    def lrange(self, key, start, end):
+        self._expire_keys()
+        items = self.data.get(key, [])
+        return items[start : None if end == -1 else end + 1]
+
+
+class FakePipeline:
+    """
+    Queues the commands and runs them on `execute`
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((getattr(self.client, name), args))
+            return self
+
+        return queue
+
+    def execute(self):
+        results = [command(*args) for command, args in self.commands]
+        self.commands = []
+        return results
@@ -0,0 +1,131 @@
+import datetime
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.models import News
+from core.serializers import NewsSerializer
+from ..store import ResultStore, decode_record, encode_record
+from .fakes import FakeRedis
+
+
+def build_news(url):
+    return News(
+        "Title",
+        "Description",
+        url,
+        "Política",
+        datetime.datetime(2021, 1, 31, 16, 54, 12),
+        ["Author"],
+        False,
+        "Text",
+    )
+
+
+class ResultStoreTest(SimpleTestCase):
+    def setUp(self):
+        self.store = ResultStore(FakeRedis(), ttl=60)
+
+    def test_append_in_chunks(self):
+        """
+        Tests that news stored in several chunks are
+        returned together, in order
+        """
+        first, second = (
+            build_news("https://www.publico.pt/1"),
+            build_news("https://www.publico.pt/2"),
+        )
+        self.store.append("job", [first])
+        self.store.append("job", [second])
+
+        # News are returned as the API serializes them
+        self.assertEqual(self.store.count("job"), 2)
+        self.assertEqual(
+            self.store.get("job"),
+            [NewsSerializer(first).data, NewsSerializer(second).data],
+        )
+
+    def test_skips_duplicates(self):
+        """
+        Tests that news already stored for the job are skipped,
+        but not the ones stored for another job
+        """
+        self.store.append("job", [build_news("https://www.publico.pt/1")])
+        stored = self.store.append(
+            "job",
+            [
+                build_news("https://www.publico.pt/1"),
+                build_news("https://www.publico.pt/2"),
+            ],
+        )
+        self.store.append("other", [build_news("https://www.publico.pt/1")])
+
+        self.assertEqual(stored, 1)
+        self.assertEqual(self.store.count("job"), 2)
+        self.assertEqual(self.store.count("other"), 1)
+
+    def test_iter_news_in_batches(self):
+        """
+        Tests that stored news are read in batches
+        """
+        urls = [f"https://www.publico.pt/{i}" for i in range(5)]
+        self.store.append("job", [build_news(url) for url in urls])
+
+        with mock.patch.object(
+            self.store.client, "lrange", wraps=self.store.client.lrange
+        ) as lrange:
+            news = list(self.store.iter_news("job", batch_size=2))
+
+        self.assertEqual([news_obj["url"] for news_obj in news], urls)
+        self.assertEqual(lrange.call_count, 3)
+
+    def test_parts_keep_order(self):
+        """
+        Tests that the news stored in parts are read in the order
+        of the parts, before and after they are merged, however
+        the parts were stored
+        """
+        urls = [f"https://www.publico.pt/{i}" for i in range(5)]
+        self.store.start_parts("job", 3)
+        for part in reversed(range(3)):
+            chunk = urls[part * 2 : part * 2 + 2]
+            self.store.append("job", map(build_news, chunk), part)
+
+        self.assertEqual(self.store.count("job"), 5)
+        self.assertEqual(
+            [news["url"] for news in self.store.get("job", 1, 3)], urls[1:4]
+        )
+        self.assertEqual(self.store.merge_parts("job"), 5)
+        self.assertEqual(
+            [news["url"] for news in self.store.iter_news("job", 1)], urls[1:]
+        )
+        self.assertEqual(self.store.get("job", 0, 0), [])
+
+
+class RecordTest(SimpleTestCase):
+    def test_round_trip(self):
+        """
+        Tests that records are versioned, smaller than the
+        JSON news and decoded back to the same news
+        """
+        news = dict(
+            NewsSerializer(build_news("https://www.publico.pt/1")).data
+        )
+        news["text"] = "Texto da notícia. " * 200
+
+        record = encode_record(news)
+
+        self.assertEqual(record[0], 1)
+        self.assertLess(len(record), len(json.dumps(news)) / 5)
+        self.assertEqual(decode_record(record), news)
+
+    def test_legacy_json_records(self):
+        """
+        Tests that records stored as plain JSON can still be read
+        """
+        record = json.dumps({"url": "https://www.publico.pt/1"}).encode()
+
+        self.assertEqual(
+            decode_record(record), {"url": "https://www.publico.pt/1"}
+        )
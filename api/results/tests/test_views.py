@@ -0,0 +1,129 @@
+import datetime
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import News
+from ..store import ResultStore
+from .fakes import FakeRedis
+
+
+class ResultsTestCase(SimpleTestCase):
+    api = APIClient()
+
+    def setUp(self):
+        self.store = ResultStore(FakeRedis(), ttl=60)
+        self.store.append(
+            "job",
+            [
+                News(
+                    "Title",
+                    "Description",
+                    f"https://www.publico.pt/{i}",
+                    "Política",
+                    datetime.datetime(2021, 1, 31),
+                    ["Author"],
+                    False,
+                    "Text",
+                )
+                for i in range(3)
+            ],
+        )
+        for target, value in [
+            ("results.views.get_result_store", self.store),
+            ("results.serializers.get_result_store", self.store),
+            (
+                "results.views.AsyncResult",
+                mock.Mock(id="job", state="STARTED", kwargs={}),
+            ),
+        ]:
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_results(self, query="", **headers):
+        return self.api.get(
+            reverse("results", kwargs={"job_id": "job"}) + query, **headers
+        )
+
+
+class ResultsPaginationTest(ResultsTestCase):
+    def test_page_and_fields(self):
+        """
+        Tests that a page of the news can be requested,
+        with only some of their fields
+        """
+        response = self.get_results("?offset=1&limit=1&fields=title,url")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The number of news is the total, not the size of the page
+        self.assertEqual(response.data["number_of_news"], 3)
+        self.assertEqual(
+            response.data["news"],
+            [{"title": "Title", "url": "https://www.publico.pt/1"}],
+        )
+
+    def test_unknown_fields(self):
+        """
+        Tests that unknown news fields are rejected
+        """
+        response = self.get_results("?fields=title,nope")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_streamed_page_and_fields(self):
+        """
+        Tests that pages and fields also apply to streamed results
+        """
+        response = self.get_results(
+            "?format=ndjson&offset=2&limit=5&fields=url"
+        )
+
+        self.assertEqual(
+            b"".join(response.streaming_content),
+            b'{"url": "https://www.publico.pt/2"}\n',
+        )
+
+
+class ResultsStreamingTest(ResultsTestCase):
+    def assert_streamed(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["X-Job-State"], "STARTED")
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(
+            [json.loads(line)["url"] for line in lines],
+            [f"https://www.publico.pt/{i}" for i in range(3)],
+        )
+
+    def test_accept_header(self):
+        """
+        Tests that news are streamed one per line with the NDJSON media type
+        """
+        response = self.get_results(HTTP_ACCEPT="application/x-ndjson")
+
+        self.assert_streamed(response)
+
+    def test_format_parameter(self):
+        """
+        Tests that news are streamed with the `format` query parameter
+        """
+        response = self.get_results("?format=ndjson")
+
+        self.assert_streamed(response)
+
+    def test_unknown_job(self):
+        """
+        Tests that unknown jobs are not found
+        """
+        with mock.patch(
+            "results.views.AsyncResult",
+            return_value=mock.Mock(id="job", state="PENDING"),
+        ):
+            response = self.get_results(HTTP_ACCEPT="application/x-ndjson")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
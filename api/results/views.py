@@ -1,12 +1,21 @@
 """
 Contains the Results endpoints (views)
 """
+import json
+from typing import Optional
+
+from django.http import StreamingHttpResponse
+from drf_spectacular.utils import extend_schema
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework import generics, mixins, status
+from rest_framework.settings import api_settings
 from celery.result import AsyncResult
 
 
-from .serializers import JobResultSerializer
+from .renderers import NDJSONRenderer
+from .serializers import JobResultSerializer, ResultsQuerySerializer
+from .store import get_result_store
 
 
 class ResultsView(
@@ -14,7 +23,11 @@ class ResultsView(
     generics.GenericAPIView,
 ):
     serializer_class = JobResultSerializer
+    # News can also be streamed, one per line, with the
+    # `Accept: application/x-ndjson` header or `?format=ndjson`
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
 
+    @extend_schema(parameters=[ResultsQuerySerializer])
     def get(self, request, job_id, *args, **kwargs):
         """
         Returns the results of a search job
@@ -22,6 +35,9 @@ class ResultsView(
         # Get job
         job = AsyncResult(job_id)
 
+        if isinstance(request.accepted_renderer, NDJSONRenderer):
+            return self.stream_news(job, **self.get_query())
+
         # Pass job to serializer
         serializer = self.get_serializer(data=job)
 
@@ -34,3 +50,51 @@ class ResultsView(
             serializer.data,
             status=status.HTTP_200_OK,
         )
+
+    def get_query(self) -> dict:
+        """
+        Returns the validated query parameters (the page of news
+        and the news fields requested)
+        """
+        query = ResultsQuerySerializer(data=self.request.query_params)
+        # Return a 400 response if the parameters are invalid
+        query.is_valid(raise_exception=True)
+        return query.validated_data
+
+    def get_serializer_context(self):
+        return super().get_serializer_context() | self.get_query()
+
+    @staticmethod
+    def stream_news(
+        job: AsyncResult,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+    ) -> StreamingHttpResponse:
+        """
+        Streams the news found by a job (so far) as newline delimited
+        JSON, straight from the result store, without building the
+        whole response in memory. The job state is sent in the
+        `X-Job-State` header.
+        """
+        # 'PENDING' jobs are unknown (see `JobResultSerializer`)
+        if job.state == "PENDING":
+            raise NotFound({"id": job.id, "state": "NOT_FOUND"})
+
+        news = get_result_store().iter_news(job.id, offset, limit)
+        # Only keep the requested fields
+        if fields:
+            news = (
+                {field: news_obj[field] for field in fields}
+                for news_obj in news
+            )
+
+        response = StreamingHttpResponse(
+            (
+                json.dumps(news_obj, ensure_ascii=False).encode() + b"\n"
+                for news_obj in news
+            ),
+            content_type=NDJSONRenderer.media_type,
+        )
+        response["X-Job-State"] = job.state
+        return response